@@ -0,0 +1,197 @@
+# ExecTiming - A Python packaged for measuring the execution time of code
+# Copyright (C) <2019>  <Jacob Morris>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Benchmarks of ExecTiming's own hot paths, so changes to their cost can be tracked over time. Measures:
+    1. The overhead added to each call by `Timer.decorate`, `Timer.context`, and `Timer.log`
+    2. The memory used by each recorded run, for each kind of split
+    3. How `Split.statistics()`, `Timer._str()`, and `Split.determine_best_fit()` scale with the number of runs, from
+        1e3 up to `--max-size` runs
+
+Everything is timed with `timeit` rather than ExecTiming, so a regression can't hide itself. The results are written
+as JSON, which can be compared between commits. Run it from the root of the repository:
+    python benchmarks/benchmark.py --output results.json
+"""
+
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from json import dump
+from os import path
+from platform import platform, python_implementation, python_version
+from timeit import Timer as _Timeit
+from typing import Callable, Dict, List
+import sys
+import tracemalloc
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from exectiming.best_fit_curves import MISSING_CURVE_FITTING
+from exectiming.data_structures import ColumnarSplit, Run, Split
+from exectiming.exectiming import Timer
+
+SPLIT_TYPES = {"Split": Split, "ColumnarSplit": ColumnarSplit}
+
+
+def best_time(func: Callable[[], any], number: int, repeat: int) -> float:
+    """
+    :param func: the function to time
+    :param number: the number of calls in each repeat
+    :param repeat: the number of repeats
+    :return: the time of a single call in seconds, from the fastest repeat
+    """
+    return min(_Timeit(func).repeat(repeat=repeat, number=number)) / number
+
+
+def fill(split: Split, size: int, log_arguments: bool=False) -> Split:
+    """
+    Add runs to a split
+    :param split: the split to add to
+    :param size: the number of runs to add
+    :param log_arguments: whether each run logs its index as an argument
+    :return: the split
+    """
+    for i in range(size):
+        split.add_run(Run(label="run", time=1e-6 * (i % 1000 + 1), runs=1, iterations_per_run=1,
+                          args=(i,) if log_arguments else ()))
+
+    return split
+
+
+def overhead(number: int, repeat: int) -> Dict[str, float]:
+    """
+    Measure the time each instrumentation method adds to a call, beyond the call itself
+    :return: a map of methods to seconds per call
+    """
+    def empty():
+        pass
+
+    timer = Timer(split=True, label="Benchmark")
+    decorated = timer.decorate(split=False)(empty)
+
+    def context():
+        with timer.context():
+            pass
+
+    def reset():  # keep the split from growing across repeats, as that measures memory and not the method
+        timer.splits[-1] = Split(label="Benchmark")
+
+    baseline = best_time(empty, number, repeat)
+    results = {}
+    for name, func in (("decorate", decorated), ("context", context), ("log", timer.log)):
+        if name == "log":
+            timer.start()
+
+        times = []
+        for _ in range(repeat):
+            reset()
+            times.append(best_time(func, number, 1))
+
+        results[name] = max(min(times) - baseline, 0)
+
+    return results
+
+
+def memory(sizes: List[int], max_object_size: int) -> Dict[str, Dict[int, float]]:
+    """
+    Measure the memory allocated for each run that is added to each kind of split
+    :param sizes: the numbers of runs
+    :param max_object_size: the largest number of runs to add to a Split, which keeps a Run object for each
+    :return: a map of split types to maps of sizes to bytes per run
+    """
+    results = {}
+    for name, split_type in SPLIT_TYPES.items():
+        results[name] = {}
+        for size in sizes:
+            if split_type is Split and size > max_object_size:
+                continue
+
+            tracemalloc.start()
+            split = fill(split_type(label=name), size)
+            allocated = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            results[name][size] = allocated / size
+            del split
+
+    return results
+
+
+def scaling(sizes: List[int], repeat: int, max_object_size: int) -> Dict[str, Dict[int, float]]:
+    """
+    Measure how the cost of the methods that read every run scales with the number of runs
+    :param sizes: the numbers of runs
+    :param repeat: the number of repeats of each measurement
+    :param max_object_size: the largest number of runs to format with `._str()`, which builds a Run for each
+    :return: a map of methods to maps of sizes to seconds per call
+    """
+    results = {"statistics": {}, "statistics_rebuild": {}, "_str": {}, "determine_best_fit": {}}
+    for size in sizes:
+        timer = Timer()
+        timer.splits.append(fill(ColumnarSplit(label="Benchmark"), size, log_arguments=True))
+        split = timer.splits[-1]
+
+        results["statistics"][size] = best_time(split.statistics, 100, repeat)
+
+        def rebuild():  # the path taken when runs were added to `.runs` directly
+            split.accumulator.count = -1
+            split.statistics()
+
+        results["statistics_rebuild"][size] = best_time(rebuild, 1, repeat)
+
+        if size <= max_object_size:
+            results["_str"][size] = best_time(timer._str, 1, repeat)
+        if not MISSING_CURVE_FITTING:
+            results["determine_best_fit"][size] = best_time(split.determine_best_fit, 1, repeat)
+
+        del timer, split
+
+    return results
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark ExecTiming's hot paths and write the results as JSON")
+    parser.add_argument("--output", default="benchmark-results.json", help="the path of the JSON file to write")
+    parser.add_argument("--max-size", type=int, default=10**7, help="the largest number of runs in a split")
+    parser.add_argument("--max-object-size", type=int, default=10**6,
+                        help="the largest number of runs to hold as Run objects, in a Split or to format with _str")
+    parser.add_argument("--number", type=int, default=10000, help="the calls in each repeat of the overhead tests")
+    parser.add_argument("--repeat", type=int, default=5, help="the repeats of each measurement, the fastest is kept")
+    arguments = parser.parse_args()
+
+    sizes = []
+    size = 10**3
+    while size <= arguments.max_size:
+        sizes.append(size)
+        size *= 10
+
+    results = {
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": "{} {}".format(python_implementation(), python_version()),
+        "platform": platform(),
+        "units": {"overhead": "seconds per call", "memory": "bytes per run", "scaling": "seconds per call"},
+        "overhead": overhead(arguments.number, arguments.repeat),
+        "memory": memory(sizes, arguments.max_object_size),
+        "scaling": scaling(sizes, arguments.repeat, arguments.max_object_size)
+    }
+
+    with open(arguments.output, "w") as file:
+        dump(results, file, indent=2)
+
+    print("Wrote {}".format(arguments.output))
+
+
+if __name__ == "__main__":
+    main()
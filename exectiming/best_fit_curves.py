@@ -15,51 +15,59 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 """
-Provides a series of classes built on BestFitBase that all implement .calculate_curve(), .calculate_point(), and
-poll(). These methods are used to determine the parameters for the given curve type, then determine the distance or
-accuracy of the curve type.
+Provides a series of classes built on BestFitBase that all implement .fit(), .calculate_points(), .calculate_point(),
+and .poll_keys(). These methods are used to determine the parameters for the given curve type, then determine the
+distance or accuracy of the curve type.
+
+Every curve is linear in its parameters once the argument has been run through a basis function, `a + b*e^x` is linear
+in `e^x` for example, so all of them are fit with ordinary least squares using `numpy.linalg.lstsq`.
 """
 
+from .lazy_module import LazyModule, is_available
 from typing import List, Tuple, Dict, Union
 
-try:
-    from sklearn.linear_model import LinearRegression
-    from scipy.optimize import curve_fit
-    import numpy as np
-
-    np.seterr(divide="ignore")
-    MISSING_CURVE_FITTING = False
-except ImportError:
-    MISSING_CURVE_FITTING = True
+# numpy is only imported once a curve is actually fit, as importing it takes much longer than importing exectiming
+np = LazyModule("numpy", on_import=lambda numpy: numpy.seterr(divide="ignore"))
+MISSING_CURVE_FITTING = not is_available("numpy")
 
 
 class BestFitBase:
     """
     An abstract class to be used as a template for best fit curves. The process is to first calculate the curve using
-    calculated points and then check how accurate the curve is.
+    calculated points and then check how accurate the curve is. Curves work on a feature matrix `x`, with one row for
+    each run and one column for each argument in `keys`, and a vector `y` of measured times, so that every point is
+    fit and evaluated in a single call.
     """
     @staticmethod
-    def _flatten_args_separate_points(points: List[Tuple[Dict[Union[str, int], int], float]]
-                                      ) -> Tuple[List[List[int]], List[float]]:
+    def _points_to_arrays(points: List[Tuple[Dict[Union[str, int], int], float]]) -> Tuple[list, "np.ndarray",
+                                                                                            "np.ndarray"]:
         """
-        Take a list of points and separate them two lists, one containing a list of all the args and kwargs values,
-        the other containing the measured times corresponding to that list of arguments. Flattening the kwargs requires
-        dict.values() to be stable.
+        Take a list of points and convert them to the keys of the arguments, a feature matrix of the argument values,
+        and a vector of the measured times. Flattening the kwargs requires dict.values() to be stable.
         """
-        flattened_args = []
-        matching_points = []
-        for all_args, y in points:  # flatten args and kwargs into a single list. Requires dicts to be stable
-            matching_points.append(y)
-            flattened_args.append(list(all_args.values()))
+        keys = list(points[0][0]) if points else []
+        x = np.array([list(all_args.values()) for all_args, _ in points], dtype=float).reshape(len(points), len(keys))
+        y = np.array([time for _, time in points], dtype=float)
 
-        return flattened_args, matching_points
+        return keys, x, y
 
-    @staticmethod
-    def calculate_curve(points: List[Tuple[Dict[Union[str, int], int], float]]) -> dict:
+    @classmethod
+    def calculate_curve(cls, points: List[Tuple[Dict[Union[str, int], int], float]]) -> dict:
         """
         Take a list of tuples, each containing the arguments and the time value, and determines the parameters for this
         type of curve. All arguments must be integers.
-        :param points: each entry is ((tuple of positional arguments, dict of keyword arguments), measured time)
+        :param points: each entry is (dict of argument indices/names to values, measured time)
+        :return: a dict of the parameters of the curve
+        """
+        return cls.fit(*BestFitBase._points_to_arrays(points))
+
+    @staticmethod
+    def fit(keys: List[Union[str, int]], x: "np.ndarray", y: "np.ndarray") -> dict:
+        """
+        Determine the parameters for this type of curve
+        :param keys: the index or name of the argument in each column of `x`
+        :param x: a matrix with a row of argument values for each run
+        :param y: the measured time of each run
         :return: a dict of the parameters of the curve
         """
         pass
@@ -74,6 +82,17 @@ class BestFitBase:
         """
         pass
 
+    @staticmethod
+    def calculate_points(keys: List[Union[str, int]], x: "np.ndarray", parameters: dict) -> "np.ndarray":
+        """
+        The same as `.calculate_point()`, but for every row of `x` at once
+        :param keys: the index or name of the argument in each column of `x`
+        :param x: a matrix with a row of argument values for each point
+        :param parameters: the parameters of the calculated curve
+        :return: the time value for each row
+        """
+        pass
+
     @staticmethod
     def equation(parameters: dict, rounding: int=8) -> str:
         """
@@ -84,74 +103,89 @@ class BestFitBase:
         """
         return ""
 
-    @staticmethod
-    def poll(points: List[Tuple[Dict[Union[str, int], int], float]]) -> bool:
+    @classmethod
+    def poll(cls, points: List[Tuple[Dict[Union[str, int], int], float]]) -> bool:
         """
         Return True if this best-fit-curve type can operate on these data points. Otherwise, return False
         """
+        return cls.poll_keys(list(points[0][0]) if points else [])
+
+    @staticmethod
+    def poll_keys(keys: List[Union[str, int]]) -> bool:
+        """
+        Return True if this best-fit-curve type can operate on runs with these arguments. Otherwise, return False
+        """
         return not MISSING_CURVE_FITTING
 
     @staticmethod
-    def _poll_single_arg(points):
+    def _least_squares(features: "np.ndarray", y: "np.ndarray") -> Tuple[float, "np.ndarray"]:
         """
-        There can only be one argument for a exponential curve, this guarantees that is the case
+        Find the intercept and coefficients that minimize the squared error of `intercept + features @ coefficients`.
+        The features and times are centered first, which is better conditioned and gives an exact zero coefficient when
+        the times don't depend on a feature at all.
+        :param features: a matrix with one column for each coefficient, after any basis functions have been applied
+        :param y: the measured times
+        :return: the intercept and an array of coefficients. If any feature is not finite, then they are all NaN
         """
-        if MISSING_CURVE_FITTING:
-            return False
+        if not np.all(np.isfinite(features)):
+            return float("nan"), np.full(features.shape[1], float("nan"))
 
-        for args, _ in points:
-            if len(args) != 1:
-                return False
+        feature_means, y_mean = features.mean(axis=0), y.mean()
+        coefficients = np.linalg.lstsq(features - feature_means, y - y_mean, rcond=None)[0]
 
-        return True
+        return y_mean - feature_means @ coefficients, coefficients
+
+    @staticmethod
+    def _poll_single_arg(keys: List[Union[str, int]]) -> bool:
+        """
+        Some curves can only have one argument, this guarantees that is the case
+        """
+        return not MISSING_CURVE_FITTING and len(keys) == 1
 
 
 class BestFitExponential(BestFitBase):
     """
-    Uses scipy.optimize.curve_fit to find `a` and `b` such that `a + b*e^x` best fits the data given. Can only handle a
+    Uses least squares on `e^x` to find `a` and `b` such that `a + b*e^x` best fits the data given. Can only handle a
     single independent variable. Generated parameters are `a` and `b`
     """
     @staticmethod
-    def calculate_curve(points):
-        flattened_args, matching_points = BestFitBase._flatten_args_separate_points(points)
-        # set default params low as measured times can be very short
-        values = curve_fit(lambda x, a, b: a + b*np.exp(x), [val[0] for val in flattened_args],
-                           matching_points, p0=(0.0000001, 0.0000001))
+    def fit(keys, x, y):
+        with np.errstate(over="ignore"):
+            intercept, coefficients = BestFitBase._least_squares(np.exp(x), y)
 
-        return {"a": values[0][0], "b": values[0][1]}
+        return {"a": intercept, "b": coefficients[0]}
 
     @staticmethod
     def calculate_point(arguments, parameters):
         x = next(iter(arguments.values()))
         return parameters["a"] + parameters["b"]*np.exp(x)
 
+    @staticmethod
+    def calculate_points(keys, x, parameters):
+        return parameters["a"] + parameters["b"]*np.exp(x[:, 0])
+
     @staticmethod
     def equation(parameters, rounding=8):
         return "y = {} + {}e^x".format(round(parameters["a"], rounding), round(parameters["b"], rounding))
 
     @staticmethod
-    def poll(points):
-        return BestFitBase._poll_single_arg(points)
+    def poll_keys(keys):
+        return BestFitBase._poll_single_arg(keys)
 
 
 class BestFitLinear(BestFitBase):
     """
-    Uses sklearn.linear_model.LinearRegression to determine coefficients for each of the independent variables and
-    the y-intercept. Generate parameters are the y-intercept, `b`, and coefficients where the key is
-    `x_index/key`. The index or key is the index of a positional argument or the name of a keyword argument.
+    Uses least squares to determine coefficients for each of the independent variables and the y-intercept. Generate
+    parameters are the y-intercept, `b`, and coefficients where the key is `x_index/key`. The index or key is the index
+    of a positional argument or the name of a keyword argument.
     """
     @staticmethod
-    def calculate_curve(points):
-        flattened_args, matching_points = BestFitBase._flatten_args_separate_points(points)
-
-        model = LinearRegression()
-        model.fit(flattened_args, matching_points)
+    def fit(keys, x, y):
+        intercept, coefficients = BestFitBase._least_squares(x, y)
 
-        params = {"b": model.intercept_}
-        i = 0
-        for key in points[0][0]:  # for all the keys, assuming stable iteration
-            params["x_{}".format(key)] = model.coef_[i]
-            i += 1
+        params = {"b": intercept}
+        for i, key in enumerate(keys):
+            params["x_{}".format(key)] = coefficients[i]
 
         return params
 
@@ -164,6 +198,10 @@ class BestFitLinear(BestFitBase):
 
         return value
 
+    @staticmethod
+    def calculate_points(keys, x, parameters):
+        return parameters["b"] + x @ np.array([parameters["x_{}".format(key)] for key in keys], dtype=float)
+
     @staticmethod
     def equation(parameters, rounding=8):
         return "y = {} + {}".format(
@@ -174,43 +212,44 @@ class BestFitLinear(BestFitBase):
 
 class BestFitLogarithmic(BestFitBase):
     """
-    Use scipy.optimize.curve_fit to find `a` and `b` such that `a + b*log(x)` is best fitted to the data. Can only
+    Uses least squares on `log(x)` to find `a` and `b` such that `a + b*log(x)` is best fitted to the data. Can only
     handle a single independent variable. Generated parameters are `a` and `b`
     """
     @staticmethod
-    def calculate_curve(points):
-        flattened_args, matching_points = BestFitBase._flatten_args_separate_points(points)
-        values = curve_fit(lambda x, a, b: a + b*np.log(x), [val[0] for val in flattened_args], matching_points)
+    def fit(keys, x, y):
+        with np.errstate(invalid="ignore"):
+            intercept, coefficients = BestFitBase._least_squares(np.log(x), y)
 
-        return {"a": values[0][0], "b": values[0][1]}
+        return {"a": intercept, "b": coefficients[0]}
 
     @staticmethod
     def calculate_point(arguments, parameters):
         x = next(iter(arguments.values()))
         return parameters["a"] + parameters["b"]*np.log(x)
 
+    @staticmethod
+    def calculate_points(keys, x, parameters):
+        return parameters["a"] + parameters["b"]*np.log(x[:, 0])
+
     @staticmethod
     def equation(parameters, rounding=8):
         return "y = {} + {}*log(x)".format(round(parameters["a"], rounding), round(parameters["b"], rounding))
 
     @staticmethod
-    def poll(points):
-        return BestFitBase._poll_single_arg(points)
+    def poll_keys(keys):
+        return BestFitBase._poll_single_arg(keys)
 
 
 class BestFitPolynomial(BestFitBase):
     """
-    Uses scipy.optimize.curve_fit to find the values `a`, `b`, and, `c` such that `ax^2 + bx + c` is best fit to the
-    data.
+    Uses least squares on `x^2` and `x` to find the values `a`, `b`, and, `c` such that `ax^2 + bx + c` is best fit to
+    the data.
     """
     @staticmethod
-    def calculate_curve(points):
-        flattened_args, matching_points = BestFitBase._flatten_args_separate_points(points)
+    def fit(keys, x, y):
+        intercept, coefficients = BestFitBase._least_squares(np.column_stack((x[:, 0]**2, x[:, 0])), y)
 
-        values = curve_fit(lambda x, a, b, c: a*np.power(x, 2) + b*x + c, [val[0] for val in flattened_args],
-                           matching_points, p0=(0.000001, 0.000001, 0.000001))
-
-        return {"a": values[0][0], "b": values[0][1], "c": values[0][2]}
+        return {"a": coefficients[0], "b": coefficients[1], "c": intercept}
 
     @staticmethod
     def calculate_point(arguments, parameters):
@@ -218,6 +257,11 @@ class BestFitPolynomial(BestFitBase):
 
         return parameters["a"] * x**2 + parameters["b"]*x + parameters["c"]
 
+    @staticmethod
+    def calculate_points(keys, x, parameters):
+        x = x[:, 0]
+        return parameters["a"] * x**2 + parameters["b"]*x + parameters["c"]
+
     @staticmethod
     def equation(parameters, rounding=8):
         return "y = {}x^2 + {}x + {}".format(
@@ -227,5 +271,5 @@ class BestFitPolynomial(BestFitBase):
         )
 
     @staticmethod
-    def poll(points):
-        return BestFitBase._poll_single_arg(points)
+    def poll_keys(keys):
+        return BestFitBase._poll_single_arg(keys)
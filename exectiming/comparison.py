@@ -0,0 +1,168 @@
+# ExecTiming - A Python packaged for measuring the execution time of code
+# Copyright (C) <2019>  <Jacob Morris>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Compare the splits of a baseline against the splits of a candidate. Splits are matched by label, and each pair gets
+a speedup with a bootstrap confidence interval and a Mann-Whitney U test, which doesn't assume the times are normally
+distributed, so a change can be flagged as a regression or an improvement only when it is both significant and large.
+"""
+
+from .data_structures import Split
+from math import erfc, sqrt
+from random import Random
+from typing import Dict, List, Sequence, Tuple, Union
+
+
+def _estimate(times: Sequence[float], statistic: str) -> float:
+    """
+    :param times: the times, at least one
+    :param statistic: either "mean" or "median"
+    :return: the mean or median of the times
+    """
+    if statistic == "mean":
+        return sum(times) / len(times)
+    elif statistic == "median":
+        ordered = sorted(times)
+        return (ordered[(len(ordered) - 1) // 2] + ordered[len(ordered) // 2]) / 2
+    else:
+        raise RuntimeWarning("{} is not a valid statistic, use 'mean' or 'median'".format(statistic))
+
+
+def bootstrap_speedup(baseline: Sequence[float], candidate: Sequence[float], statistic: str="median",
+                      confidence: float=0.95, resamples: int=1000, seed: int=None) -> Tuple[float, float, float]:
+    """
+    Estimate how many times faster the candidate is than the baseline, `statistic(baseline) / statistic(candidate)`,
+    with a percentile bootstrap confidence interval. Both samples are resampled independently.
+    :param baseline: the times of the baseline
+    :param candidate: the times of the candidate
+    :param statistic: either "mean" or "median"
+    :param confidence: the confidence level of the interval, between 0 and 1
+    :param resamples: the number of bootstrap resamples, each of which takes time linear in the number of times
+    :param seed: the seed of the random number generator, so the interval can be reproduced
+    :return: the lower bound, the estimate, and the upper bound
+    """
+    generator = Random(seed)
+    ratios = []
+    for _ in range(resamples):
+        candidate_estimate = _estimate(generator.choices(candidate, k=len(candidate)), statistic)
+        baseline_estimate = _estimate(generator.choices(baseline, k=len(baseline)), statistic)
+        ratios.append(baseline_estimate / candidate_estimate if candidate_estimate else float("inf"))
+
+    ratios.sort()
+    tail = (1 - confidence) / 2
+    candidate_estimate = _estimate(candidate, statistic)
+    return (
+        ratios[int(tail * (resamples - 1))],
+        _estimate(baseline, statistic) / candidate_estimate if candidate_estimate else float("inf"),
+        ratios[int((1 - tail) * (resamples - 1) + 0.5)]
+    )
+
+
+def mann_whitney_u(first: Sequence[float], second: Sequence[float]) -> Tuple[float, float]:
+    """
+    Test whether the times in one sample tend to be larger than those in the other with the Mann-Whitney U test. The
+    p-value is two-sided and uses the normal approximation with continuity and tie corrections.
+    :param first: the first sample
+    :param second: the second sample
+    :return: the U statistic of the first sample and the p-value
+    """
+    n1, n2 = len(first), len(second)
+    combined = sorted([(time, 0) for time in first] + [(time, 1) for time in second])
+    n = n1 + n2
+
+    rank_sum, ties, i = 0.0, 0.0, 0
+    while i < n:
+        j = i
+        while j + 1 < n and combined[j + 1][0] == combined[i][0]:
+            j += 1
+
+        rank = (i + j) / 2 + 1  # tied times share the average of their ranks
+        rank_sum += rank * sum(1 for k in range(i, j + 1) if combined[k][1] == 0)
+        ties += (j - i + 1)**3 - (j - i + 1)
+        i = j + 1
+
+    u = rank_sum - n1 * (n1 + 1) / 2
+    sigma = sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))) if n > 1 else 0
+    if not sigma:
+        return u, 1.0
+
+    difference = abs(u - n1 * n2 / 2)
+    z = max(difference - 0.5, 0) / sigma
+    return u, min(erfc(z / sqrt(2)), 1.0)
+
+
+def split_times(splits: List[Split]) -> Dict[str, List[float]]:
+    """
+    Group the times of the runs in the splits by split label, in seconds
+    :param splits: the splits
+    :return: a map of split labels to times in seconds, in the order the splits and runs appear
+    """
+    times = {}
+    for split in splits:
+        times.setdefault(split.label, []).extend(run.time / split.resolution for run in split.runs)
+
+    return times
+
+
+def compare_splits(baseline: List[Split], candidate: List[Split], statistic: str="median", confidence: float=0.95,
+                   threshold: float=0.05, resamples: int=1000, seed: int=None
+                   ) -> Dict[str, Dict[str, Union[float, int, bool]]]:
+    """
+    Compare every split label that the baseline and candidate have in common. Labels with fewer than two runs on either
+    side are skipped, as there is nothing to test.
+    :param baseline: the splits of the baseline
+    :param candidate: the splits of the candidate
+    :param statistic: the statistic to compare, either "mean" or "median"
+    :param confidence: the confidence level of the speedup interval, and the test is significant when the p-value is
+                below `1 - confidence`
+    :param threshold: the relative change that is large enough to flag. A label is a regression when the change is
+                significant and the candidate is more than `1 + threshold` times slower, and an improvement when it is
+                significant and the candidate is more than `1 + threshold` times faster.
+    :param resamples: the number of bootstrap resamples
+    :param seed: the seed of the bootstrap, so results can be reproduced
+    :return: a map of split labels to `baseline_count`, `candidate_count`, `baseline` and `candidate` (the statistic in
+                seconds), `speedup`, `lower` and `upper` (its confidence interval), `u`, `p_value`, `significant`,
+                `regression`, and `improvement`
+    """
+    baseline_times, candidate_times = split_times(baseline), split_times(candidate)
+    comparisons = {}
+
+    for label, old in baseline_times.items():
+        new = candidate_times.get(label, ())
+        if len(old) < 2 or len(new) < 2:
+            continue
+
+        lower, speedup, upper = bootstrap_speedup(old, new, statistic=statistic, confidence=confidence,
+                                                  resamples=resamples, seed=seed)
+        u, p_value = mann_whitney_u(old, new)
+        significant = p_value < 1 - confidence
+
+        comparisons[label] = {
+            "baseline_count": len(old),
+            "candidate_count": len(new),
+            "baseline": _estimate(old, statistic),
+            "candidate": _estimate(new, statistic),
+            "speedup": speedup,
+            "lower": lower,
+            "upper": upper,
+            "u": u,
+            "p_value": p_value,
+            "significant": significant,
+            "regression": significant and speedup * (1 + threshold) < 1,
+            "improvement": significant and speedup > 1 + threshold
+        }
+
+    return comparisons
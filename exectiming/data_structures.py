@@ -20,31 +20,302 @@ functionality
 """
 
 from .best_fit_curves import BestFitExponential, BestFitLinear, BestFitLogarithmic, BestFitPolynomial, \
-    MISSING_CURVE_FITTING
-from math import sqrt
-from typing import Set, Dict, Union, Tuple, List
+    MISSING_CURVE_FITTING, np
+from array import array
+from collections import deque
+from heapq import heappush, heapreplace
+from math import ceil, log, sqrt
+from pickle import loads
+from random import randrange
+from time import monotonic
+from typing import Set, Dict, Union, Tuple, List, Iterator, Sequence
 
 
 class Run:
-    def __init__(self, label: str, time: float, runs: int, iterations_per_run: int, args: tuple=(), kwargs: dict=()):
+    def __init__(self, label: str, time: float, runs: int, iterations_per_run: int, args: tuple=(), kwargs: dict=(),
+                 metrics: dict=()):
         self.label: str = label
         self.time: float = time
         self.runs = runs
         self.iterations_per_run = iterations_per_run
         self.args: tuple = args
         self.kwargs: dict = kwargs if kwargs else {}
+        self.metrics: Dict[str, float] = metrics if metrics else {}  # measured by probes, see `exectiming.probes`
+
+
+class RunningStatistics:
+    """
+    Keeps a running count, total, min, max, mean, and sum of squared differences from the mean (Welford's method) so
+    statistics never need to walk the runs. The total uses Neumaier compensated summation, and stays an exact integer as
+    long as only integers, like nanosecond times, are added. Two accumulators can be combined with `.merge()`, which
+    gives the same result as if every value had been added to a single accumulator.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self._sum = 0
+        self._compensation = 0
+
+    def _add_to_total(self, value: float):
+        """
+        Add a value to the total, keeping track of the low-order bits that get lost along the way
+        """
+        total = self._sum + value
+        if abs(self._sum) >= abs(value):
+            self._compensation += (self._sum - total) + value
+        else:
+            self._compensation += (value - total) + self._sum
+        self._sum = total
+
+    @property
+    def total(self) -> float:
+        return self._sum + self._compensation
+
+    def add(self, value: float):
+        """
+        Add a single value to the accumulator
+        :param value: the value, generally a measured time
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self._add_to_total(value)
+
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: "RunningStatistics") -> "RunningStatistics":
+        """
+        Combine the values from another accumulator into this one using Chan's parallel update
+        :param other: the accumulator to merge in. It is not changed.
+        :return: this accumulator so calls can be chained
+        """
+        if not other.count:
+            return self
+
+        if not self.count:
+            self.mean, self.m2, self.min, self.max = other.mean, other.m2, other.min, other.max
+        else:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / count
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+
+        self.count += other.count
+        self._add_to_total(other._sum)
+        self._add_to_total(other._compensation)
+        return self
+
+    def statistics(self) -> Dict[str, Union[float, int]]:
+        """
+        :return: a map containing `total`, `min`, `max`, `count`, `average`, `standard_deviation`, and `variance`
+        """
+        if not self.count:
+            return {"total": 0, "min": 0, "max": 0, "count": 0, "average": 0, "standard_deviation": 0, "variance": 0}
+
+        variance = self.m2 / self.count
+        return {"total": self.total, "min": self.min, "max": self.max, "count": self.count, "average": self.mean,
+                "standard_deviation": sqrt(variance), "variance": variance}
+
+    def to_dict(self) -> dict:
+        """
+        :return: a map containing everything needed to rebuild this accumulator with `.from_dict()`
+        """
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max,
+                "sum": self._sum, "compensation": self._compensation}
+
+    @staticmethod
+    def from_dict(data: dict) -> "RunningStatistics":
+        """
+        Rebuild an accumulator from the output of `.to_dict()`
+        """
+        accumulator = RunningStatistics()
+        accumulator.count, accumulator.mean, accumulator.m2 = data["count"], data["mean"], data["m2"]
+        accumulator.min, accumulator.max = data["min"], data["max"]
+        accumulator._sum, accumulator._compensation = data["sum"], data["compensation"]
+        return accumulator
+
+
+class QuantileSketch:
+    """
+    A fixed-memory sketch for estimating quantiles with a bounded relative error, in the style of DDSketch. Positive
+    values are counted in logarithmically sized buckets, so any estimated quantile is within `relative_accuracy` of the
+    true value. If there are ever more than `max_buckets` buckets, the lowest ones are collapsed together, which only
+    loses accuracy for the smallest values. Sketches with the same accuracy can be merged by adding their bucket counts,
+    and `.to_dict()`/`.from_dict()` allow sending them between processes.
+    """
+    def __init__(self, relative_accuracy: float=0.01, max_buckets: int=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float, count: int=1):
+        """
+        Add a value to the sketch
+        :param value: the value to add. Values that are zero or negative are all counted as zero
+        :param count: the number of times to add the value
+        """
+        self.count += count
+        if value <= 0:
+            self.zero_count += count
+            return
+
+        index = ceil(log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        """
+        Fold the lowest buckets into each other until there are only `max_buckets` left
+        """
+        indices = sorted(self.buckets)
+        excess = len(indices) - self.max_buckets
+        target = indices[excess]
+        for index in indices[:excess]:
+            self.buckets[target] += self.buckets.pop(index)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """
+        Add the counts from another sketch into this one. Both sketches must have the same relative accuracy.
+        :param other: the sketch to merge in. It is not changed.
+        :return: this sketch so calls can be chained
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise RuntimeWarning("Only sketches with the same relative accuracy can be merged")
+
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+        return self
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate the value at the given quantile
+        :param q: the quantile, between 0 and 1
+        :return: the estimated value, or 0 if the sketch is empty
+        """
+        if not self.count:
+            return 0
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0
+
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self) -> dict:
+        """
+        :return: a map containing everything needed to rebuild this sketch with `.from_dict()`
+        """
+        return {"relative_accuracy": self.relative_accuracy, "max_buckets": self.max_buckets,
+                "zero_count": self.zero_count, "buckets": dict(self.buckets)}
+
+    @staticmethod
+    def from_dict(data: dict) -> "QuantileSketch":
+        """
+        Rebuild a sketch from the output of `.to_dict()`
+        """
+        sketch = QuantileSketch(relative_accuracy=data["relative_accuracy"], max_buckets=data["max_buckets"])
+        sketch.buckets = dict((int(index), count) for index, count in data["buckets"].items())
+        sketch.zero_count = data["zero_count"]
+        sketch.count = sketch.zero_count + sum(sketch.buckets.values())
+        return sketch
 
 
 class Split:
-    best_fit_curves = {"Exponential": BestFitExponential, "Linear": BestFitLinear, "Logarithmic": BestFitLogarithmic,
+    # curves that fit equally well are resolved in favor of the one listed first, so the simplest goes first
+    best_fit_curves = {"Linear": BestFitLinear, "Exponential": BestFitExponential, "Logarithmic": BestFitLogarithmic,
                        "Polynomial": BestFitPolynomial}
+    percentiles = (50, 90, 99, 99.9)
 
-    def __init__(self, label: str="Split"):
+    def __init__(self, label: str="Split", quantiles: bool=False, resolution: int=1):
+        """
+        :param label: the label of the split
+        :param quantiles: keep a QuantileSketch of the measured times so `.statistics()` can report percentiles
+        :param resolution: the number of units of time in a second. 1 means times are fractional seconds, anything
+                    else means they are integer ticks of a clock, like 10**9 for `perf_counter_ns`
+        """
         self.runs: List[Run] = []
         self.label = label
+        self.resolution = resolution
+        self.accumulator = RunningStatistics()
+        self.sketch = QuantileSketch() if quantiles else None
+        self.overhead: Dict[str, float] = None  # set to the calibrated overhead if it was subtracted from the runs
+        self.stop_reason: str = None  # set by `Timer.auto_time_it()` to why it stopped adding runs
+        self.calls: int = None  # with `Timer.decorate(sample_every=)`, the number of calls the runs were sampled from
+        self.sampled_calls = 0  # and the number of those calls that were measured
+        self.metrics: Dict[str, RunningStatistics] = {}  # an accumulator for each metric the runs were measured with
+
+    def _update_statistics(self, run: Run):
+        """
+        Add a run's time to the accumulator and, if there is one, the quantile sketch, and its metrics to theirs
+        """
+        self.accumulator.add(run.time)
+        if self.sketch is not None:
+            self.sketch.add(run.time)
+
+        if run.metrics:
+            for key, value in run.metrics.items():
+                accumulator = self.metrics.get(key)
+                if accumulator is None:
+                    accumulator = self.metrics[key] = RunningStatistics()
+                accumulator.add(value)
 
     def add_run(self, run: Run):
         self.runs.append(run)
+        self._update_statistics(run)
+
+    def sort_runs(self, key: Union[str, int]=None, reverse: bool=False, transformer: callable=None):
+        """
+        Sort the runs in this split by time or by the value of a logged argument
+        :param key: the index of a positional argument or the name of a keyword argument to sort on. Defaults to time
+        :param reverse: whether to reverse the sort order of the runs or not
+        :param transformer: a callable that the argument's value is passed through before it is compared
+        """
+        self.runs.sort(reverse=reverse, key=self._sort_key(key, transformer))
+
+    @staticmethod
+    def _sort_key(key: Union[str, int], transformer: callable) -> callable:
+        """
+        Build a function that takes a Run and returns the value it should be sorted by
+        :param key: the index of a positional argument or the name of a keyword argument. If None, then time is used
+        :param transformer: a callable that the argument's value is passed through. Can be None
+        :return: the function to use as the key when sorting
+        """
+        if transformer is None:
+            transformer = lambda item: item
+
+        if key is None:
+            return lambda item: item.time
+        elif isinstance(key, int):
+            return lambda item: transformer(item.args[key])
+        else:
+            return lambda item: transformer(item.kwargs[key])
 
     def determine_best_fit(self, curve_type: str=any, exclude: Set[Union[str, int]]=(),
                            transformers: Union[callable, Dict[Union[str, int], callable]]=()
@@ -62,62 +333,22 @@ class Split:
         :return: A tuple of a string name for the best fit curve and a dict of the parameters for that curve
         """
         if MISSING_CURVE_FITTING:
-            raise RuntimeWarning("scikit-learn, scipy, and numpy are needed for curve fitting and could not be found")
-
-        trans_op = None
-        if transformers:
-            if callable(transformers):
-                trans_op = 1
-            else:
-                trans_op = 2
+            raise RuntimeWarning("numpy is needed for curve fitting and could not be found")
 
-        points = []
-        for run in self.runs:
-            if not run.args and not run.kwargs:
-                raise RuntimeWarning("Arguments must have been logged to determine a best fit curve")
-
-            # TRANSFORM ARGUMENTS
-            new_args, new_kwargs = list(run.args), dict(run.kwargs)
-            if transformers:
-                for i in range(len(new_args)):
-                    if i not in exclude:  # only transform if we aren't going to exclude it
-                        if trans_op == 1:  # we have a single callable, so use it everywhere
-                            new_args[i] = transformers(new_args[i])
-                        elif i in transformers:
-                            new_args[i] = transformers[i](new_args[i])
-
-                for key in new_kwargs:
-                    if key not in exclude:  # only transform if we aren't going to exclude it
-                        if trans_op == 1:  # we have a single callable, so use it everywhere
-                            new_kwargs[key] = transformers(new_kwargs[key])
-                        elif key in transformers:
-                            new_kwargs[key] = transformers[key](new_kwargs[key])
-
-            # ONLY KEEP NON-EXCLUDED ARGUMENTS
-            collapsed = dict((i, new_args[i]) for i in range(len(new_args)) if i not in exclude)
-            collapsed.update(dict((key, value) for key, value in new_kwargs.items() if key not in exclude))
-
-            # ENSURE INTEGERS OR FLOATS
-            for value in collapsed.values():
-                if not isinstance(value, (int, float)):
-                    raise RuntimeWarning(
-                        "All transformed, non-excluded argument values must be numbers to determine a best-fit-curve"
-                    )
-
-            points.append((collapsed, run.time))
+        keys, x, y = self._curve_arrays(exclude, transformers)
 
         if curve_type is any:
             best: Tuple[float, str, dict] = None  # tuple of distance, name, and parameters
             for bfc_name, bfc in self.best_fit_curves.items():
-                if not bfc.poll(points):
+                if not bfc.poll_keys(keys):
                     continue
 
-                params = bfc.calculate_curve(points)
+                params = bfc.fit(keys, x, y)
+                with np.errstate(over="ignore", invalid="ignore"):
+                    distance = np.abs(y - bfc.calculate_points(keys, x, params)).sum()
 
-                # DISTANCE
-                distance = 0
-                for point in points:
-                    distance += abs(point[1] - bfc.calculate_point(point[0], params))
+                if not np.isfinite(distance):  # the curve couldn't be fit to these arguments, like log(0)
+                    continue
 
                 if best is None or distance < best[0]:
                     best = (distance, bfc_name, params)
@@ -128,8 +359,8 @@ class Split:
                 return best[1], best[2]
         else:
             if curve_type in self.best_fit_curves:
-                if self.best_fit_curves[curve_type].poll(points):
-                    return curve_type, self.best_fit_curves[curve_type].calculate_curve(points)
+                if self.best_fit_curves[curve_type].poll_keys(keys):
+                    return curve_type, self.best_fit_curves[curve_type].fit(keys, x, y)
                 else:
                     raise RuntimeWarning(
                         "{}'s poll method returned that is couldn't run. There might be too many arguments.".format(
@@ -140,31 +371,543 @@ class Split:
                     curve_type, ", ".join(self.best_fit_curves.keys())
                 ))
 
+    def _logged_arguments(self) -> Tuple[List[Tuple[tuple, dict]], Sequence[float]]:
+        """
+        :return: the positional and keyword arguments of each run and the time of each run
+        """
+        runs = self.runs
+        return [(run.args, run.kwargs) for run in runs], [run.time for run in runs]
+
+    def _curve_arrays(self, exclude: Set[Union[str, int]],
+                      transformers: Union[callable, Dict[Union[str, int], callable]]
+                      ) -> Tuple[List[Union[str, int]], "np.ndarray", "np.ndarray"]:
+        """
+        Build the feature matrix and time vector used for curve fitting. Each non-excluded argument becomes a column,
+        its transformer is applied to the whole column at once, and the column is converted to a float array.
+        :param exclude: the indices or names of arguments to leave out
+        :param transformers: see `.determine_best_fit()`
+        :return: the index or name of the argument in each column, the feature matrix, and the time vector
+        """
+        arguments, times = self._logged_arguments()
+        if not arguments or any(not run_args and not run_kwargs for run_args, run_kwargs in arguments):
+            raise RuntimeWarning("Arguments must have been logged to determine a best fit curve")
+
+        first_args, first_kwargs = arguments[0]
+        if any(len(run_args) != len(first_args) or len(run_kwargs) != len(first_kwargs)
+               for run_args, run_kwargs in arguments):
+            raise RuntimeWarning("All runs must have the same arguments logged to determine a best-fit-curve")
+
+        keys = [i for i in range(len(first_args)) if i not in exclude]
+        keys.extend(key for key in first_kwargs if key not in exclude)
+
+        columns = []
+        for key in keys:
+            position = 0 if isinstance(key, int) else 1
+            try:
+                column = [run_arguments[position][key] for run_arguments in arguments]
+            except (IndexError, KeyError):
+                raise RuntimeWarning("All runs must have the same arguments logged to determine a best-fit-curve")
+
+            if transformers:
+                transformer = transformers if callable(transformers) else transformers.get(key)
+                if transformer is not None:
+                    column = [transformer(value) for value in column]
+
+            # ENSURE INTEGERS OR FLOATS
+            try:
+                column = np.array(column)
+            except ValueError:
+                column = None
+            if column is None or column.ndim != 1 or column.dtype.kind not in "biuf":
+                raise RuntimeWarning(
+                    "All transformed, non-excluded argument values must be numbers to determine a best-fit-curve"
+                )
+
+            columns.append(column)
+
+        x = np.column_stack(columns).astype(float) if columns else np.empty((len(arguments), 0))
+        return keys, x, np.asarray(times, dtype=float)
+
     def statistics(self) -> Dict[str, Union[float, int]]:
         """
-        Calculate all statistics and return them as a map. The statistics that will be calculated are: `min`, `max`,
-        `average`, `total`, `count`, `standard_deviation`, and `variance`
+        Return all statistics as a map. The statistics are: `min`, `max`, `average`, `total`, `count`,
+        `standard_deviation`, and `variance`
         `average`: sum(x) / n
         `standard_deviation`: sqrt(sum (x - average)**2 / n)
+        If the split was created with `quantiles=True`, then estimates for each of `Split.percentiles` are included
+        with keys like `p50` and `p99.9`.
+        The values come from `.accumulator`, which is updated by `.add_run()`, so this takes constant time. If runs were
+        added to `.runs` directly, the accumulator is rebuilt first.
         :return: a map of the key names listed above to the associated values
         """
-        stats = {
-            "total": sum(run.time for run in self.runs),
-            "min": min(run.time for run in self.runs),  # there are faster ways to get max and min,
-            "max": max(run.time for run in self.runs),  # but the savings will be very minimal since len(runs) is small
-            "count": len(self.runs)
-        }
-
-        if self.runs:
-            stats["average"] = stats["total"] / len(self.runs)
-            stats["standard_deviation"] = sqrt(
-                sum((run.time - stats["average"]) ** 2 for run in self.runs) /
-                len(self.runs)
-            )
-            stats["variance"] = stats["standard_deviation"] ** 2
+        if self.accumulator.count != len(self.runs):
+            self.accumulator = RunningStatistics()
+            self.metrics = {}
+            if self.sketch is not None:
+                self.sketch = QuantileSketch(self.sketch.relative_accuracy, self.sketch.max_buckets)
+
+            for run in self.runs:
+                self._update_statistics(run)
+
+        return self._accumulated_statistics()
+
+    def _accumulated_statistics(self) -> Dict[str, Union[float, int]]:
+        """
+        Read the statistics from the accumulator and add the percentiles if there is a quantile sketch. If the runs
+        were sampled, then also add the number of `calls`, the `sample_rate`, and the `estimated_total` time of every
+        call, sampled or not. If the runs were measured with probes, then `metrics` maps each metric to its statistics.
+        If every run was measured with a CPUProbe, then `cpu_utilization` is the CPU time of the process divided by
+        the wall time, and `off_cpu_time` is the wall time during which the measuring thread wasn't running, like while
+        it waited on I/O or a lock, in the same units as `total`. If every run was measured with a GCProbe, then
+        `gc_time` is the time spent collecting garbage, and `total_excluding_gc` and `average_excluding_gc` leave it
+        out.
+        """
+        stats = self.accumulator.statistics()
+        if self.sketch is not None:
+            for percentile in self.percentiles:
+                stats["p{}".format(percentile)] = self.sketch.quantile(percentile / 100)
+
+        if self.calls is not None:
+            stats["calls"] = self.calls
+            stats["sample_rate"] = self.sampled_calls / self.calls if self.calls else 0
+            stats["estimated_total"] = stats["total"] / stats["sample_rate"] if stats["sample_rate"] else 0
+
+        if self.metrics:
+            stats["metrics"] = dict((key, accumulator.statistics()) for key, accumulator in self.metrics.items())
+
+            process, thread = self.metrics.get("process_time"), self.metrics.get("thread_time")
+            if process is not None and thread is not None and process.count == thread.count == stats["count"]:
+                stats["cpu_utilization"] = process.total * self.resolution / stats["total"] if stats["total"] else 0
+                stats["off_cpu_time"] = max(stats["total"] - thread.total * self.resolution, 0)
+
+            collecting = self.metrics.get("gc_time")
+            if collecting is not None and collecting.count == stats["count"]:
+                stats["gc_time"] = collecting.total * self.resolution
+                stats["total_excluding_gc"] = max(stats["total"] - stats["gc_time"], 0)
+                stats["average_excluding_gc"] = stats["total_excluding_gc"] / stats["count"]
+
+        return stats
+
+
+class RunView:
+    """
+    A read-only sequence of Runs over the columns of a ColumnarSplit. Runs are built on access, so changing one of them
+    does not change what is stored in the split.
+    """
+    def __init__(self, split: "ColumnarSplit"):
+        self._split = split
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Run, List[Run]]:
+        if isinstance(index, slice):
+            return [self._split.get_run(i) for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("run index out of range")
+
+        return self._split.get_run(index)
+
+    def __iter__(self) -> Iterator[Run]:
+        for i in range(len(self)):
+            yield self._split.get_run(i)
+
+    def __len__(self) -> int:
+        return len(self._split.times)
+
+    def append(self, run: Run):
+        self._split.add_run(run)
+
+    def sort(self, key: callable=None, reverse: bool=False):
+        """
+        Sort the underlying columns using a key function that is given a Run, just like `list.sort`
+        """
+        if key is None:
+            raise RuntimeWarning("Runs are not comparable, a key must be given to sort them")
+
+        self._split.reorder(sorted(range(len(self)), key=lambda i: key(self._split.get_run(i)), reverse=reverse))
+
+
+class ColumnarSplit(Split):
+    """
+    A Split that stores its runs column-wise in contiguous arrays instead of as a list of Run objects. The time, runs,
+    and iterations_per_run of each run are kept in `array`s, labels are stored once and referenced by index, and
+    logged arguments and metrics are kept in side tables only for the runs that have them. `.runs` is a RunView which
+    builds Runs on access so existing code can treat this the same as a Split. Integer times, when `resolution` isn't
+    1, are stored as 64-bit integers so nothing is lost.
+    """
+    def __init__(self, label: str="Split", quantiles: bool=False, resolution: int=1):
+        super().__init__(label=label, quantiles=quantiles, resolution=resolution)
+        self.times = array("d" if resolution == 1 else "q")
+        self.run_counts = array("I")
+        self.iterations = array("I")
+        self.label_indices = array("I")
+        self.labels: List[str] = []
+        self.arguments: Dict[int, Tuple[tuple, dict]] = {}
+        self.run_metrics: Dict[int, Dict[str, float]] = {}
+        self._label_lookup: Dict[str, int] = {}
+        self.runs = RunView(self)
+
+    def add_run(self, run: Run):
+        index = self._label_lookup.get(run.label)
+        if index is None:
+            index = self._label_lookup[run.label] = len(self.labels)
+            self.labels.append(run.label)
+
+        if run.args or run.kwargs:
+            self.arguments[len(self.times)] = (tuple(run.args), dict(run.kwargs))
+        if run.metrics:
+            self.run_metrics[len(self.times)] = dict(run.metrics)
+
+        self.times.append(run.time)
+        self._update_statistics(run)
+        self.run_counts.append(run.runs)
+        self.iterations.append(run.iterations_per_run)
+        self.label_indices.append(index)
+
+    def get_run(self, index: int) -> Run:
+        """
+        Build a Run from the values stored in the columns at `index`
+        :param index: the position of the run in the split
+        :return: a new Run containing the stored values
+        """
+        args, kwargs = self.arguments.get(index, ((), {}))
+        return Run(label=self.labels[self.label_indices[index]], time=self.times[index],
+                   runs=self.run_counts[index], iterations_per_run=self.iterations[index], args=args, kwargs=kwargs,
+                   metrics=self.run_metrics.get(index, ()))
+
+    def _logged_arguments(self) -> Tuple[List[Tuple[tuple, dict]], Sequence[float]]:
+        empty = ((), {})
+        return [self.arguments.get(i, empty) for i in range(len(self.times))], self.times
+
+    def reorder(self, order: List[int]):
+        """
+        Rearrange all of the columns so that the run at `order[i]` ends up at position `i`
+        :param order: a permutation of the indices of the runs
+        """
+        for name in ("times", "run_counts", "iterations", "label_indices"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, (column[i] for i in order)))
+
+        self.arguments = dict((new, self.arguments[old]) for new, old in enumerate(order) if old in self.arguments)
+        self.run_metrics = dict((new, self.run_metrics[old]) for new, old in enumerate(order)
+                                if old in self.run_metrics)
+
+    def sort_runs(self, key: Union[str, int]=None, reverse: bool=False, transformer: callable=None):
+        if key is None:
+            times = self.times
+            self.reorder(sorted(range(len(times)), key=times.__getitem__, reverse=reverse))
+        else:
+            if transformer is None:
+                transformer = lambda item: item
+
+            position = 0 if isinstance(key, int) else 1
+            self.reorder(sorted(
+                range(len(self.times)),
+                key=lambda i: transformer(self.arguments.get(i, ((), {}))[position][key]),
+                reverse=reverse
+            ))
+
+
+class MappedSplit(ColumnarSplit):
+    """
+    A ColumnarSplit whose columns are read-only memoryviews over a saved file, usually memory-mapped, see
+    `exectiming.storage`. Nothing is read until it is needed: `.statistics()` comes from the saved accumulator and
+    sketch, best fit curves read the times straight from the buffer, and the argument and metric tables are only
+    unpickled the first time they are used. Adding or reordering runs copies the columns into memory first, so the file
+    is never changed.
+    """
+    def __init__(self, label: str, resolution: int, columns: Dict[str, memoryview], labels: List[str],
+                 pickled_arguments: memoryview, accumulator: RunningStatistics, sketch: QuantileSketch=None,
+                 pickled_run_metrics: memoryview=b"", metrics: Dict[str, RunningStatistics]=()):
+        """
+        :param label: the label of the split
+        :param resolution: the number of units of time in a second, see `Split()`
+        :param columns: a map of the names of the columns of a ColumnarSplit to memoryviews of their values
+        :param labels: the run labels that `label_indices` refers to
+        :param pickled_arguments: the pickled map of run indices to logged arguments
+        :param accumulator: the statistics of every run in the split
+        :param sketch: the quantile sketch of the runs, if they had one
+        :param pickled_run_metrics: the pickled map of run indices to the metrics measured by probes
+        :param metrics: the statistics of each metric of every run in the split
+        """
+        super().__init__(label=label, resolution=resolution)
+        for name, column in columns.items():
+            setattr(self, name, column)
+
+        self.labels = list(labels)
+        self._label_lookup = dict((run_label, i) for i, run_label in enumerate(self.labels))
+        self._arguments = None
+        self._pickled_arguments = pickled_arguments
+        self._run_metrics = None
+        self._pickled_run_metrics = pickled_run_metrics
+        self.accumulator = accumulator
+        self.sketch = sketch
+        self.metrics = dict(metrics)
+
+    @property
+    def arguments(self) -> Dict[int, Tuple[tuple, dict]]:
+        """
+        The logged arguments of each run, unpickled on first use
+        """
+        if self._arguments is None:
+            self._arguments = loads(self._pickled_arguments) if len(self._pickled_arguments) else {}
+            self._pickled_arguments = None
+
+        return self._arguments
+
+    @arguments.setter
+    def arguments(self, arguments: Dict[int, Tuple[tuple, dict]]):
+        self._arguments = arguments
+
+    @property
+    def run_metrics(self) -> Dict[int, Dict[str, float]]:
+        """
+        The metrics of each run, unpickled on first use
+        """
+        if self._run_metrics is None:
+            self._run_metrics = loads(self._pickled_run_metrics) if len(self._pickled_run_metrics) else {}
+            self._pickled_run_metrics = None
+
+        return self._run_metrics
+
+    @run_metrics.setter
+    def run_metrics(self, run_metrics: Dict[int, Dict[str, float]]):
+        self._run_metrics = run_metrics
+
+    def _materialize(self):
+        """
+        Copy any columns that are still memoryviews into arrays so they can be changed
+        """
+        for name in ("times", "run_counts", "iterations", "label_indices"):
+            column = getattr(self, name)
+            if isinstance(column, memoryview):
+                copy = array(column.format)
+                copy.frombytes(column.cast("B"))
+                setattr(self, name, copy)
+
+    def add_run(self, run: Run):
+        self._materialize()
+        super().add_run(run)
+
+    def reorder(self, order: List[int]):
+        self._materialize()
+        super().reorder(order)
+
+    def statistics(self) -> Dict[str, Union[float, int]]:
+        return self._accumulated_statistics()  # the accumulator always covers every run, so never rebuild it
+
+
+class SpanNode:
+    """
+    A node in a SpanTree, aggregating every span that was entered with the same path of labels. `inclusive` is the time
+    spent in those spans, `child_time` is the part of it spent in nested spans, and `exclusive` is the rest.
+    """
+    __slots__ = ("label", "parent", "children", "count", "inclusive", "child_time")
+
+    def __init__(self, label: str=None, parent: "SpanNode"=None):
+        self.label = label
+        self.parent = parent
+        self.children: Dict[str, SpanNode] = {}
+        self.count = 0
+        self.inclusive = 0
+        self.child_time = 0
+
+    def child(self, label: str) -> "SpanNode":
+        """
+        :return: the child node with `label`, which is created if it doesn't exist
+        """
+        node = self.children.get(label)
+        if node is None:
+            node = self.children.setdefault(label, SpanNode(label, self))  # setdefault so threads agree on the node
+
+        return node
+
+    @property
+    def exclusive(self) -> float:
+        return self.inclusive - self.child_time
+
+    @property
+    def path(self) -> Tuple[str, ...]:
+        """
+        The labels of every span from the outermost down to this one
+        """
+        labels = []
+        node = self
+        while node.parent is not None:
+            labels.append(node.label)
+            node = node.parent
+
+        return tuple(reversed(labels))
+
+
+class SpanTree:
+    """
+    A call tree of nested spans, aggregated by path, so a span that is entered many times, or from many places, is
+    only stored once for each distinct path leading to it. The root has no label and collects the time of the
+    outermost spans in its `child_time`.
+    """
+    def __init__(self):
+        self.root = SpanNode()
+
+    @staticmethod
+    def record(node: SpanNode, parent: SpanNode, elapsed: float):
+        """
+        Add a finished span to the tree
+        :param node: the node of the span
+        :param parent: the node of the span it was nested in, or the root
+        :param elapsed: the time the span took
+        """
+        node.count += 1
+        node.inclusive += elapsed
+        parent.child_time += elapsed
+
+    def nodes(self) -> Iterator[SpanNode]:
+        """
+        Yield every node other than the root, depth-first, with the children of a node in the order they were first
+        entered
+        """
+        stack = list(reversed(list(self.root.children.values())))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(list(node.children.values())))
+
+    def statistics(self) -> Dict[Tuple[str, ...], Dict[str, Union[float, int]]]:
+        """
+        :return: a map of the path of each node to its `count`, `inclusive`, `exclusive`, and `average` (inclusive)
+                    time
+        """
+        return dict((node.path, {"count": node.count, "inclusive": node.inclusive, "exclusive": node.exclusive,
+                                 "average": node.inclusive / node.count if node.count else 0})
+                    for node in self.nodes())
+
+
+class BoundedSplit(Split):
+    """
+    A Split that only keeps a limited number of runs, or only runs that are younger than a maximum age, so it can be
+    used with something that is timed forever, like a request handler. Runs beyond `max_runs` are evicted according to
+    `policy`:
+        `BoundedSplit.FIFO`: a ring buffer of the most recent runs
+        `BoundedSplit.RESERVOIR`: a uniform random sample of every run ever added (reservoir sampling)
+        `BoundedSplit.SLOWEST`: the `max_runs` runs with the longest times
+    `.statistics()` is based on every run that was ever added, not just the ones that are kept. `.runs` is rebuilt on
+    each access, so runs must be added with `.add_run()`.
+    """
+    FIFO, RESERVOIR, SLOWEST = "fifo", "reservoir", "slowest"
+
+    def __init__(self, label: str="Split", quantiles: bool=False, max_runs: int=None, max_age: float=None,
+                 policy: str=FIFO, resolution: int=1):
+        """
+        :param label: the label of the split
+        :param quantiles: keep a QuantileSketch of the measured times so `.statistics()` can report percentiles
+        :param max_runs: the maximum number of runs to keep
+        :param max_age: the number of seconds a run is kept for after it is added
+        :param policy: how to decide which runs to keep when there are more than `max_runs`
+        :param resolution: the number of units of time in a second, see `Split()`
+        """
+        if max_runs is None and max_age is None:
+            raise RuntimeWarning("A BoundedSplit needs max_runs and/or max_age")
+        if policy not in (self.FIFO, self.RESERVOIR, self.SLOWEST):
+            raise RuntimeWarning("{} is an invalid policy. Must be in [{}]".format(
+                policy, ", ".join((self.FIFO, self.RESERVOIR, self.SLOWEST))
+            ))
+
+        self.max_runs = max_runs
+        self.max_age = max_age
+        self.policy = policy
+        self._order = None
+        self._sequence = 0
+        self._next_expiration = None
+        super().__init__(label=label, quantiles=quantiles, resolution=resolution)
+
+    @property
+    def runs(self) -> List[Run]:
+        """
+        The runs that are currently kept, in the order they were added unless `.sort_runs()` has been called
+        """
+        self._expire()
+        # a heap for SLOWEST and replaced in place for RESERVOIR, so only FIFO is already in the order runs were added
+        entries = self._entries if self.policy == self.FIFO else sorted(self._entries, key=lambda entry: entry[1])
+        runs = [entry[3] for entry in entries]
+
+        if self._order is not None:
+            key, reverse, transformer = self._order
+            runs.sort(reverse=reverse, key=self._sort_key(key, transformer))
+
+        return runs
+
+    @runs.setter
+    def runs(self, runs: List[Run]):
+        """
+        Replace the kept runs. The statistics are not changed.
+        """
+        self._entries = deque(maxlen=self.max_runs) if self.policy == self.FIFO else []
+        for run in runs:
+            self._keep(run)
+
+    def _expire(self):
+        """
+        Remove any runs that are older than `max_age`. Only walks the runs once the oldest one could have expired.
+        """
+        if self._next_expiration is None or monotonic() < self._next_expiration:
+            return
+
+        cutoff = monotonic() - self.max_age
+        if self.policy == self.FIFO:
+            while self._entries and self._entries[0][2] < cutoff:
+                self._entries.popleft()
         else:
-            stats["average"] = 0
-            stats["standard_deviation"] = 0
-            stats["variance"] = 0
+            self._entries = [entry for entry in self._entries if entry[2] >= cutoff]
+            self._entries.sort()  # a sorted list is a valid heap for SLOWEST
 
+        if self._entries:
+            self._next_expiration = min(entry[2] for entry in self._entries) + self.max_age
+        else:
+            self._next_expiration = None
+
+    def _keep(self, run: Run):
+        """
+        Store a run according to the eviction policy. Entries are (rank, sequence, timestamp, run) where rank is the
+        time for SLOWEST, so the heap keeps the fastest run at the front, and the sequence otherwise.
+        """
+        timestamp = monotonic() if self.max_age is not None else 0
+        self._sequence += 1
+        entry = (run.time if self.policy == self.SLOWEST else self._sequence, self._sequence, timestamp, run)
+
+        if self.policy == self.FIFO or self.max_runs is None or len(self._entries) < self.max_runs:
+            if self.policy == self.SLOWEST:
+                heappush(self._entries, entry)
+            else:
+                self._entries.append(entry)  # a full deque drops its oldest entry
+        elif self.policy == self.SLOWEST:
+            if entry[:2] > self._entries[0][:2]:
+                heapreplace(self._entries, entry)
+        else:
+            index = randrange(self._sequence)
+            if index < self.max_runs:
+                self._entries[index] = entry
+
+        if self.max_age is not None and self._next_expiration is None:
+            self._next_expiration = timestamp + self.max_age
+
+    def add_run(self, run: Run):
+        self._expire()
+        self._keep(run)
+        self._update_statistics(run)
+
+    def sort_runs(self, key: Union[str, int]=None, reverse: bool=False, transformer: callable=None):
+        """
+        Set the order `.runs` is returned in. The order is kept for runs that are added later, and it does not change
+        which runs are evicted.
+        """
+        self._order = (key, reverse, transformer)
+
+    def statistics(self) -> Dict[str, Union[float, int]]:
+        """
+        Return the statistics for every run that has ever been added, see `Split.statistics()`. `retained` is the
+        number of runs currently kept.
+        """
+        stats = self._accumulated_statistics()
+        stats["retained"] = len(self.runs)
         return stats
@@ -14,24 +14,73 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from time import perf_counter
-from typing import Union, Tuple, List, TextIO, Dict, Set
+from time import perf_counter, perf_counter_ns
+from math import ceil, erf, sqrt
+from typing import Union, Tuple, List, TextIO, Dict, Set, Iterable, Sequence
 from functools import wraps
 from sys import stdout
-from .data_structures import Run, Split
+from collections import deque
+from threading import Lock, current_thread, local
+from inspect import iscoroutinefunction
+from itertools import product
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
+from .comparison import compare_splits
+from .data_structures import Run, SpanNode, SpanTree, Split
+from .lazy_module import LazyModule, is_available
+from .probes import Probe, start_probes, stop_probes
+from .exporters import exporters
+from .storage import load_splits, save_splits
 from contextlib import contextmanager
+from textwrap import dedent, indent
 
-try:
-    import matplotlib.pyplot as plt
-    MISSING_MAT_PLOT = False
-except ImportError:
-    MISSING_MAT_PLOT = True
+# matplotlib is only imported when .plot() is first called, as importing it takes much longer than importing exectiming
+plt = LazyModule("matplotlib.pyplot")
+MISSING_MAT_PLOT = not is_available("matplotlib")
+
+
+def _empty():
+    """
+    Does nothing, so timing it measures only the overhead of the timing harness
+    """
+    pass
+
+
+# the generator generated for a string `block`. Like `timeit`, the loop is compiled along with `block` so that
+# measuring an iteration doesn't include parsing `block` again. `setup` is executed once, when the generator is first
+# advanced, and each (runs, iterations per run, clock, probes) sent to it after that measures another round of runs in
+# the same frame, so names from `setup` stay fast locals
+_block_template = """
+def _timed_rounds():
+{setup}
+    _value = None
+    _result = None
+    while True:
+        _runs, _iterations_per_run, _clock, _probes = yield _result
+        _times = []
+        _metrics = []
+        for _ in range(_runs):
+            _tokens = _start_probes(_probes) if _probes else None
+            try:
+                _st = _clock()
+                for _ in range(_iterations_per_run):
+{block}
+                _times.append(_clock() - _st)
+            except BaseException:
+                if _probes:
+                    _stop_probes(_probes, _tokens)
+                raise
+            _metrics.append(_stop_probes(_probes, _tokens) if _probes else {{}})
+        _result = _value, _times, _metrics
+"""
 
 
 class BaseTimer:
     S, MS, US, NS = "s", "ms", "us", "ns"
     _conversion = {S: 1, MS: 10**3, US: 10**6, NS: 10**9}
     _time = perf_counter
+    _calibrations: Dict[Tuple[callable, bool], Dict[str, float]] = {}  # (clock, string_block) -> overhead
 
     @staticmethod
     def _argument_copier(args: tuple, kwargs: dict, copiers: Union[callable, Dict[Union[str, int], callable]]
@@ -64,6 +113,99 @@ class BaseTimer:
 
         return out_args, out_kwargs
 
+    @staticmethod
+    async def _await_runs(func: callable, args: tuple, kwargs: dict, runs: int, iterations_per_run: int,
+                          call_callable_args: bool, copiers: Union[callable, Dict[Union[str, int], callable]],
+                          clock: callable, probes: Sequence[Probe]=()) -> Tuple[any, List[Tuple[float, tuple, dict,
+                                                                                                dict]]]:
+        """
+        Measure the execution time of a coroutine function by awaiting it. Any time the coroutine spends suspended is
+        included, as that is part of how long it takes to complete. All state is local, so any number of tasks can be
+        measured at the same time.
+        :param func: the coroutine function to await
+        :param args: the positional arguments to call `func` with
+        :param kwargs: the keyword arguments to call `func` with
+        :param runs: the number of runs to measure
+        :param iterations_per_run: the number of times to await `func` for each run
+        :param call_callable_args: whether to replace callable arguments with their return value for each run
+        :param copiers: function(s) used to copy the arguments before each iteration, see `StaticTimer.time_it()`
+        :param clock: the function used to get the current time
+        :param probes: probes to measure each run with, see `exectiming.probes`
+        :return: the value of the last await and a list of the measured time, positional arguments, keyword
+                    arguments, and metrics for each run
+        """
+        measured = []
+        value = None
+
+        for _ in range(runs):
+            if call_callable_args:
+                run_args, run_kwargs = BaseTimer._call_callable_args(args, kwargs)
+            else:
+                run_args, run_kwargs = args, kwargs
+
+            tokens = start_probes(probes) if probes else None
+            try:
+                st = clock()
+                for _ in range(iterations_per_run):
+                    if copiers is not None:
+                        delta = clock()
+                        iteration_args, iteration_kwargs = BaseTimer._argument_copier(run_args, run_kwargs, copiers)
+                        st += clock() - delta  # ignore the amount of time needed to copy the arguments
+                    else:
+                        iteration_args, iteration_kwargs = run_args, run_kwargs
+
+                    value = await func(*iteration_args, **iteration_kwargs)
+
+                time = clock() - st
+            except BaseException:  # the probes may have changed global state, like disabling the garbage collector
+                if probes:
+                    stop_probes(probes, tokens)
+                raise
+
+            measured.append((time, run_args, run_kwargs, stop_probes(probes, tokens) if probes else {}))
+
+        return value, measured
+
+    @staticmethod
+    def calibrate(clock: callable=perf_counter, samples: int=200, iterations: int=1000, recalibrate: bool=False,
+                  string_block: bool=False) -> Dict[str, float]:
+        """
+        Measure the overhead of the timing harness on this machine. Every run includes the calls to `clock` and setting
+        up the loop, and every iteration includes the loop itself, the checks on `block` and `copiers`, and calling a
+        function. Those costs are measured by timing a function that does nothing, and the minimum of `samples` runs is
+        used, as anything above it is noise. The result is cached for each clock, so only the first call takes any time.
+        The overhead is measured without `copiers`.
+        :param clock: the function used to get the current time
+        :param samples: the number of runs to take the minimum of
+        :param iterations: the number of iterations in each run used to measure the overhead of an iteration
+        :param recalibrate: measure the overhead again, even if it has already been cached
+        :param string_block: measure the overhead of timing a string block, which is only the compiled loop, instead
+                    of a callable
+        :return: a map with the overhead of each run, "run", and of each iteration, "iteration", in seconds
+        """
+        key = (clock, string_block)
+        if recalibrate or key not in BaseTimer._calibrations:
+            block = "pass" if string_block else _empty
+            run_arguments = [((), {})] * samples
+            _, empty = BaseTimer._measure_runs(block, run_arguments, 0, clock=clock)
+            _, full = BaseTimer._measure_runs(block, run_arguments, iterations, clock=clock)
+
+            run = min(time for time, _, _, _ in empty)
+            iteration = max((min(time for time, _, _, _ in full) - run) / iterations, 0.0)
+            BaseTimer._calibrations[key] = {"run": run, "iteration": iteration}
+
+        return dict(BaseTimer._calibrations[key])
+
+    @staticmethod
+    def _run_overhead(iterations_per_run: int, clock: callable, string_block: bool=False) -> float:
+        """
+        :return: the calibrated overhead, in seconds, of a run with `iterations_per_run` iterations
+        """
+        overhead = BaseTimer.calibrate(clock, string_block=string_block)
+        run_overhead = overhead["run"] + overhead["iteration"] * iterations_per_run
+
+        return round(run_overhead) if isinstance(overhead["run"], int) else run_overhead  # keep integer clocks exact
+
     @staticmethod
     def _call_callable_args(args: tuple, kwargs: dict) -> Tuple[list, dict]:
         """
@@ -89,19 +231,202 @@ class BaseTimer:
         return out_args, out_kwargs
 
     @staticmethod
-    def _convert_time(time: float, time_unit: str, round_it=True, rounding=5) -> float:
+    def _compile_block(block: str, setup: str="", globals: dict=(), locals: dict=()) -> callable:
+        """
+        Compile a string block, and any setup, into a function that measures every run of it, see `_block_template`.
+        `setup` is executed right away, and only once no matter how many times the function is called. If `block` is
+        an expression, then the function returns its value from the last iteration, otherwise, `block` can be any
+        number of statements and the value is None.
+        :param block: the code to time
+        :param setup: code that is executed once, before the first run
+        :param globals: the global namespace `block` and `setup` are executed in
+        :param locals: names that are added to the namespace, shadowing any in `globals`
+        :return: a function taking a tuple of the number of runs, the number of iterations in each run, the clock, and
+                    any probes, and returning the value of `block`, the measured time of each run, and the metrics of
+                    each run
+        """
+        block = dedent(block).strip()
+        try:
+            compile(block, "<block>", "eval")
+            body = "_value = (\n{}\n)".format(block)  # on separate lines so a trailing comment doesn't matter
+        except SyntaxError:
+            body = block
+
+        namespace = dict(globals) if globals else {}
+        if locals:
+            namespace.update(locals)
+        namespace.update(_start_probes=start_probes, _stop_probes=stop_probes)
+
+        source = _block_template.format(setup=indent(dedent(setup).strip() or "pass", " " * 4),
+                                        block=indent(body, " " * 20))
+        exec(compile(source, "<block>", "exec"), namespace)
+
+        rounds = namespace["_timed_rounds"]()
+        next(rounds)  # executes `setup`
+        return rounds.send
+
+    @staticmethod
+    def _run_arguments(args: tuple, kwargs: dict, runs: int, call_callable_args: bool) -> Iterable[Tuple[tuple, dict]]:
+        """
+        Yield the positional and keyword arguments to use for each run
+        :param args: the positional arguments
+        :param kwargs: the keyword arguments
+        :param runs: the number of runs
+        :param call_callable_args: whether to replace callable arguments with their return value for each run
+        """
+        for _ in range(runs):
+            if call_callable_args:
+                yield BaseTimer._call_callable_args(args, kwargs)
+            else:
+                yield args, kwargs
+
+    @staticmethod
+    def _measure_runs(block: Union[str, callable], run_arguments: Iterable[Tuple[tuple, dict]],
+                      iterations_per_run: int, copiers: Union[callable, Dict[Union[str, int], callable]]=None,
+                      globals: dict=(), locals: dict=(), setup: str="", clock: callable=perf_counter,
+                      probes: Sequence[Probe]=()) -> Tuple[any, List[Tuple[float, tuple, dict, dict]]]:
+        """
+        Measure the execution time of `block` once for each set of arguments in `run_arguments`. This is what
+        `.time_it()` uses, either directly or in each worker process when `workers` is set, so it must stay a static
+        method that can be pickled.
+        :param block: either a callable or a string, which is compiled once, see `._compile_block()`
+        :param run_arguments: the positional and keyword arguments to use for each run. Ignored if `block` is a string,
+                    other than to know how many runs there are
+        :param iterations_per_run: the number of times to call/execute `block` for each run
+        :param copiers: function(s) used to copy the arguments before each iteration, see `StaticTimer.time_it()`
+        :param globals: a global namespace to execute `block` in if it is a string
+        :param locals: names to add to the namespace if `block` is a string
+        :param setup: executed once before `block` if `block` is a string
+        :param clock: the function used to get the current time
+        :param probes: probes to measure each run with, see `exectiming.probes`
+        :return: the value of the last call/evaluation and a list of the measured time, positional arguments, keyword
+                    arguments, and metrics for each run
+        """
+        if not callable(block):
+            run_arguments = list(run_arguments)
+            value, times, metrics = BaseTimer._compile_block(block, setup, globals, locals)(
+                (len(run_arguments), iterations_per_run, clock, probes)
+            )
+
+            return value, [(time, run_args, run_kwargs, run_metrics) for time, (run_args, run_kwargs), run_metrics
+                           in zip(times, run_arguments, metrics)]
+
+        measured = []
+        value = None
+
+        for run_args, run_kwargs in run_arguments:
+            tokens = start_probes(probes) if probes else None
+            try:
+                st = clock()
+                for _ in range(iterations_per_run):
+                    if copiers is not None:  # conditional should have minimal effect on execution time
+                        delta = clock()
+                        iteration_args, iteration_kwargs = BaseTimer._argument_copier(run_args, run_kwargs, copiers)
+                        st += clock() - delta  # ignore the amount of time needed to copy the arguments
+                    else:
+                        iteration_args, iteration_kwargs = run_args, run_kwargs
+
+                    value = block(*iteration_args, **iteration_kwargs)
+
+                time = clock() - st
+            except BaseException:  # the probes may have changed global state, like disabling the garbage collector
+                if probes:
+                    stop_probes(probes, tokens)
+                raise
+
+            measured.append((time, run_args, run_kwargs, stop_probes(probes, tokens) if probes else {}))
+
+        return value, measured
+
+    @staticmethod
+    def _measure_parallel(block: Union[str, callable], run_arguments: Iterable[Tuple[tuple, dict]], workers: int,
+                          iterations_per_run: int, copiers: Union[callable, Dict[Union[str, int], callable]]=None,
+                          globals: dict=(), locals: dict=(), setup: str="", clock: callable=perf_counter,
+                          probes: Sequence[Probe]=()) -> Tuple[any, List[Tuple[float, tuple, dict, dict]]]:
+        """
+        The same as `._measure_runs()`, but the runs are split into `workers` contiguous chunks which are measured in a
+        pool of processes. The results are put back together in the same order as `run_arguments`, so the outcome does
+        not depend on which worker finishes first. `block`, the arguments, `copiers`, the namespaces, and the probes
+        must all be picklable.
+        :param workers: the number of worker processes
+        :return: see `._measure_runs()`. The value is the one returned by the worker that measured the last chunk
+        """
+        run_arguments = list(run_arguments)
+        if not run_arguments:
+            return None, []
+
+        workers = min(workers, len(run_arguments))
+        size = -(-len(run_arguments) // workers)  # ceiling division so there are at most `workers` chunks
+        chunks = [run_arguments[i:i + size] for i in range(0, len(run_arguments), size)]
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(BaseTimer._measure_runs, block, chunk, iterations_per_run, copiers, globals, locals,
+                                   setup, clock, probes) for chunk in chunks]
+            results = [future.result() for future in futures]
+
+        return results[-1][0], [measurement for _, measured in results for measurement in measured]
+
+    @staticmethod
+    def _z_score(confidence: float) -> float:
+        """
+        Find the z-score such that `confidence` of a normal distribution is within that many standard deviations of the
+        mean, by bisecting on the error function
+        :param confidence: the fraction of the distribution, between 0 and 1
+        :return: the z-score
+        """
+        lower, upper = 0.0, 10.0
+        for _ in range(60):
+            middle = (lower + upper) / 2
+            if erf(middle / sqrt(2)) < confidence:
+                lower = middle
+            else:
+                upper = middle
+
+        return (lower + upper) / 2
+
+    @staticmethod
+    def _confidence_interval(times: List[float], statistic: str="mean", confidence: float=0.95
+                             ) -> Tuple[float, float, float]:
+        """
+        Estimate the mean or median of the measured times along with a confidence interval. The interval of the mean
+        uses the normal approximation. The interval of the median is distribution-free and uses the order statistics
+        whose ranks are `z*sqrt(n)/2` on either side of the middle, so it is robust to outliers.
+        :param times: the measured times, at least two
+        :param statistic: either "mean" or "median"
+        :param confidence: the confidence level of the interval, between 0 and 1
+        :return: the lower bound, the estimate, and the upper bound
+        """
+        n = len(times)
+        z = BaseTimer._z_score(confidence)
+
+        if statistic == "mean":
+            mean = sum(times) / n
+            half_width = z * sqrt(sum((time - mean)**2 for time in times) / (n - 1) / n)
+            return mean - half_width, mean, mean + half_width
+        elif statistic == "median":
+            ordered = sorted(times)
+            median = (ordered[(n - 1) // 2] + ordered[n // 2]) / 2
+            offset = z * sqrt(n) / 2
+            return ordered[max(int((n - 1) / 2 - offset), 0)], median, ordered[min(ceil((n - 1) / 2 + offset), n - 1)]
+        else:
+            raise RuntimeWarning("{} is not a valid statistic, use 'mean' or 'median'".format(statistic))
+
+    @staticmethod
+    def _convert_time(time: float, time_unit: str, round_it=True, rounding=5, resolution: int=1) -> float:
         """
         Convert and round a time from BaseTimer._time to the unit specified
         :param time: the amount of time, in fractional seconds if using perf_counter()
         :param time_unit: the unit to convert to, in BaseTimer.[S | MS | US | NS]
         :param round_it: whether to round or not
         :param rounding: the amount to round
+        :param resolution: the number of units of `time` in a second, like 10**9 if it is from perf_counter_ns(). For
+                    integer times, the multiplication is exact and there is only a single rounding, in the division.
         :return: the converted and rounded time
         """
         if round_it:
-            return round(time * BaseTimer._conversion[time_unit], rounding)
+            return round(time * BaseTimer._conversion[time_unit] / resolution, rounding)
         else:
-            return time * BaseTimer._conversion[time_unit]
+            return time * BaseTimer._conversion[time_unit] / resolution
 
     @staticmethod
     def _display_message(message: str, output_stream: TextIO=stdout):
@@ -112,9 +437,17 @@ class BaseTimer:
         """
         output_stream.write(message + "\n")
 
+    @staticmethod
+    def _format_metric(value: Union[int, float]) -> str:
+        """
+        :return: an integer metric as it is and any other metric to 6 significant figures
+        """
+        return str(value) if isinstance(value, int) else "{:.6g}".format(value)
+
     @staticmethod
     def _format_output(label: str, runs: int, iterations_per_run: int, time: float, time_unit: str,
-                       args: Union[None, list]=(), kwargs: Union[None, dict]=(), message: str="") -> str:
+                       args: Union[None, list]=(), kwargs: Union[None, dict]=(), message: str="",
+                       resolution: int=1, metrics: Dict[str, float]=()) -> str:
         """
         Build up a string message based on the input parameters
         :param label: the name of the function, part of the string being timed, or label of the call
@@ -125,7 +458,10 @@ class BaseTimer:
         :param args: if it was a function, the positional arguments that were passed when it was called
         :param kwargs: if it was a function, the keyword arguments that were passed when it was called
         :param message: a message to display if there is one
+        :param resolution: the number of units of `time` in a second, see `._convert_time()`
+        :param metrics: any metrics measured by probes, which are listed after the message
         :return: a string: <time> <unit> - <name>[(args, kwargs)] [runs=<runs>, iterations=<iterations>] <message>
+                    [| <metric>=<value>, ...]
         """
         if args or kwargs:
             arguments = "".join((
@@ -144,8 +480,8 @@ class BaseTimer:
         if message:
             message = "| {}".format(message)
 
-        return "{:>10.5f} {:2} - {} [runs={:3}, iterations={:3}] {:<20.20}".format(
-            BaseTimer._convert_time(time, time_unit),
+        output = "{:>10.5f} {:2} - {} [runs={:3}, iterations={:3}] {:<20.20}".format(
+            BaseTimer._convert_time(time, time_unit, resolution=resolution),
             time_unit,
             name_part,
             runs,
@@ -153,6 +489,12 @@ class BaseTimer:
             message
         )
 
+        if metrics:
+            output += " | " + ", ".join("{}={}".format(key, BaseTimer._format_metric(value))
+                                        for key, value in metrics.items())
+
+        return output
+
 
 class StaticTimer(BaseTimer):
     """
@@ -201,13 +543,88 @@ class StaticTimer(BaseTimer):
             output_stream=output_stream
         )
 
+    @staticmethod
+    @asynccontextmanager
+    async def async_context(*args, runs=1, iterations_per_run=1, label="Context", time_unit=BaseTimer.MS,
+                            output_stream: TextIO=stdout, **kwargs):
+        """
+        The same as `.context()`, but used with an `async with` statement, as `async with StaticTimer.async_context():`.
+        Any time spent awaiting inside the block is included.
+        """
+        tm = StaticTimer._time()
+        yield
+
+        dif = StaticTimer._time() - tm
+        StaticTimer._display_message(
+            StaticTimer._format_output(label=label, time=dif, runs=runs, iterations_per_run=iterations_per_run,
+                                       args=list(args), kwargs=kwargs, time_unit=time_unit),
+            output_stream=output_stream
+        )
+
+    @staticmethod
+    def _report(label: str, runs: int, iterations_per_run: int, run_totals: List[float],
+                arguments: List[Tuple[tuple, dict]], value: any, average_runs: bool, display: bool, time_unit: str,
+                output_stream: TextIO, overhead: float=None) -> Union[any, Tuple[any, float], Tuple[any, List[float]]]:
+        """
+        Display or return the measured times the way `.decorate()` and `.async_time_it()` are documented to
+        :param label: the label to display
+        :param runs: the number of runs
+        :param iterations_per_run: the number of iterations in each run
+        :param run_totals: the measured time of each run
+        :param arguments: the arguments of each run if they were logged, otherwise, empty
+        :param value: the return value of the timed function
+        :param overhead: the overhead that was subtracted from each run, if any, which is displayed after the runs
+        :return: see `.decorate()`
+        """
+        if display and overhead is not None:
+            value = StaticTimer._report(label, runs, iterations_per_run, run_totals, arguments, value, average_runs,
+                                        display, time_unit, output_stream)
+            StaticTimer._display_message("{:>10.5f} {:2} - Overhead subtracted from each run".format(
+                StaticTimer._convert_time(overhead, time_unit), time_unit
+            ), output_stream=output_stream)
+
+            return value
+
+        if average_runs:
+            average = sum(run_totals) / len(run_totals)
+
+            if display:
+                if arguments:
+                    string = StaticTimer._format_output(label, runs, iterations_per_run, average, time_unit,
+                                                        args=arguments[0][0], kwargs=arguments[0][1])
+                else:
+                    string = StaticTimer._format_output(label, runs, iterations_per_run, average, time_unit)
+
+                StaticTimer._display_message(string, output_stream=output_stream)
+                return value  # any
+            else:
+                return value, StaticTimer._convert_time(average, time_unit)  # Tuple[any, float]
+        else:
+            if display:
+                for i in range(len(run_totals)):
+                    if arguments:
+                        string = StaticTimer._format_output(label, 1, iterations_per_run, run_totals[i], time_unit,
+                                                            message="Run {}".format(i+1), args=arguments[i][0],
+                                                            kwargs=arguments[i][1])
+                    else:
+                        string = StaticTimer._format_output(label, 1, iterations_per_run, run_totals[i], time_unit,
+                                                            message="Run {}".format(i+1))
+
+                    StaticTimer._display_message(string, output_stream=output_stream)
+
+                return value  # any
+            else:
+                # Tuple[any, List[float]]
+                return value, [StaticTimer._convert_time(time, time_unit) for time in run_totals]
+
     @staticmethod
     def decorate(runs=1, iterations_per_run=1, average_runs=True, display=True, time_unit=BaseTimer.MS,
                  output_stream: TextIO=stdout, call_callable_args=False, log_arguments=False,
-                 copiers: Union[callable, Dict[Union[str, int], callable]]=None) -> callable:
+                 copiers: Union[callable, Dict[Union[str, int], callable]]=None, subtract_overhead=False) -> callable:
         """
         A decorator that will time a function and then either output the results to `output_stream` if `display`.
-        Otherwise, the measured time(s) will be returned along with the return value of the wrapped function
+        Otherwise, the measured time(s) will be returned along with the return value of the wrapped function. If the
+        function is a coroutine function, then the wrapper is too, and the time it takes to await it is measured.
         :param runs: how many times the execution time of the wrapped function will be measured
         :param iterations_per_run: how many times the wrapped function will be called for each run. The time for the
                     run will be the sum of the times of iterations
@@ -225,6 +642,8 @@ class StaticTimer(BaseTimer):
                     In that case, any subsequent iterations will be using the modified version. Copiers are used on each
                     iteration to avoid that issue. Can be a single callable which will be used on all arguments, or a
                     map of positional indices or keyword argument names to functions.
+        :param subtract_overhead: subtract the overhead of the timing harness, see `.calibrate()`, from each run. The
+                    subtracted overhead is displayed after the runs if `display`. Ignored for coroutine functions.
         :return: a function wrapper
         """
         def wrapper(func: callable) -> callable:
@@ -264,42 +683,26 @@ class StaticTimer(BaseTimer):
                         value = func(*iteration_args, **iteration_kwargs)
                     run_totals.append(StaticTimer._time() - st)
 
-                # DETERMINE TIME, DISPLAY OR RETURN
-                if average_runs:
-                    average = sum(run_totals) / len(run_totals)
-
-                    if display:
-                        if log_arguments:
-                            string = StaticTimer._format_output(func.__name__, runs, iterations_per_run, average,
-                                                                time_unit, args=arguments[0][0],
-                                                                kwargs=arguments[0][1])
-                        else:
-                            string = StaticTimer._format_output(func.__name__, runs, iterations_per_run, average,
-                                                                time_unit)
-
-                        StaticTimer._display_message(string, output_stream=output_stream)
-                        return value  # any
-                    else:
-                        return value, StaticTimer._convert_time(average, time_unit)  # Tuple[any, float]
-                else:
-                    if display:
-                        for i in range(len(run_totals)):
-                            if log_arguments:
-                                string = StaticTimer._format_output(func.__name__, 1, iterations_per_run, run_totals[i],
-                                                                    time_unit, message="Run {}".format(i+1),
-                                                                    args=arguments[i][0], kwargs=arguments[i][1])
-                            else:
-                                string = StaticTimer._format_output(func.__name__, 1, iterations_per_run, run_totals[i],
-                                                                    time_unit, message="Run {}".format(i+1))
+                overhead = None
+                if subtract_overhead:
+                    overhead = StaticTimer._run_overhead(iterations_per_run, StaticTimer._time)
+                    run_totals = [max(time - overhead, 0) for time in run_totals]
 
-                            StaticTimer._display_message(string, output_stream=output_stream)
+                return StaticTimer._report(func.__name__, runs, iterations_per_run, run_totals, arguments, value,
+                                           average_runs, display, time_unit, output_stream, overhead)
 
-                        return value  # any
-                    else:
-                        # Tuple[any, List[float]]
-                        return value, [StaticTimer._convert_time(time, time_unit) for time in run_totals]
+            @wraps(func)
+            async def async_inner_wrapper(*args, **kwargs) -> Union[any, Tuple[any, float], Tuple[any, List[float]]]:
+                value, measured = await StaticTimer._await_runs(func, args, kwargs, runs, iterations_per_run,
+                                                                call_callable_args, copiers, StaticTimer._time)
+
+                return StaticTimer._report(
+                    func.__name__, runs, iterations_per_run, [time for time, _, _, _ in measured],
+                    [(run_args, run_kwargs) for _, run_args, run_kwargs, _ in measured] if log_arguments else [], value,
+                    average_runs, display, time_unit, output_stream
+                )
 
-            return inner_wrapper
+            return async_inner_wrapper if iscoroutinefunction(func) else inner_wrapper
         return wrapper
 
     @staticmethod
@@ -342,15 +745,37 @@ class StaticTimer(BaseTimer):
         """
         StaticTimer._elapsed_time = StaticTimer._time()
 
+    @staticmethod
+    async def async_time_it(block: callable, *args, runs=1, iterations_per_run=1, average_runs=True, display=True,
+                            time_unit=BaseTimer.MS, output_stream: TextIO=stdout, call_callable_args=False,
+                            log_arguments=False, copiers: Union[callable, Dict[Union[str, int], callable]]=None,
+                            **kwargs) -> Union[any, Tuple[any, float], Tuple[any, List[float]]]:
+        """
+        Measure the execution time of a coroutine function by awaiting it. Must itself be awaited. Takes the same
+        arguments as `.time_it()`, except that `block` must be a coroutine function, so there is no `globals`, `locals`,
+        or `setup`.
+        :return: see `.time_it()`
+        """
+        value, measured = await StaticTimer._await_runs(block, args, kwargs, runs, iterations_per_run,
+                                                        call_callable_args, copiers, StaticTimer._time)
+
+        return StaticTimer._report(
+            block.__name__, runs, iterations_per_run, [time for time, _, _, _ in measured],
+            [(run_args, run_kwargs) for _, run_args, run_kwargs, _ in measured] if log_arguments else [], value,
+            average_runs, display, time_unit, output_stream
+        )
+
     @staticmethod
     def time_it(block: Union[str, callable], *args, runs=1, iterations_per_run=1, average_runs=True, display=True,
                 time_unit=BaseTimer.MS, output_stream: TextIO=stdout, call_callable_args=False, log_arguments=False,
                 globals: dict=(), locals: dict=(), copiers: Union[callable, Dict[Union[str, int], callable]]=None,
-                setup: str="", **kwargs) -> Union[any, Tuple[any, float], Tuple[any, List[float]]]:
+                setup: str="", workers: int=None, subtract_overhead=False, **kwargs
+                ) -> Union[any, Tuple[any, float], Tuple[any, List[float]]]:
         """
         Measure the execution time of a function are string. Positional and keyword arguments can be passed through to
-        `block` if it is a function. `eval` is used if `block` is a string and so a namespace can be passed to it by
-        setting `globals` and/or `locals`.
+        `block` if it is a function. If `block` is a string, then it is compiled once, along with `setup` and the loop
+        that times it, so it can be any number of statements, and a namespace can be passed to it by setting `globals`
+        and/or `locals`.
         :param block: either a callable or a string
         :param args: any positional arguments to pass into `block` if it is callable
         :param runs: the number of times to measure the execution time
@@ -365,97 +790,80 @@ class StaticTimer(BaseTimer):
                     `func(callable1(), something=callable2())`. Only useful if `block` is callable
         :param log_arguments: whether to keep track of the arguments so they can be displayed if `display`.
                     Only valid if `block` is callable
-        :param globals: a global namespace to pass to `eval` if `block` is a string
-        :param locals: a local namespace to pass to `eval` if `block` is a string
+        :param globals: a global namespace to execute `block` in if it is a string
+        :param locals: names to add to the namespace `block` is executed in if it is a string
         :param copiers: function(s) that will be used to copy any arguments such that the copied version is passed into
                     the function. Useful when the wrapped function has side-effects and modifies one of the arguments.
                     In that case, any subsequent iterations will be using the modified version. Copiers are used on each
                     iteration to avoid that issue. Can be a single callable which will be used on all arguments, or a
                     map of positional indices or keyword argument names to functions. Only will be used if `block` is
                     `callable`
-        :param setup: used when `block` is a string. Will be executed once before `block` is evaluated to setup any
-                    needed names in the namespace.
+        :param setup: used when `block` is a string. Will be executed once before `block` is timed to setup any
+                    needed names.
+        :param workers: if set, the runs are split between this many worker processes which measure them at the same
+                    time. `block`, the arguments, and `copiers` must be picklable, so `block` has to be a string or a
+                    module-level function. Callable arguments are called in this process when `call_callable_args`.
+        :param subtract_overhead: subtract the overhead of the timing harness, see `.calibrate()`, from each run. The
+                    subtracted overhead is displayed after the runs if `display`
         :param kwargs: any keyword arguments to pass into `block` if it is callable
         :return: If `display`, then just the return value of calling/evaluating `block` is returned. Otherwise, a
                     tuple of the return value and the measured time(s) is returned. If `average`, then a single time
                     value is returned. Otherwise, a list of time values, one for each run, is returned.
                     Any returned times will be in `time_unit`
         """
-        run_totals = []
-        arguments = []
-        value = None
-        globals = globals if globals else {}
-        locals = locals if locals else {}
-        run_args, run_kwargs = None, None  # add to get rid of "might be referenced before declared", which is invalid
-
-        # setup anything needed for evaluating `block` if it is a string
-        if not callable(block) and setup:
-            exec(setup)
+        run_arguments = StaticTimer._run_arguments(args if callable(block) else (), kwargs if callable(block) else {},
+                                                   runs, call_callable_args and callable(block))
 
         # MEASURE
-        for _ in range(runs):
-            if callable(block):
-                if call_callable_args:
-                    run_args, run_kwargs = StaticTimer._call_callable_args(args, kwargs)
-                else:
-                    run_args, run_kwargs = args, kwargs
+        if workers:
+            value, measured = StaticTimer._measure_parallel(block, run_arguments, workers, iterations_per_run, copiers,
+                                                            globals, locals, setup)
+        else:
+            value, measured = StaticTimer._measure_runs(block, run_arguments, iterations_per_run, copiers, globals,
+                                                        locals, setup)
 
-                if log_arguments:
-                    arguments.append((run_args, run_kwargs))
+        run_totals = [time for time, _, _, _ in measured]
+        overhead = None
+        if subtract_overhead:
+            overhead = StaticTimer._run_overhead(iterations_per_run, StaticTimer._time, not callable(block))
+            run_totals = [max(time - overhead, 0) for time in run_totals]
 
-            st = StaticTimer._time()
-            for _ in range(iterations_per_run):
-                if callable(block):
-                    if copiers is not None:  # conditional should have minimal effect on execution time
-                        delta = StaticTimer._time()
-                        iteration_args, iteration_kwargs = StaticTimer._argument_copier(run_args, run_kwargs, copiers)
-                        st += StaticTimer._time() - delta  # ignore the amount of time needed to copy the arguments
-                    else:
-                        iteration_args, iteration_kwargs = run_args, run_kwargs
+        # DETERMINE TIME, DISPLAY OR RETURN
+        return StaticTimer._report(
+            block.__name__ if callable(block) else block, runs, iterations_per_run, run_totals,
+            [(run_args, run_kwargs) for _, run_args, run_kwargs, _ in measured] if log_arguments and callable(block)
+            else [],
+            value, average_runs, display, time_unit, output_stream, overhead
+        )
 
-                    value = block(*iteration_args, **iteration_kwargs)
-                else:
-                    value = eval(block, globals, locals)
 
-            run_totals.append(StaticTimer._time() - st)
+class _Span:
+    """
+    The context manager returned by `Timer.span()`. It is a plain class rather than a generator so that entering and
+    exiting a span costs as little as possible, and it works with both `with` and `async with`.
+    """
+    __slots__ = ("timer", "label", "node", "parent", "token", "start")
 
-        # DETERMINE TIME, DISPLAY OR RETURN
-        if average_runs:
-            average = sum(run_totals) / len(run_totals)
+    def __init__(self, timer: "Timer", label: str):
+        self.timer = timer
+        self.label = label
 
-            if display:
-                if callable(block) and log_arguments:
-                    string = StaticTimer._format_output(block.__name__, runs, iterations_per_run, average, time_unit,
-                                                        args=arguments[0][0], kwargs=arguments[0][1])
-                elif callable(block):
-                    string = StaticTimer._format_output(block.__name__, runs, iterations_per_run, average, time_unit)
-                else:
-                    string = StaticTimer._format_output(block, runs, iterations_per_run, average, time_unit)
+    def __enter__(self):
+        self.parent = self.timer._span_node.get()
+        self.node = self.parent.child(self.label)
+        self.token = self.timer._span_node.set(self.node)
+        self.start = self.timer._time()
 
-                StaticTimer._display_message(string, output_stream=output_stream)
-                return value  # any
-            else:
-                return value, StaticTimer._convert_time(average, time_unit)  # Tuple[any, float]
-        else:
-            if display:
-                for i in range(runs):
-                    if callable(block) and log_arguments:
-                        string = StaticTimer._format_output(block.__name__, 1, iterations_per_run, run_totals[i],
-                                                            time_unit, args=arguments[i][0], kwargs=arguments[i][1],
-                                                            message="Run {}".format(i+1))
-                    elif callable(block):
-                        string = StaticTimer._format_output(block.__name__, 1, iterations_per_run, run_totals[i],
-                                                            time_unit, message="Run {}".format(i+1))
-                    else:
-                        string = StaticTimer._format_output(block, runs, iterations_per_run, run_totals[i], time_unit,
-                                                            message="Run {}".format(i+1))
+    def __exit__(self, *_):
+        elapsed = self.timer._time() - self.start
+        self.timer._span_node.reset(self.token)
+        self.timer._record_span(self.node, self.parent, elapsed)
 
-                    StaticTimer._display_message(string, output_stream=output_stream)
+    async def __aenter__(self):
+        self.__enter__()
 
-                return value  # any
-            else:
-                # Tuple[any, List[float]]
-                return value, [StaticTimer._convert_time(time, time_unit) for time in run_totals]
+    async def __aexit__(self, *exc_info):
+        self.__exit__(*exc_info)
 
 
 class Timer(BaseTimer):
@@ -468,7 +876,8 @@ class Timer(BaseTimer):
     """
 
     def __init__(self, output_stream: TextIO=stdout, split: bool=False, label: str= "Split", indent: str= "    ",
-                 start: bool=False):
+                 start: bool=False, split_type: type=Split, split_options: dict=(), nanoseconds: bool=False,
+                 spans: bool=False):
         """
         Create a new timer.
         :param output_stream: the file-like object to write any output to. Must have a `.write(str)` method.
@@ -478,14 +887,35 @@ class Timer(BaseTimer):
         :param indent: the amount to indent lines when outputting data
         :param start: go ahead and call `.start()` to allow `.log()` to be called immediately. Only use if a minimal
                     amount of time will pass between timer creation the first call to `.log()`
+        :param split_type: the class used to store runs for every split this timer creates. `ColumnarSplit` keeps runs
+                    in compact arrays and is better suited to recording a very large number of runs
+        :param split_options: keyword arguments passed to `split_type` whenever a split is created, like
+                    `{"quantiles": True}` to have the statistics of every split include percentiles
+        :param nanoseconds: measure with `perf_counter_ns`, so every time is stored as an exact integer number of
+                    nanoseconds and only converted to `time_unit` when it is output. Sums of any number of runs are
+                    exact, and precision doesn't degrade for timers that live a long time.
+        :param spans: record `.span()`, `.context()`, `.async_context()`, and `.decorate()` into a call tree in
+                    `.spans`, instead of into splits, so nested blocks show how much of their time was spent in the
+                    blocks inside them. See `.span()`.
         """
         self.output_stream: TextIO = output_stream
         self.splits: List[Split] = []
         self.indent = indent
         self.log_base_point = None
+        self.split_type = split_type
+        self.split_options = dict(split_options)
+        self.resolution = 10**9 if nanoseconds else 1  # units of time in a second, see Split()
+
+        if nanoseconds:
+            self._time = perf_counter_ns
+
+        self.spans: SpanTree = SpanTree() if spans else None
+        if spans:
+            # the innermost open span, kept separately for each thread and asyncio task
+            self._span_node = ContextVar("span_node", default=self.spans.root)
 
         if split:
-            self.splits.append(Split(label=label))
+            self.split(label=label)
 
         if start:
             self.start()
@@ -510,6 +940,27 @@ class Timer(BaseTimer):
 
         return adjusted_index
 
+    def _current_split(self) -> Union[None, Split]:
+        """
+        :return: the split that new runs should be recorded in, or None if there are no splits
+        """
+        return self.splits[-1] if self.splits else None
+
+    def _record(self, split: Split, run: Run):
+        """
+        Store a measured run in a split. Every run that is measured goes through here.
+        :param split: the split the run belongs to, determined when the measurement started
+        :param run: the measured run
+        """
+        split.add_run(run)
+
+    def _flush(self):
+        """
+        Make sure every run passed to `._record()` has been added to its split. Runs are added straight away, so this
+        does nothing, but subclasses that buffer runs, like ThreadSafeTimer, add them here.
+        """
+        pass
+
     def _str(self, split_index: Union[int, str]=all, time_unit=BaseTimer.MS,
              transformers: Union[
                    callable,
@@ -523,6 +974,58 @@ class Timer(BaseTimer):
         :param transformers: see `.output()` for detailed description.
         :return: a formatted string containing split and run information
         """
+        return "".join(self._lines(split_index=split_index, time_unit=time_unit, transformers=transformers))
+
+    def _lines(self, split_index: Union[int, str]=all, time_unit=BaseTimer.MS,
+               transformers: Union[
+                   callable,
+                   Dict[Union[int, str], Union[callable, Dict[Union[int, str], callable]]]
+               ]=()) -> Iterable[str]:
+        """
+        Yield the lines of `._str()` one at a time, so they can be written without building the whole string
+        :param split_index: the split index or label to output. Defaults to all
+        :param time_unit: the time scale unit to output times in
+        :param transformers: see `.output()` for detailed description.
+        """
+        current = None
+        for split, run, args, kwargs in self._transformed_runs(split_index, transformers):
+            if split is not current:
+                if current is not None:
+                    yield "\n"
+
+                current = split
+                yield "{}:\n".format(split.label)
+                if split.overhead is not None:
+                    yield "{}Overhead subtracted: {} {} per run + {} {} per iteration\n".format(
+                        self.indent,
+                        self._convert_time(split.overhead["run"], time_unit, resolution=split.resolution),
+                        time_unit,
+                        self._convert_time(split.overhead["iteration"], time_unit, resolution=split.resolution),
+                        time_unit
+                    )
+
+            yield "{}{}\n".format(
+                self.indent,
+                self._format_output(label=run.label, runs=run.runs, iterations_per_run=run.iterations_per_run,
+                                    time=run.time, time_unit=time_unit, args=args, kwargs=kwargs,
+                                    resolution=split.resolution, metrics=run.metrics)
+            )
+
+        if current is not None:
+            yield "\n"
+
+    def _transformed_runs(self, split_index: Union[int, str]=all,
+                          transformers: Union[
+                              callable,
+                              Dict[Union[int, str], Union[callable, Dict[Union[int, str], callable]]]
+                          ]=()) -> Iterable[Tuple[Split, Run, list, dict]]:
+        """
+        Yield every run in all splits, or in the one designated by index or label, along with its arguments after any
+        transformers have been applied. Runs are transformed one at a time, as they are reached.
+        :param split_index: the split index or label. Defaults to all
+        :param transformers: see `.output()` for detailed description.
+        :return: tuples of the split, the run, and the transformed positional and keyword arguments
+        """
         # FIGURE OUT TRANSFORMERS SITUATION
         trans_op = None
         if transformers:
@@ -533,28 +1036,22 @@ class Timer(BaseTimer):
             else:
                 trans_op = 3
 
-        string = []
         for i in range(len(self.splits)):
             split = self.splits[i]
             if split_index != all and i != split_index and split.label != split_index:
                 continue
 
-            if not split.runs:  # skip splits with no logged times
-                continue
-
-            string.append("{}:\n".format(split.label))
+            # if we have transformers for each split, go ahead and get this split
+            split_transformers = None
+            if trans_op == 3 and i in transformers:
+                split_transformers = transformers[i]
+            elif trans_op == 3 and split.label in transformers:
+                split_transformers = transformers[split.label]
+            elif trans_op == 2:
+                split_transformers = transformers  # all transformers are for this split
 
             for run in split.runs:
                 if transformers:
-                    # if we have transformers for each split, go ahead and get this split
-                    split_transformers = None
-                    if trans_op == 3 and i in transformers:
-                        split_transformers = transformers[i]
-                    elif trans_op == 3 and split.label in transformers:
-                        split_transformers = transformers[split.label]
-                    elif trans_op == 2:
-                        split_transformers = transformers  # all transformers are for this split
-
                     args, kwargs = list(run.args), dict(run.kwargs)
 
                     for j in range(len(args)):
@@ -571,15 +1068,131 @@ class Timer(BaseTimer):
                 else:
                     args, kwargs = run.args, run.kwargs
 
-                string.append("{}{}\n".format(
-                    self.indent,
-                    self._format_output(label=run.label, runs=run.runs, iterations_per_run=run.iterations_per_run,
-                                        time=run.time, time_unit=time_unit, args=args, kwargs=kwargs)
-                ))
+                yield split, run, args, kwargs
 
-            string.append("\n")
+    async def async_time_it(self, block: callable, *args, runs=1, iterations_per_run=1, call_callable_args=False,
+                            log_arguments=False, split=True, split_label=None,
+                            copiers: Union[callable, Dict[Union[str, int], callable]]=None, probes: Sequence[Probe]=(),
+                            **kwargs) -> any:
+        """
+        Measure the execution time of a coroutine function by awaiting it and store the measured times. Must itself be
+        awaited. Takes the same arguments as `.time_it()`, except that `block` must be a coroutine function, so there
+        is no `globals`, `locals`, or `setup`.
+        :return: the return value of the last await of `block`
+        """
+        if split:
+            target = self.split(label=block.__name__ if split_label is None else split_label)
+        else:
+            target = self._current_split()
+            if target is None:
+                raise RuntimeWarning("No split exists. Do .split(), decorate(split=True), or Timer(split=True)")
 
-        return "".join(string)
+        value, measured = await self._await_runs(block, args, kwargs, runs, iterations_per_run, call_callable_args,
+                                                 copiers, self._time, probes)
+        for time, run_args, run_kwargs, metrics in measured:
+            run = Run(label=block.__name__, time=time, runs=1, iterations_per_run=iterations_per_run, metrics=metrics)
+
+            if log_arguments:
+                run.args = run_args
+                run.kwargs = run_kwargs
+
+            self._record(target, run)
+
+        return value
+
+    def auto_time_it(self, block: Union[str, callable], *args, min_run_time: float=0.01, relative_width: float=0.05,
+                     statistic: str="mean", confidence: float=0.95, min_runs: int=5, max_runs: int=1000,
+                     max_time: float=10.0, log_arguments=False, split=True, split_label=None, globals: dict=(),
+                     locals: dict=(), copiers: Union[callable, Dict[Union[str, int], callable]]=None, setup: str="",
+                     **kwargs) -> any:
+        """
+        Measure the execution time of a function or string like `.time_it()`, but pick the number of runs and
+        iterations automatically. First, `iterations_per_run` is increased until a single run takes at least
+        `min_run_time`, and those runs are thrown away. Then, runs are added until the confidence interval of
+        `statistic` is narrower than `relative_width` times its estimate, `max_runs` runs have been measured, or
+        `max_time` seconds have passed, whichever is first. Which one it was is stored in the split's `stop_reason` as
+        "converged", "max_runs", or "max_time".
+        :param block: either a callable or a string
+        :param args: any positional arguments to pass into `block` if it is callable
+        :param min_run_time: the minimum number of seconds each run should take
+        :param relative_width: the width of the confidence interval, relative to the estimate, needed to stop
+        :param statistic: either "mean" or "median", the latter of which is less affected by outliers
+        :param confidence: the confidence level of the interval, between 0 and 1
+        :param min_runs: the minimum number of runs before checking the confidence interval
+        :param max_runs: the maximum number of runs
+        :param max_time: the maximum number of seconds to spend, including finding the number of iterations. At least
+                    `min_runs` runs are always measured.
+        :param log_arguments: whether to store the arguments with each run, only useful if `block` is callable
+        :param split: create a split that will be used for the runs
+        :param split_label: the label of the new split. If None, then the label will be `block.__name__` if `block` is
+                    callable. Otherwise, it will be the block itself.
+        :param globals: a global namespace to execute `block` in if it is a string
+        :param locals: names to add to the namespace `block` is executed in if it is a string
+        :param copiers: function(s) used to copy the arguments before each iteration, see `.time_it()`
+        :param setup: used when `block` is a string. Will be executed once before `block` is timed
+        :param kwargs: any keyword arguments to pass into `block` if it is callable
+        :return: the return value of the last call/execution of `block`
+        """
+        if statistic not in ("mean", "median"):
+            raise RuntimeWarning("{} is not a valid statistic, use 'mean' or 'median'".format(statistic))
+
+        label = block.__name__ if callable(block) else block
+        if split:
+            target = self.split(label=label if split_label is None else split_label)
+        else:
+            target = self._current_split()
+            if target is None:
+                raise RuntimeWarning("No split exists. Do .split(), decorate(split=True), or Timer(split=True)")
+
+        start = self._time()
+        if callable(block):
+            def measure(iterations: int) -> Tuple[any, float]:
+                value, measured = self._measure_runs(block, [(args, kwargs)], iterations, copiers, clock=self._time)
+                return value, measured[0][0]
+        else:
+            timed_block = self._compile_block(block, setup, globals, locals)
+
+            def measure(iterations: int) -> Tuple[any, float]:
+                value, times, _ = timed_block((1, iterations, self._time, ()))
+                return value, times[0]
+
+        # AUTORANGE, grow by the amount the last run was short by, but by at least 2x and at most 10x
+        iterations_per_run = 1
+        value, time = measure(iterations_per_run)
+        min_run_time, max_time = min_run_time * self.resolution, max_time * self.resolution  # in units of the clock
+        while time < min_run_time and self._time() - start < max_time:
+            iterations_per_run *= min(max(ceil(min_run_time / time) if time > 0 else 10, 2), 10)
+            value, time = measure(iterations_per_run)
+
+        # ADD RUNS UNTIL CONVERGED
+        times = []
+        while True:
+            value, time = measure(iterations_per_run)
+            times.append(time)
+
+            if len(times) >= max(min_runs, 2):
+                lower, estimate, upper = self._confidence_interval(times, statistic, confidence)
+                if upper - lower <= relative_width * estimate:
+                    target.stop_reason = "converged"
+                    break
+
+            if len(times) >= max_runs:
+                target.stop_reason = "max_runs"
+                break
+            elif len(times) >= min_runs and self._time() - start >= max_time:
+                target.stop_reason = "max_time"
+                break
+
+        for time in times:
+            run = Run(label=label, time=time, runs=1, iterations_per_run=iterations_per_run)
+
+            if log_arguments and callable(block):
+                run.args = args
+                run.kwargs = kwargs
+
+            self._record(target, run)
+
+        return value
 
     def best_fit_curve(self, split_index: Union[int, str]=-1, curve_type: str=any, exclude: Set[Union[str, int]]=(),
                        transformers: Union[callable, Dict[Union[str, int], callable]]=()
@@ -606,8 +1219,69 @@ class Timer(BaseTimer):
         else:
             raise RuntimeWarning("The split index/label {} is out of bounds/could not be found".format(adjusted_index))
 
+    def compare(self, candidate: Union["Timer", str], statistic: str="median", confidence: float=0.95,
+                threshold: float=0.05, resamples: int=1000, seed: int=None, display: bool=True,
+                time_unit=BaseTimer.MS) -> Dict[str, Dict[str, Union[float, int, bool]]]:
+        """
+        Compare this timer, the baseline, against a candidate by matching their splits by label. Each label gets the
+        speedup of the candidate, `statistic(baseline) / statistic(candidate)`, with a bootstrap confidence interval,
+        and a Mann-Whitney U test. A label is flagged as a regression or an improvement when the change is significant
+        and larger than `threshold`, so `any(c["regression"] for c in timer.compare(...).values())` can gate CI.
+        :param candidate: the timer to compare against, or the path of a file written by `.save()`
+        :param statistic: the statistic to compare, either "mean" or "median"
+        :param confidence: the confidence level of the speedup interval. The test is significant when the p-value is
+                    below `1 - confidence`.
+        :param threshold: the smallest relative change that is flagged
+        :param resamples: the number of bootstrap resamples
+        :param seed: the seed of the bootstrap, so results can be reproduced
+        :param display: whether to output a report for each label
+        :param time_unit: the time unit to output times in
+        :return: a map of split labels to the comparison, see `comparison.compare_splits()`. Times are in seconds.
+        """
+        if isinstance(candidate, str):
+            candidate = Timer.load(candidate)
+
+        comparisons = compare_splits(self.splits, candidate.splits, statistic=statistic, confidence=confidence,
+                                     threshold=threshold, resamples=resamples, seed=seed)
+
+        if display:
+            for label, comparison in comparisons.items():
+                self.output_stream.write("{}[baseline={}, candidate={}]:\n".format(
+                    label,
+                    comparison["baseline_count"],
+                    comparison["candidate_count"]
+                ))
+                self.output_stream.write("{}{:>20} = {} | {} {}\n".format(
+                    self.indent,
+                    "Baseline | Candidate",
+                    self._convert_time(comparison["baseline"], time_unit),
+                    self._convert_time(comparison["candidate"], time_unit),
+                    time_unit
+                ))
+                self.output_stream.write("{}{:>20} = {:.3f}x ({:.3f}x - {:.3f}x)\n".format(
+                    self.indent,
+                    "Speedup ({:.0%} CI)".format(confidence),
+                    comparison["speedup"],
+                    comparison["lower"],
+                    comparison["upper"]
+                ))
+                self.output_stream.write("{}{:>20} = {:.5g}\n".format(
+                    self.indent,
+                    "Mann-Whitney p",
+                    comparison["p_value"]
+                ))
+                self.output_stream.write("{}{:>20} = {}\n\n".format(
+                    self.indent,
+                    "Result",
+                    "regression" if comparison["regression"] else
+                    "improvement" if comparison["improvement"] else
+                    "no significant change" if not comparison["significant"] else "within threshold"
+                ))
+
+        return comparisons
+
     @contextmanager
-    def context(self, *args, runs=1, iterations_per_run=1, label="Context", **kwargs):
+    def context(self, *args, runs=1, iterations_per_run=1, label="Context", probes: Sequence[Probe]=(), **kwargs):
         """
         Provides a context manager that can be used with a `with` statement as `with Timer.context():`. The measured
         time is logged and is not returned. If there is no split, then a RuntimeWarning will be raised.
@@ -615,22 +1289,76 @@ class Timer(BaseTimer):
         :param runs: the number of runs that were performed. THIS IS ONLY FOR LOGGING PURPOSES.
         :param iterations_per_run: the number of iterations that were performed. THIS IS ONLY FOR LOGGING PURPOSES.
         :param label: the label for the run
+        :param probes: measure more than time for the block, see `.time_it()`
         :param kwargs: any keyword arguments to log with the run
         """
-        if not self.splits:
+        if self.spans is not None:  # the arguments aren't part of a span
+            with _Span(self, label):
+                yield
+            return
+
+        split = self._current_split()
+        if split is None:
             raise RuntimeWarning("There must be a split created before any times can be logged.")
 
+        tokens = start_probes(probes) if probes else None
         tm = self._time()
-        yield
+        try:
+            yield
+        except BaseException:
+            if probes:
+                stop_probes(probes, tokens)
+            raise
 
         dif = self._time() - tm
-        self.splits[-1].add_run(Run(label=label, time=dif, runs=runs, iterations_per_run=iterations_per_run,
-                                    args=args, kwargs=kwargs))
+        self._record(split, Run(label=label, time=dif, runs=runs, iterations_per_run=iterations_per_run, args=args,
+                                kwargs=kwargs, metrics=stop_probes(probes, tokens) if probes else None))
+
+    @asynccontextmanager
+    async def async_context(self, *args, runs=1, iterations_per_run=1, label="Context", probes: Sequence[Probe]=(),
+                            **kwargs):
+        """
+        The same as `.context()`, but used with an `async with` statement, as `async with timer.async_context():`. The
+        split is chosen when the block is entered, so blocks in concurrent tasks never record into each other's splits.
+        """
+        if self.spans is not None:
+            async with _Span(self, label):
+                yield
+            return
+
+        split = self._current_split()
+        if split is None:
+            raise RuntimeWarning("There must be a split created before any times can be logged.")
+
+        tokens = start_probes(probes) if probes else None
+        tm = self._time()
+        try:
+            yield
+        except BaseException:
+            if probes:
+                stop_probes(probes, tokens)
+            raise
+
+        dif = self._time() - tm
+        self._record(split, Run(label=label, time=dif, runs=runs, iterations_per_run=iterations_per_run, args=args,
+                                kwargs=kwargs, metrics=stop_probes(probes, tokens) if probes else None))
 
     def decorate(self, runs=1, iterations_per_run=1, call_callable_args=False, log_arguments=False, split=True,
-                 split_label: str=None, copiers: Union[callable, Dict[Union[str, int], callable]]=None) -> callable:
+                 split_label: str=None, copiers: Union[callable, Dict[Union[str, int], callable]]=None,
+                 subtract_overhead=False, sample_every: int=None, samples_per_second: float=None,
+                 probes: Sequence[Probe]=()) -> callable:
         """
-        A decorator that will time a function and store the measured time
+        A decorator that will time a function and store the measured time. If the function is a coroutine function, then
+        the wrapper is too, and the time it takes to await it is measured.
+
+        Setting `sample_every` or `samples_per_second` turns on sampling, which is meant for leaving the decorator on
+        permanently. Only some calls are measured, and every other call is passed straight through to the function
+        after a single counter check. All samples go into one split, chosen on the first sampled call, which records
+        the number of calls and samples so `.statistics()` can show the sample rate and an estimated total. The call
+        count is only updated when a call is sampled, and is approximate if the function is called from several threads.
+
+        With `Timer(spans=True)`, every call is recorded as a span labeled with the function's name instead, and all
+        of the other options are ignored.
         :param runs: the number times to measure the execution time
         :param iterations_per_run: how many times to execute the function for each run. The time for the
                     run will be the sum of the times of iterations
@@ -646,17 +1374,55 @@ class Timer(BaseTimer):
                     In that case, any subsequent iterations will be using the modified version. Copiers are used on each
                     iteration to avoid that issue. Can be a single callable which will be used on all arguments, or a
                     map of positional indices or keyword argument names to functions.
+        :param subtract_overhead: subtract the overhead of the timing harness, see `.calibrate()`, from each run and
+                    store it in `split.overhead` so it appears in the output. Ignored for coroutine functions.
+        :param sample_every: only measure one of every this many calls
+        :param samples_per_second: measure about this many calls a second, however often the function is called. The
+                    first call is always measured, and the interval between samples is updated on every sample.
+        :param probes: measure more than time for each run, see `.time_it()`. When sampling, only sampled calls are
+                    probed.
         :return: a function wrapper
         """
+        sampling = sample_every is not None or samples_per_second is not None
+        if sample_every is not None and sample_every < 1:
+            raise RuntimeWarning("sample_every must be at least 1")
+        if samples_per_second is not None and samples_per_second <= 0:
+            raise RuntimeWarning("samples_per_second must be positive")
+
         def wrapper(func: callable) -> callable:
+            if self.spans is not None:
+                return self._span_wrapper(func)
+
+            sampled_target = None  # when sampling, every sample is recorded in this split
+
+            def get_target() -> Split:
+                nonlocal sampled_target
+                if sampled_target is not None:
+                    return sampled_target
+
+                if split:
+                    target = self.split(label=func.__name__ if split_label is None else split_label)
+                else:
+                    target = self._current_split()
+                    if target is None:
+                        raise RuntimeWarning(
+                            "No split exists. Do .split(), decorate(split=True), or Timer(split=True)"
+                        )
+
+                if sampling:
+                    sampled_target = target
+                return target
+
             @wraps(func)
             def inner_wrapper(*args, **kwargs) -> any:
                 value = None
+                target = get_target()
+                clock = self._time  # a local, the same as in `._measure_runs()`, which `.calibrate()` measures
 
-                if split:
-                    self.split(label=func.__name__ if split_label is None else split_label)
-                elif not self.splits:
-                    raise RuntimeWarning("No split exists. Do .split(), decorate(split=True), or Timer(split=True)")
+                overhead = 0
+                if subtract_overhead:
+                    overhead = self._run_overhead(iterations_per_run, clock)
+                    target.overhead = self.calibrate(clock)
 
                 # MEASURE
                 for _ in range(runs):
@@ -666,32 +1432,158 @@ class Timer(BaseTimer):
                     else:
                         run_args, run_kwargs = args, kwargs
 
-                    st = StaticTimer._time()
-                    for _ in range(iterations_per_run):
-                        if copiers is not None:  # conditional should have minimal effect on execution time
-                            delta = StaticTimer._time()
-                            iteration_args, iteration_kwargs = StaticTimer._argument_copier(run_args, run_kwargs,
-                                                                                            copiers)
-                            st += StaticTimer._time() - delta  # ignore the amount of time needed to copy the arguments
-                        else:
-                            iteration_args, iteration_kwargs = run_args, run_kwargs
+                    tokens = start_probes(probes) if probes else None
+                    try:
+                        st = clock()
+                        for _ in range(iterations_per_run):
+                            if copiers is not None:  # conditional should have minimal effect on execution time
+                                delta = clock()
+                                iteration_args, iteration_kwargs = StaticTimer._argument_copier(run_args, run_kwargs,
+                                                                                                copiers)
+                                st += clock() - delta  # ignore the amount of time needed to copy the arguments
+                            else:
+                                iteration_args, iteration_kwargs = run_args, run_kwargs
 
-                        value = func(*iteration_args, **iteration_kwargs)
+                            value = func(*iteration_args, **iteration_kwargs)
+
+                        time = clock() - st
+                    except BaseException:
+                        if probes:
+                            stop_probes(probes, tokens)
+                        raise
 
-                    run = Run(label=func.__name__, time=self._time() - st, runs=1,
-                              iterations_per_run=iterations_per_run)
+                    run = Run(label=func.__name__, time=max(time - overhead, 0), runs=1,
+                              iterations_per_run=iterations_per_run,
+                              metrics=stop_probes(probes, tokens) if probes else None)
 
                     if log_arguments:
                         run.args = run_args
                         run.kwargs = run_kwargs
 
-                    self.splits[-1].add_run(run)
+                    self._record(target, run)
+
+                return value
+
+            @wraps(func)
+            async def async_inner_wrapper(*args, **kwargs) -> any:
+                target = get_target()
+
+                value, measured = await self._await_runs(func, args, kwargs, runs, iterations_per_run,
+                                                         call_callable_args, copiers, self._time, probes)
+                for time, run_args, run_kwargs, metrics in measured:
+                    run = Run(label=func.__name__, time=time, runs=1, iterations_per_run=iterations_per_run,
+                              metrics=metrics)
+
+                    if log_arguments:
+                        run.args = run_args
+                        run.kwargs = run_kwargs
+
+                    self._record(target, run)
+
+                return value
+
+            if not sampling:
+                return async_inner_wrapper if iscoroutinefunction(func) else inner_wrapper
+
+            calls = 0
+            next_sample = 1 if sample_every is None else sample_every
+            last_sample = calls_at_last_sample = None
 
+            def sampled(target: Split):
+                """
+                Update the split's counts after a call was sampled and pick the call to sample next
+                """
+                nonlocal next_sample, last_sample, calls_at_last_sample
+                target.calls = calls
+                target.sampled_calls += 1
+
+                if sample_every is not None:
+                    next_sample = calls + sample_every
+                else:
+                    now = self._time()
+                    if last_sample is not None and now > last_sample:
+                        calls_per_second = (calls - calls_at_last_sample) * self.resolution / (now - last_sample)
+                        next_sample = calls + max(int(calls_per_second / samples_per_second), 1)
+                    else:
+                        next_sample = calls + 1
+
+                    last_sample, calls_at_last_sample = now, calls
+
+            @wraps(func)
+            def sampling_wrapper(*args, **kwargs) -> any:
+                nonlocal calls
+                calls += 1
+                if calls < next_sample:
+                    return func(*args, **kwargs)
+
+                value = inner_wrapper(*args, **kwargs)
+                sampled(sampled_target)
+                return value
+
+            @wraps(func)
+            async def async_sampling_wrapper(*args, **kwargs) -> any:
+                nonlocal calls
+                calls += 1
+                if calls < next_sample:
+                    return await func(*args, **kwargs)
+
+                value = await async_inner_wrapper(*args, **kwargs)
+                sampled(sampled_target)
                 return value
 
-            return inner_wrapper
+            return async_sampling_wrapper if iscoroutinefunction(func) else sampling_wrapper
         return wrapper
 
+    def export(self, destination: Union[str, TextIO]=None, format: str="jsonl", split_index: Union[int, str]=all,
+               time_unit=BaseTimer.S,
+               transformers: Union[
+                   callable,
+                   Dict[Union[int, str], Union[callable, Dict[Union[int, str], callable]]]
+               ]=()):
+        """
+        Write every run, or every run in one split, as JSON Lines or CSV. Runs are read, transformed, and written one at
+        a time, so memory use doesn't depend on how many runs there are. Each run has the fields listed in
+        `exectiming.exporters.FIELDS`. Times are not rounded.
+        :param destination: a path to write to, or a file-like object. If None, then `output_stream` is used
+        :param format: either "jsonl" or "csv"
+        :param split_index: the split index/name to export. Defaults to all
+        :param time_unit: the time unit to export times in
+        :param transformers: functions used to modify the logged arguments before they are written, see `.output()`
+        """
+        if format not in exporters:
+            raise RuntimeWarning("{} is not a valid format. Must be in [{}]".format(format, ", ".join(exporters)))
+        if split_index != all and self._adjust_split_index(split_index) is None:
+            raise RuntimeWarning("The split index '{}' is not a valid index or label".format(split_index))
+
+        rows = ({"split": split.label, "label": run.label,
+                 "time": self._convert_time(run.time, time_unit, round_it=False, resolution=split.resolution),
+                 "time_unit": time_unit, "runs": run.runs, "iterations_per_run": run.iterations_per_run,
+                 "args": list(args), "kwargs": dict(kwargs)}
+                for split, run, args, kwargs in self._transformed_runs(split_index, transformers))
+
+        if isinstance(destination, str):
+            with open(destination, "w", newline="", buffering=2**16) as stream:
+                exporters[format](rows, stream)
+        else:
+            exporters[format](rows, self.output_stream if destination is None else destination)
+
+    @staticmethod
+    def load(path: str, memory_map: bool=True, output_stream: TextIO=stdout) -> "Timer":
+        """
+        Create a timer from a file written by `.save()`. Each split is a MappedSplit, so its statistics come from the
+        saved header and its runs are read from the file only when they are used, even for a very large file.
+        The logged arguments are pickled, so only load files from a trusted source.
+        :param path: the path of the file
+        :param memory_map: map the file into memory instead of reading it all at once
+        :param output_stream: the file-like object the new timer writes any output to
+        :return: a new timer containing the saved splits
+        """
+        splits, resolution = load_splits(path, memory_map=memory_map)
+
+        timer = Timer(output_stream=output_stream, nanoseconds=resolution != 1)
+        timer.splits.extend(splits)
+        return timer
+
     def log(self, *args, runs=1, iterations_per_run=1, label="Log", reset=True, time_unit=BaseTimer.MS, **kwargs
             ) -> float:
         """
@@ -710,18 +1602,19 @@ class Timer(BaseTimer):
         if self.log_base_point is None:
             raise RuntimeWarning("start() must be called before log() can be")
 
-        if not self.splits:
+        split = self._current_split()
+        if split is None:
             raise RuntimeWarning("A split does not exist to log this time in! " +
                                  "Create one with .split() or on timer creation with Timer(split=True)")
 
         tm = self._time() - self.log_base_point
         run = Run(label=label, time=tm, runs=runs, iterations_per_run=iterations_per_run, args=args, kwargs=kwargs)
-        self.splits[-1].add_run(run)
+        self._record(split, run)
 
         if reset:
             self.start()
 
-        return self._convert_time(tm, time_unit, round_it=False)
+        return self._convert_time(tm, time_unit, round_it=False, resolution=self.resolution)
 
     def output(self, split_index: Union[int, str]=all, time_unit=BaseTimer.MS,
                transformers: Union[
@@ -751,7 +1644,8 @@ class Timer(BaseTimer):
             if adjusted_index is None:
                 raise RuntimeWarning("The split index '{}' is not a valid index or label".format(split_index))
 
-        self.output_stream.write(self._str(split_index=split_index, time_unit=time_unit, transformers=transformers))
+        for line in self._lines(split_index=split_index, time_unit=time_unit, transformers=transformers):
+            self.output_stream.write(line)
 
     def plot(self, split_index: Union[str, int]=-1, key: Union[str, int]=None, transformer: callable=None,
              time_unit=BaseTimer.MS, y_label: str="Time", x_label: str=None, title: str=None, plot_curve: bool=False,
@@ -786,6 +1680,7 @@ class Timer(BaseTimer):
         if adjusted_index is None:
             raise RuntimeWarning("{} is not a valid split label or index".format(adjusted_index))
 
+        resolution = self.splits[adjusted_index].resolution
         x_values, y_values = [], []
         for run in self.splits[adjusted_index].runs:
             if len(run.args) + len(run.kwargs) > 1:  # need to look at key
@@ -813,7 +1708,7 @@ class Timer(BaseTimer):
                 raise RuntimeWarning("All transformed, key values must be numbers to plot")
 
             x_values.append(value)
-            y_values.append(self._convert_time(run.time, time_unit))
+            y_values.append(self._convert_time(run.time, time_unit, resolution=resolution))
 
         scatter_plot = plt.plot(x_values, y_values, "o")
 
@@ -840,7 +1735,7 @@ class Timer(BaseTimer):
                 curve_x_values.append(lower_x)
                 curve_y_values.append(self._convert_time(
                     Split.best_fit_curves[curve[0]].calculate_point({key: lower_x}, curve[1]),
-                    time_unit)
+                    time_unit, resolution=resolution)
                 )
                 lower_x += step_value
 
@@ -853,7 +1748,8 @@ class Timer(BaseTimer):
                 label="{}: {}".format(
                     label[:17] + "..." if len(label) > 20 else label,
                     Split.best_fit_curves[curve[0]].equation(
-                        dict((key, self._convert_time(value, time_unit, False)) for key, value in curve[1].items()),
+                        dict((key, self._convert_time(value, time_unit, False, resolution=resolution))
+                             for key, value in curve[1].items()),
                         rounding=equation_rounding
                     )
                 )
@@ -887,7 +1783,15 @@ class Timer(BaseTimer):
         collapsed.update(dict((i, args[i]) for i in range(len(args))))
 
         tm = Split.best_fit_curves[parameters[0]].calculate_point(collapsed, parameters[1])
-        return self._convert_time(tm, time_unit, rounding=rounding)
+        return self._convert_time(tm, time_unit, rounding=rounding, resolution=self.resolution)
+
+    def save(self, path: str):
+        """
+        Save every split to a compact binary file that `.load()` can memory-map, see `exectiming.storage` for the
+        layout. Logged arguments are pickled, so they must be picklable.
+        :param path: the path of the file, which is overwritten if it exists
+        """
+        save_splits(self.splits, path, resolution=self.resolution)
 
     def sort_runs(self, split_index: Union[str, int]=all, reverse: bool=False,
                   keys: Union[str, int, Dict[Union[str, int], Union[str, int]]]=None,
@@ -903,8 +1807,6 @@ class Timer(BaseTimer):
                     used to get a value which will then be passed to this callable and the return value will be used
                     when sorting.
         """
-        identity = lambda item: item
-
         for i in range(len(self.splits)):
             split = self.splits[i]
 
@@ -921,7 +1823,7 @@ class Timer(BaseTimer):
                         cur_key = keys
 
                 # get correct transformer
-                cur_transformer = identity
+                cur_transformer = None
                 if transformers:
                     if isinstance(transformers, dict):
                         if i in transformers:
@@ -931,13 +1833,7 @@ class Timer(BaseTimer):
                     else:
                         cur_transformer = transformers
 
-                if cur_key is None:
-                    split.runs.sort(reverse=reverse, key=lambda item: item.time)
-                else:
-                    if isinstance(cur_key, int):
-                        split.runs.sort(reverse=reverse, key=lambda item: cur_transformer(item.args[cur_key]))
-                    else:
-                        split.runs.sort(reverse=reverse, key=lambda item: cur_transformer(item.kwargs[cur_key]))
+                split.sort_runs(key=cur_key, reverse=reverse, transformer=cur_transformer)
 
     def start(self):
         """
@@ -948,23 +1844,27 @@ class Timer(BaseTimer):
     def statistics(self, split_index: Union[int, str]=all, time_unit=BaseTimer.MS):
         """
         Output statistics for each split or for a specified split. The statistics are the number of runs, total time,
-        average, standard deviation, and variance
+        average, standard deviation, and variance, along with percentiles for splits that keep a quantile sketch, and
+        the min, max, and average of any metrics measured by probes, the CPU utilization and off-CPU time if the runs
+        were measured with a CPUProbe, and the time spent collecting garbage if they were measured with a GCProbe. If
+        spans are enabled and no split is specified, then the span tree is output after the splits.
         :param split_index: the index or label of the split to output statistics for, defaults to all
         :param time_unit: the time unit to output times in
         """
+
         for i in range(len(self.splits)):
             split = self.splits[i]
             if split_index != all and i != split_index and split.label != split_index:
                 continue
 
-            if not split.runs:  # skip splits with no logged times
+            stats = split.statistics()
+            if not stats["count"]:  # skip splits with no logged times
                 continue
 
-            stats = split.statistics()
             self.output_stream.write("{}[runs={}, total={} {}]:\n".format(
                 split.label,
                 stats["count"],
-                self._convert_time(stats["total"], time_unit),
+                self._convert_time(stats["total"], time_unit, resolution=split.resolution),
                 time_unit
             ))
 
@@ -972,40 +1872,252 @@ class Timer(BaseTimer):
             self.output_stream.write("{}{:>20} = {} | {} | {} {}\n".format(
                 self.indent,
                 "Min | Max | Average",
-                self._convert_time(stats["min"], time_unit),
-                self._convert_time(stats["max"], time_unit),
-                self._convert_time(stats["average"], time_unit),
+                self._convert_time(stats["min"], time_unit, resolution=split.resolution),
+                self._convert_time(stats["max"], time_unit, resolution=split.resolution),
+                self._convert_time(stats["average"], time_unit, resolution=split.resolution),
                 time_unit
             ))
             self.output_stream.write("{}{:>20} = {} {}\n".format(
                 self.indent,
                 "Standard Deviation",
-                self._convert_time(stats["standard_deviation"], time_unit),
+                self._convert_time(stats["standard_deviation"], time_unit, resolution=split.resolution),
                 time_unit
             ))
             self.output_stream.write("{}{:>20} = {} {}\n".format(
                 self.indent,
                 "Variance",
-                self._convert_time(stats["variance"], time_unit),
+                self._convert_time(stats["variance"], time_unit, resolution=split.resolution**2),  # clock units squared
                 time_unit
             ))
 
+            if split.sketch is not None:
+                self.output_stream.write("{}{:>20} = {} {}\n".format(
+                    self.indent,
+                    " | ".join("p{}".format(percentile) for percentile in split.percentiles),
+                    " | ".join(str(self._convert_time(stats["p{}".format(percentile)], time_unit,
+                                                      resolution=split.resolution))
+                               for percentile in split.percentiles),
+                    time_unit
+                ))
+
+            if split.stop_reason is not None:
+                self.output_stream.write("{}{:>20} = {}\n".format(self.indent, "Stop Reason", split.stop_reason))
+
+            if split.calls is not None:
+                self.output_stream.write("{}{:>20} = {} | {} ({:.2%})\n".format(
+                    self.indent,
+                    "Sampled | Calls",
+                    split.sampled_calls,
+                    stats["calls"],
+                    stats["sample_rate"]
+                ))
+                self.output_stream.write("{}{:>20} = {} {}\n".format(
+                    self.indent,
+                    "Estimated Total",
+                    self._convert_time(stats["estimated_total"], time_unit, resolution=split.resolution),
+                    time_unit
+                ))
+
+            if split.overhead is not None:
+                self.output_stream.write("{}{:>20} = {} | {} {}\n".format(
+                    self.indent,
+                    "Overhead Run | Iter",
+                    self._convert_time(split.overhead["run"], time_unit, resolution=split.resolution),
+                    self._convert_time(split.overhead["iteration"], time_unit, resolution=split.resolution),
+                    time_unit
+                ))
+
+            if "cpu_utilization" in stats:
+                self.output_stream.write("{}{:>20} = {:.2%} | {} {}\n".format(
+                    self.indent,
+                    "CPU Use | Off-CPU",
+                    stats["cpu_utilization"],
+                    self._convert_time(stats["off_cpu_time"], time_unit, resolution=split.resolution),
+                    time_unit
+                ))
+
+            if "gc_time" in stats:
+                self.output_stream.write("{}{:>20} = {} | {} {}\n".format(
+                    self.indent,
+                    "GC | Average w/o GC",
+                    self._convert_time(stats["gc_time"], time_unit, resolution=split.resolution),
+                    self._convert_time(stats["average_excluding_gc"], time_unit, resolution=split.resolution),
+                    time_unit
+                ))
+
+            for key, metric in stats.get("metrics", {}).items():
+                self.output_stream.write("{}{:>20} = {} | {} | {}\n".format(
+                    self.indent,
+                    key,
+                    self._format_metric(metric["min"]),
+                    self._format_metric(metric["max"]),
+                    self._format_metric(metric["average"])
+                ))
+
             self.output_stream.write("\n")
 
-    def split(self, label: str="Split"):
+        if split_index == all and self.spans is not None and self.spans.root.children:
+            self._span_statistics(time_unit)
+
+    def span(self, label: str="Span") -> _Span:
+        """
+        Provides a context manager, `with timer.span("label"):` or `async with timer.span("label"):`, that records how
+        long the block took in `.spans`, a call tree aggregated by path. A span entered inside another span is its
+        child, and the time of each node is split into the time spent in its children and its own exclusive time.
+        Spans are nested separately in each thread and asyncio task. Needs `Timer(spans=True)`.
+        :param label: the label of the span. Spans with the same label and the same parent are combined.
+        :return: a context manager
+        """
+        if self.spans is None:
+            raise RuntimeWarning("Spans must be enabled with Timer(spans=True)")
+
+        return _Span(self, label)
+
+    def _span_wrapper(self, func: callable) -> callable:
+        """
+        Wrap a function so every call is recorded as a span, see `.decorate()`
+        """
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_span_wrapper(*args, **kwargs) -> any:
+                async with _Span(self, func.__name__):
+                    return await func(*args, **kwargs)
+
+            return async_span_wrapper
+
+        @wraps(func)
+        def span_wrapper(*args, **kwargs) -> any:
+            with _Span(self, func.__name__):
+                return func(*args, **kwargs)
+
+        return span_wrapper
+
+    def _record_span(self, node: SpanNode, parent: SpanNode, elapsed: float):
+        """
+        Add a finished span to the tree. Every span that is measured goes through here.
+        """
+        self.spans.record(node, parent, elapsed)
+
+    def _span_statistics(self, time_unit=BaseTimer.MS):
+        """
+        Output each node of the span tree, indented by its depth, with its count and inclusive, exclusive, and average
+        times
+        :param time_unit: the time unit to output times in
+        """
+        self.output_stream.write("Spans[total={} {}]:\n".format(
+            self._convert_time(self.spans.root.child_time, time_unit, resolution=self.resolution), time_unit
+        ))
+
+        for node in self.spans.nodes():
+            self.output_stream.write("{}{:<30} [calls={}] Inclusive | Self | Average = {} | {} | {} {}\n".format(
+                self.indent * len(node.path),
+                node.label,
+                node.count,
+                self._convert_time(node.inclusive, time_unit, resolution=self.resolution),
+                self._convert_time(node.exclusive, time_unit, resolution=self.resolution),
+                self._convert_time(node.inclusive / node.count if node.count else 0, time_unit,
+                                   resolution=self.resolution),
+                time_unit
+            ))
+
+        self.output_stream.write("\n")
+
+    def split(self, label: str="Split") -> Split:
         """
         Create a new split that will be used for subsequent runs
         :param label: the label of the new split
+        :return: the new split
+        """
+        split = self.split_type(label=label, resolution=self.resolution, **self.split_options)
+        self.splits.append(split)
+        return split
+
+    def sweep(self, block: callable, sizes: Iterable[int]=None, grid: Dict[str, Iterable]=None, factory: callable=None,
+              runs=1, iterations_per_run=1, split_label=None, curve_type: str=any, exclude: Set[Union[str, int]]=(),
+              transformers: Union[callable, Dict[Union[str, int], callable]]=(),
+              copiers: Union[callable, Dict[Union[str, int], callable]]=None, workers: int=None,
+              subtract_overhead=False, probes: Sequence[Probe]=()) -> Union[None, Tuple[str, dict]]:
         """
-        self.splits.append(Split(label=label))
+        Measure a function across a range of input sizes, or every combination of a grid of argument values, and fit a
+        curve to the results, all in one new split. Each run logs its size, as the only positional argument, or its
+        grid point, as keyword arguments, rather than the input itself, so the split can be used for curve fitting
+        and doesn't keep large inputs alive. Inputs are built by `factory` outside of the measured time, once for each
+        size or point, and used for all of its runs.
+        :param block: the function to time
+        :param sizes: the input sizes, any iterable including a generator
+        :param grid: a map of keyword argument names to the values to try. Every combination is measured. Exactly one
+                    of `sizes` and `grid` must be given.
+        :param factory: called with each size, or with each grid point as keyword arguments, and returns the input to
+                    call `block` with. A tuple is used as the positional arguments and anything else as the only
+                    argument. If None, then `block` is called with the size or grid point itself.
+        :param runs: the number of times to measure the execution time for each size or point
+        :param iterations_per_run: the number of times to call `block` for each run
+        :param split_label: the label of the new split. If None, then `block.__name__` is used
+        :param curve_type: the curve type to fit, see `.best_fit_curve()`. Defaults to the best fitting one
+        :param exclude: grid arguments to leave out of the curve fitting, see `.best_fit_curve()`
+        :param transformers: function(s) that turn grid values into integers for curve fitting, see `.best_fit_curve()`
+        :param copiers: function(s) used to copy the inputs before each iteration, see `.time_it()`
+        :param workers: if set, the runs are split between this many worker processes, see `.time_it()`. Every input
+                    is built before any is measured, and they must all be picklable.
+        :param subtract_overhead: subtract the overhead of the timing harness from each run, see `.time_it()`
+        :param probes: measure more than time for each run, see `.time_it()`
+        :return: the name of the best fit curve and its parameters, or None if there isn't one
+        """
+        if (sizes is None) == (grid is None):
+            raise RuntimeWarning("Exactly one of sizes and grid must be given")
+
+        if grid is not None:
+            names = list(grid)
+            points = [((), dict(zip(names, values))) for values in product(*(grid[name] for name in names))]
+        else:
+            points = (((size,), {}) for size in sizes)
+
+        def build(args: tuple, kwargs: dict) -> Tuple[tuple, dict]:
+            if factory is None:
+                return args, kwargs
+
+            built = factory(*args, **kwargs)
+            return built if isinstance(built, tuple) else (built,), {}
+
+        target = self.split(label=block.__name__ if split_label is None else split_label)
+
+        overhead = 0
+        if subtract_overhead:
+            overhead = self._run_overhead(iterations_per_run, self._time)
+            target.overhead = self.calibrate(self._time)
+
+        def record(point: Tuple[tuple, dict], measured: List[Tuple[float, tuple, dict, dict]]):
+            for time, _, _, metrics in measured:
+                self._record(target, Run(label=block.__name__, time=max(time - overhead, 0), runs=1,
+                                         iterations_per_run=iterations_per_run, args=point[0], kwargs=point[1],
+                                         metrics=metrics))
+
+        # MEASURE
+        if workers:
+            points = list(points)
+            run_arguments = [arguments for arguments in (build(*point) for point in points) for _ in range(runs)]
+            _, measured = self._measure_parallel(block, run_arguments, workers, iterations_per_run, copiers,
+                                                 clock=self._time, probes=probes)
+            for i, point in enumerate(points):
+                record(point, measured[i * runs:(i + 1) * runs])
+        else:
+            for point in points:  # one at a time, so only a single input exists at once
+                _, measured = self._measure_runs(block, [build(*point)] * runs, iterations_per_run, copiers,
+                                                 clock=self._time, probes=probes)
+                record(point, measured)
+
+        self._flush()
+        return target.determine_best_fit(curve_type=curve_type, exclude=exclude, transformers=transformers)
 
     def time_it(self, block: Union[str, callable], *args, runs=1, iterations_per_run=1, call_callable_args=False,
                 log_arguments=False, split=True, split_label=None, globals: dict=(), locals: dict=(),
-                copiers: Union[callable, Dict[Union[str, int], callable]]=None, setup: str="", **kwargs) -> any:
+                copiers: Union[callable, Dict[Union[str, int], callable]]=None, setup: str="", workers: int=None,
+                subtract_overhead=False, probes: Sequence[Probe]=(), **kwargs) -> any:
         """
         Measure the execution time of a function are string. Positional and keyword arguments can be passed through to
-        `block` if it is a function. `eval` is used if `block` is a string and so a namespace can be passed to it by
-        setting `globals` and/or `locals`.
+        `block` if it is a function. If `block` is a string, then it is compiled once, along with `setup` and the loop
+        that times it, so it can be any number of statements, and a namespace can be passed to it by setting `globals`
+        and/or `locals`.
         :param block: either a callable or a string
         :param args: any positional arguments to pass into `block` if it is callable
         :param runs: the number of times to measure the execution time
@@ -1019,65 +2131,197 @@ class Timer(BaseTimer):
         :param split: create a split that will be used for any runs created measuring the execution time of `block`
         :param split_label: what the name of the new split will be. If None, then the label will be `block.__name__` if
                     `block` is callable. Otherwise, it will be the block itself.
-        :param globals: a global namespace to pass to `eval` if `block` is a string
-        :param locals: a local namespace to pass to `eval` if `block` is a string
+        :param globals: a global namespace to execute `block` in if it is a string
+        :param locals: names to add to the namespace `block` is executed in if it is a string
         :param copiers: function(s) that will be used to copy any arguments such that the copied version is passed into
                     the function. Useful when the wrapped function has side-effects and modifies one of the arguments.
                     In that case, any subsequent iterations will be using the modified version. Copiers are used on each
                     iteration to avoid that issue. Can be a single callable which will be used on all arguments, or a
                     map of positional indices or keyword argument names to functions. Only will be used if `block` is
                     `callable`
-        :param setup: used when `block` is a string. Will be executed once before `block` is evaluated to setup any
-                    needed names in the namespace.
+        :param setup: used when `block` is a string. Will be executed once before `block` is timed to setup any
+                    needed names.
+        :param workers: if set, the runs are split between this many worker processes which measure them at the same
+                    time. The runs are stored in the same order they would have been without `workers`. `block`, the
+                    arguments, and `copiers` must be picklable, so `block` has to be a string or a module-level
+                    function. Callable arguments are called in this process when `call_callable_args`.
+        :param subtract_overhead: subtract the overhead of the timing harness, see `.calibrate()`, from each run and
+                    store it in `split.overhead` so it appears in the output
+        :param probes: measure more than time for each run, like `probes=[MemoryProbe()]` for memory allocations. The
+                    values are stored in `Run.metrics` and appear in the output and statistics, see `exectiming.probes`
         :param kwargs: any keyword arguments to pass into `block` if it is callable
         :return: a return/result value of calling/evaluating `block`
         """
-        value = None
-        globals = globals if globals else {}
-        locals = locals if locals else {}
-        run_args, run_kwargs = None, None  # add to get rid of "might be referenced before declared", which is invalid
-
         if split:
             if split_label is None:
-                self.split(label=block.__name__ if callable(block) else block)
+                target = self.split(label=block.__name__ if callable(block) else block)
             else:
-                self.split(label=split_label)
-        elif not self.splits:
-            raise RuntimeWarning("No split exists. Do .split(), decorate(split=True), or Timer(split=True)")
+                target = self.split(label=split_label)
+        else:
+            target = self._current_split()
+            if target is None:
+                raise RuntimeWarning("No split exists. Do .split(), decorate(split=True), or Timer(split=True)")
 
-        # setup anything needed for future runs of `block` if it is a string
-        if not callable(block) and setup:
-            exec(setup)
+        run_arguments = self._run_arguments(args if callable(block) else (), kwargs if callable(block) else {}, runs,
+                                            call_callable_args and callable(block))
 
         # MEASURE
-        for _ in range(runs):
-            if callable(block):
-                if call_callable_args:
-                    run_args, run_kwargs = self._call_callable_args(args, kwargs)
-                else:
-                    run_args, run_kwargs = args, kwargs
+        if workers:
+            value, measured = self._measure_parallel(block, run_arguments, workers, iterations_per_run, copiers,
+                                                     globals, locals, setup, self._time, probes)
+        else:
+            value, measured = self._measure_runs(block, run_arguments, iterations_per_run, copiers, globals, locals,
+                                                 setup, self._time, probes)
 
-            st = StaticTimer._time()
-            for _ in range(iterations_per_run):
-                if callable(block):
-                    if copiers is not None:  # conditional should have minimal effect on execution time
-                        delta = StaticTimer._time()
-                        iteration_args, iteration_kwargs = StaticTimer._argument_copier(run_args, run_kwargs, copiers)
-                        st += StaticTimer._time() - delta  # ignore the amount of time needed to copy the arguments
-                    else:
-                        iteration_args, iteration_kwargs = run_args, run_kwargs
+        overhead = 0
+        if subtract_overhead:
+            overhead = self._run_overhead(iterations_per_run, self._time, not callable(block))
+            target.overhead = self.calibrate(self._time, string_block=not callable(block))
 
-                    value = block(*iteration_args, **iteration_kwargs)
-                else:
-                    value = eval(block, globals, locals)
+        for time, run_args, run_kwargs, metrics in measured:
+            run = Run(label=block.__name__ if callable(block) else block, time=max(time - overhead, 0), runs=1,
+                      iterations_per_run=iterations_per_run, metrics=metrics)
 
-            run = Run(label=block.__name__ if callable(block) else block, time=self._time() - st,
-                      runs=1, iterations_per_run=iterations_per_run)
+            if log_arguments and callable(block):
+                run.args = run_args
+                run.kwargs = run_kwargs
+
+            self._record(target, run)
+
+        return value
+
+    def time_it_map(self, block: callable, argument_sets: Iterable[Tuple[tuple, dict]], runs=1, iterations_per_run=1,
+                    log_arguments=True, split=True, split_label=None,
+                    copiers: Union[callable, Dict[Union[str, int], callable]]=None, workers: int=None,
+                    subtract_overhead=False, probes: Sequence[Probe]=()) -> any:
+        """
+        Measure the execution time of a function for each of several independent sets of arguments, storing all of the
+        runs in a single split. Useful for gathering data for `.best_fit_curve()`.
+        :param block: the function to time
+        :param argument_sets: each item is a tuple of positional arguments and a dict of keyword arguments
+        :param runs: the number of times to measure the execution time for each set of arguments
+        :param iterations_per_run: the number of times to call `block` for each run
+        :param log_arguments: whether to store the arguments with each run
+        :param split: create a split that will be used for the runs
+        :param split_label: the label of the new split. If None, then `block.__name__` is used
+        :param copiers: function(s) used to copy the arguments before each iteration, see `.time_it()`
+        :param workers: if set, the runs are split between this many worker processes, see `.time_it()`
+        :param subtract_overhead: subtract the overhead of the timing harness from each run, see `.time_it()`
+        :param probes: measure more than time for each run, see `.time_it()`
+        :return: the return value of the last call of `block`
+        """
+        if split:
+            target = self.split(label=block.__name__ if split_label is None else split_label)
+        else:
+            target = self._current_split()
+            if target is None:
+                raise RuntimeWarning("No split exists. Do .split(), decorate(split=True), or Timer(split=True)")
+
+        run_arguments = [(tuple(args), dict(kwargs)) for args, kwargs in argument_sets for _ in range(runs)]
+
+        # MEASURE
+        if workers:
+            value, measured = self._measure_parallel(block, run_arguments, workers, iterations_per_run, copiers,
+                                                     clock=self._time, probes=probes)
+        else:
+            value, measured = self._measure_runs(block, run_arguments, iterations_per_run, copiers, clock=self._time,
+                                                 probes=probes)
+
+        overhead = 0
+        if subtract_overhead:
+            overhead = self._run_overhead(iterations_per_run, self._time)
+            target.overhead = self.calibrate(self._time)
+
+        for time, run_args, run_kwargs, metrics in measured:
+            run = Run(label=block.__name__, time=max(time - overhead, 0), runs=1,
+                      iterations_per_run=iterations_per_run, metrics=metrics)
 
             if log_arguments:
                 run.args = run_args
                 run.kwargs = run_kwargs
 
-            self.splits[-1].add_run(run)
+            self._record(target, run)
 
         return value
+
+
+class ThreadSafeTimer(Timer):
+    """
+    A Timer that can be shared between threads. Each thread records its runs into its own buffer, so recording a run
+    never waits on a lock, and the buffers are merged into the splits whenever `.splits` is read, which all of the
+    output, statistics, and curve fitting methods do. Each thread also has its own current split and its own starting
+    point for `.log()`, so a thread that calls `.split()` or `.start()` does not affect any of the others. Threads that
+    have never called `.split()` record into the most recently created split.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Create a new thread-safe timer. Takes the same arguments as `Timer()`. If `start`, then `.start()` is only
+        called for the thread creating the timer.
+        """
+        self._local = local()
+        self._lock = Lock()
+        self._buffers: List[Tuple[object, deque]] = []  # (thread, buffer of (split, run))
+        self._splits: List[Split] = []
+        super().__init__(*args, **kwargs)
+
+    @property
+    def splits(self) -> List[Split]:
+        """
+        All of the splits, after any runs that are still in thread buffers have been added to them
+        """
+        self._flush()
+        return self._splits
+
+    @splits.setter
+    def splits(self, splits: List[Split]):
+        self._splits = splits
+
+    @property
+    def log_base_point(self) -> Union[None, float]:
+        return getattr(self._local, "log_base_point", None)
+
+    @log_base_point.setter
+    def log_base_point(self, value: Union[None, float]):
+        self._local.log_base_point = value
+
+    def _current_split(self) -> Union[None, Split]:
+        split = getattr(self._local, "split", None)
+        if split is None and self._splits:
+            split = self._splits[-1]
+
+        return split
+
+    def _flush(self):
+        """
+        Move every buffered run into its split. Buffers of threads that have finished are dropped once they are empty.
+        """
+        with self._lock:
+            for thread, buffer in self._buffers:
+                while buffer:  # only the flushing thread removes items, so this never pops an empty deque
+                    split, run = buffer.popleft()
+                    split.add_run(run)
+
+            self._buffers = [(thread, buffer) for thread, buffer in self._buffers if thread.is_alive() or buffer]
+
+    def _record_span(self, node: SpanNode, parent: SpanNode, elapsed: float):
+        with self._lock:
+            self.spans.record(node, parent, elapsed)
+
+    def _record(self, split: Split, run: Run):
+        try:
+            buffer = self._local.buffer
+        except AttributeError:
+            buffer = self._local.buffer = deque()
+            with self._lock:
+                self._buffers.append((current_thread(), buffer))
+
+        buffer.append((split, run))  # deque.append is atomic, so flushing can happen at the same time
+
+    def split(self, label: str="Split") -> Split:
+        split = self.split_type(label=label, resolution=self.resolution, **self.split_options)
+        with self._lock:
+            self._splits.append(split)
+
+        self._local.split = split
+        return split
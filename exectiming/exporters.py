@@ -0,0 +1,57 @@
+# ExecTiming - A Python packaged for measuring the execution time of code
+# Copyright (C) <2019>  <Jacob Morris>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Provides exporters that write runs one at a time as JSON Lines or CSV, so exporting a split of any size takes a constant
+amount of memory. Each exporter takes an iterable of rows, which are maps containing the keys in FIELDS, and a
+file-like object with a `.write(str)` method.
+"""
+
+from csv import writer
+from json import dumps
+from typing import Iterable, TextIO
+
+JSONL, CSV = "jsonl", "csv"
+FIELDS = ("split", "label", "time", "time_unit", "runs", "iterations_per_run", "args", "kwargs")
+
+
+def export_jsonl(rows: Iterable[dict], stream: TextIO):
+    """
+    Write each row as a JSON object on its own line. Argument values that aren't JSON types are written with `str`.
+    :param rows: maps containing the keys in FIELDS
+    :param stream: the file-like object to write to
+    """
+    for row in rows:
+        stream.write(dumps(row, default=str))
+        stream.write("\n")
+
+
+def export_csv(rows: Iterable[dict], stream: TextIO):
+    """
+    Write a header line followed by a line for each row. `args` and `kwargs` are written as JSON, like `export_jsonl()`.
+    :param rows: maps containing the keys in FIELDS
+    :param stream: the file-like object to write to
+    """
+    csv_writer = writer(stream, lineterminator="\n")
+    csv_writer.writerow(FIELDS)
+
+    for row in rows:
+        csv_writer.writerow((row["split"], row["label"], row["time"], row["time_unit"], row["runs"],
+                             row["iterations_per_run"], dumps(row["args"], default=str),
+                             dumps(row["kwargs"], default=str)))
+
+
+exporters = {JSONL: export_jsonl, CSV: export_csv}
@@ -0,0 +1,51 @@
+# ExecTiming - A Python packaged for measuring the execution time of code
+# Copyright (C) <2019>  <Jacob Morris>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Provides LazyModule, which stands in for a heavy optional dependency so that importing exectiming stays fast
+"""
+
+from importlib import import_module
+from importlib.util import find_spec
+
+
+def is_available(name: str) -> bool:
+    """
+    Check whether a top-level module can be imported without actually importing it
+    :param name: the name of the module
+    :return: True if the module was found
+    """
+    return find_spec(name) is not None
+
+
+class LazyModule:
+    """
+    A placeholder for a module that is only imported the first time one of its attributes is used. `on_import` is
+    called with the module right after it is imported, to do any configuration that would normally follow the import.
+    """
+    def __init__(self, name: str, on_import: callable=None):
+        self._name = name
+        self._on_import = on_import
+        self._module = None
+
+    def __getattr__(self, attribute: str):
+        if self._module is None:
+            module = import_module(self._name)
+            if self._on_import is not None:
+                self._on_import(module)
+            self._module = module
+
+        return getattr(self._module, attribute)
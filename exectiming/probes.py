@@ -0,0 +1,200 @@
+# ExecTiming - A Python packaged for measuring the execution time of code
+# Copyright (C) <2019>  <Jacob Morris>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Probes measure something other than wall time around each run, like memory allocations. A probe is started just before
+a run's clock is started and stopped just after it is stopped, so the probe's own cost is never part of the measured
+time. The values it returns are stored in `Run.metrics` and aggregated by key in `Split.metrics`.
+"""
+
+from sys import getallocatedblocks
+from time import perf_counter, process_time, thread_time
+from typing import Dict, List, Sequence
+import gc
+import tracemalloc
+
+
+class Probe:
+    """
+    The base class of all probes. `.start()` returns a token holding whatever state the probe needs, which is passed
+    back to `.stop()`, so a single probe can measure any number of runs at the same time. Probes are pickled when runs
+    are measured in worker processes.
+    """
+    def start(self) -> any:
+        """
+        Called just before a run starts
+        :return: a token that is passed to `.stop()`
+        """
+        return None
+
+    def stop(self, token: any) -> Dict[str, float]:
+        """
+        Called just after a run finishes
+        :param token: the token returned by `.start()`
+        :return: a map of metric names to values
+        """
+        return {}
+
+
+class MemoryProbe(Probe):
+    """
+    Measures the memory allocated by each run with `tracemalloc`:
+        `peak_bytes`: the most memory allocated at once during the run, above what was allocated when it started
+        `net_bytes`: the memory still allocated when the run finished
+        `net_blocks`: the change in the number of memory blocks the interpreter has allocated, from
+            `sys.getallocatedblocks()`
+    If tracemalloc isn't already tracing, then it is started for each run and stopped afterwards. Every allocation is
+    much slower while it is tracing, so times measured with this probe are larger than without it. The peak is shared
+    by the whole process, so it is only accurate when runs aren't being measured in other threads at the same time,
+    and it needs Python 3.9 or later.
+    """
+    def start(self) -> tuple:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        elif hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+        return started, tracemalloc.get_traced_memory()[0], getallocatedblocks()
+
+    def stop(self, token: tuple) -> Dict[str, float]:
+        blocks = getallocatedblocks()
+        current, peak = tracemalloc.get_traced_memory()
+        started, start_current, start_blocks = token
+        if started:
+            tracemalloc.stop()
+
+        metrics = {"net_bytes": current - start_current, "net_blocks": blocks - start_blocks}
+        if started or hasattr(tracemalloc, "reset_peak"):
+            metrics["peak_bytes"] = max(peak - start_current, 0)
+
+        return metrics
+
+
+class CPUProbe(Probe):
+    """
+    Measures the CPU time used during each run, in seconds, next to the wall time the timer measures:
+        `process_time`: the CPU time of every thread in the process, from `time.process_time()`
+        `thread_time`: the CPU time of the thread the run was measured in, from `time.thread_time()`
+    Splits use these to report `cpu_utilization` and `off_cpu_time` in `.statistics()`, which separate runs that are
+    compute-bound from runs that spent their time waiting, like on I/O or a lock.
+    """
+    def start(self) -> tuple:
+        return process_time(), thread_time()
+
+    def stop(self, token: tuple) -> Dict[str, float]:
+        thread, process = thread_time(), process_time()
+        return {"process_time": process - token[0], "thread_time": thread - token[1]}
+
+
+class _CollectionRecorder:
+    """
+    A `gc.callbacks` entry that counts the collections of each generation and adds up how long they take
+    """
+    def __init__(self):
+        self.collections = [0, 0, 0]
+        self.time = 0.0
+        self._start = None
+
+    def __call__(self, phase: str, info: dict):
+        if phase == "start":
+            self._start = perf_counter()
+        elif self._start is not None:
+            self.time += perf_counter() - self._start
+            self.collections[min(info["generation"], 2)] += 1
+            self._start = None
+
+
+class GCProbe(Probe):
+    """
+    Controls the garbage collector around each run and accounts for every collection that happens during it:
+        `gc_collections_0`, `gc_collections_1`, `gc_collections_2`: the number of collections of each generation
+        `gc_time`: the seconds spent collecting, which splits use to report times with and without it
+    `mode` chooses what is done to the collector before each run, outside of the measured time:
+        `GCProbe.ENABLE`: nothing, so collections happen whenever they normally would
+        `GCProbe.DISABLE`: the collector is disabled for the run, like `timeit` does
+        `GCProbe.FREEZE`: every existing object is moved to the permanent generation with `gc.freeze()`, so
+            collections during the run only have to look at objects the run created. They are thawed again with
+            `gc.unfreeze()` afterwards, which would also thaw objects the application froze itself, like a server that
+            freezes after loading its code, so a RuntimeWarning is raised instead if anything is already frozen.
+        `GCProbe.COLLECT`: a full collection is done first, so the run doesn't pay for garbage made before it
+    The collector is global, so runs measured at the same time in other threads are affected and counted too.
+    """
+    ENABLE, DISABLE, FREEZE, COLLECT = "enable", "disable", "freeze", "collect"
+
+    def __init__(self, mode: str=ENABLE):
+        """
+        :param mode: what to do to the garbage collector before each run
+        """
+        if mode not in (self.ENABLE, self.DISABLE, self.FREEZE, self.COLLECT):
+            raise RuntimeWarning("{} is an invalid mode. Must be in [{}]".format(
+                mode, ", ".join((self.ENABLE, self.DISABLE, self.FREEZE, self.COLLECT))
+            ))
+
+        self.mode = mode
+
+    def start(self) -> tuple:
+        enabled = gc.isenabled()
+        if self.mode == self.COLLECT:
+            gc.collect()
+        elif self.mode == self.DISABLE:
+            gc.disable()
+        elif self.mode == self.FREEZE:
+            if gc.get_freeze_count():
+                raise RuntimeWarning("{} objects are already frozen and would be thawed after the run, use a mode "
+                                     "other than freeze".format(gc.get_freeze_count()))
+            gc.freeze()
+
+        recorder = _CollectionRecorder()
+        gc.callbacks.append(recorder)
+        return enabled, recorder
+
+    def stop(self, token: tuple) -> Dict[str, float]:
+        enabled, recorder = token
+        gc.callbacks.remove(recorder)
+
+        if self.mode == self.DISABLE and enabled:
+            gc.enable()
+        elif self.mode == self.FREEZE:
+            gc.unfreeze()
+
+        metrics = dict(("gc_collections_{}".format(generation), count)
+                       for generation, count in enumerate(recorder.collections))
+        metrics["gc_time"] = recorder.time
+        return metrics
+
+
+def start_probes(probes: Sequence[Probe]) -> List[any]:
+    """
+    Start each probe
+    :param probes: the probes
+    :return: the tokens of the probes, in the same order
+    """
+    return [probe.start() for probe in probes]
+
+
+def stop_probes(probes: Sequence[Probe], tokens: List[any]) -> Dict[str, float]:
+    """
+    Stop each probe, in the reverse of the order they were started in
+    :param probes: the probes
+    :param tokens: the tokens returned by `start_probes()`
+    :return: the metrics of every probe combined
+    """
+    metrics = {}
+    for i in range(len(probes) - 1, -1, -1):
+        metrics.update(probes[i].stop(tokens[i]))
+
+    return metrics
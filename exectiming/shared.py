@@ -0,0 +1,241 @@
+# ExecTiming - A Python packaged for measuring the execution time of code
+# Copyright (C) <2019>  <Jacob Morris>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Provides SharedStatistics, a shared memory segment that worker processes publish the statistics of their Timers into,
+so any other process can read statistics for the whole fleet without pickling anything or talking over a socket.
+
+The segment starts with a header, `<4sHHHH`: the magic bytes, the format version, the number of workers, the number of
+splits each worker can publish, and the size of a label. After it is a row for each worker containing a slot for each
+split. A slot is a sequence number followed by `BODY`: the label, the resolution and run count as integers, and the rest
+of the state of a RunningStatistics as doubles. Each row only ever has one writer, and slots are protected with a
+seqlock: the writer makes the sequence number odd, writes the slot, then makes it even again, and a reader retries
+whenever the number was odd or changed while it was reading. A reader gives up after `SharedStatistics.timeout`
+seconds, as a slot that stays odd belongs to a writer that died part way through it.
+"""
+
+from .data_structures import RunningStatistics, Split
+from struct import calcsize, pack_into, unpack_from
+from time import perf_counter, sleep
+from typing import Dict, List, TYPE_CHECKING, Union
+
+if TYPE_CHECKING:
+    from .exectiming import Timer
+
+try:
+    from multiprocessing.shared_memory import SharedMemory
+    MISSING_SHARED_MEMORY = False
+except ImportError:  # Python 3.7
+    MISSING_SHARED_MEMORY = True
+
+MAGIC = b"EXTS"
+VERSION = 1
+HEADER = "<4sHHHH"
+HEADER_SIZE = 16
+SEQUENCE = "<Q"
+BODY = "<{}sqq6d"  # label, resolution, count, mean, m2, min, max, sum, compensation
+
+
+class SharedStatistics:
+    """
+    A shared memory segment holding the split statistics of many worker processes. Create it once, in the parent
+    process, with `SharedStatistics.create()`, then have each worker `.attach()` to it by name and `.publish()` its
+    timer into its own row whenever it likes, such as after every request. Statistics are merged across workers by
+    split label with `.statistics()`, from any process. Each worker must use a different row.
+    """
+    timeout = 1.0  # the seconds a reader waits for a slot that is being written before giving up
+
+    def __init__(self, memory: "SharedMemory", owner: bool):
+        """
+        Use `.create()` or `.attach()` instead
+        :param memory: the shared memory segment
+        :param owner: whether this object created the segment, in which case `.unlink()` should be called on it
+        """
+        self.memory = memory
+        self.owner = owner
+
+        magic, version, self.workers, self.splits, self.label_size = unpack_from(HEADER, memory.buf)
+        if magic != MAGIC:
+            raise RuntimeWarning("{} is not an ExecTiming shared memory segment".format(memory.name))
+        if version > VERSION:
+            raise RuntimeWarning("{} uses version {}, but only {} is supported".format(memory.name, version, VERSION))
+
+        self._body = BODY.format(self.label_size)
+        self._slot_size = calcsize(SEQUENCE) + calcsize(self._body)
+
+    @property
+    def name(self) -> str:
+        """
+        The name other processes use to attach to the segment
+        """
+        return self.memory.name
+
+    @staticmethod
+    def _size(workers: int, splits: int, label_size: int) -> int:
+        return HEADER_SIZE + workers * splits * (calcsize(SEQUENCE) + calcsize(BODY.format(label_size)))
+
+    @staticmethod
+    def create(name: str=None, workers: int=64, splits: int=64, label_size: int=64) -> "SharedStatistics":
+        """
+        Create a new, empty segment
+        :param name: the name of the segment, or None to have one generated
+        :param workers: the number of worker rows
+        :param splits: the number of distinct split labels each worker can publish
+        :param label_size: the maximum number of bytes in a UTF-8 encoded split label
+        :return: the new segment
+        """
+        if MISSING_SHARED_MEMORY:
+            raise RuntimeWarning("multiprocessing.shared_memory is needed and it couldn't be found")
+
+        memory = SharedMemory(name=name, create=True, size=SharedStatistics._size(workers, splits, label_size))
+        memory.buf[:len(memory.buf)] = bytes(len(memory.buf))  # zeroed, so every slot starts empty and even
+        pack_into(HEADER, memory.buf, 0, MAGIC, VERSION, workers, splits, label_size)
+
+        return SharedStatistics(memory, owner=True)
+
+    @staticmethod
+    def attach(name: str) -> "SharedStatistics":
+        """
+        Attach to a segment that was created by another process
+        :param name: the name of the segment, see `.name`
+        :return: the segment
+        """
+        if MISSING_SHARED_MEMORY:
+            raise RuntimeWarning("multiprocessing.shared_memory is needed and it couldn't be found")
+
+        try:
+            memory = SharedMemory(name=name, track=False)
+        except TypeError:  # before Python 3.13, attaching registers the segment to be removed when this process exits
+            from multiprocessing import resource_tracker
+            register, resource_tracker.register = resource_tracker.register, lambda name, rtype: None
+            try:
+                memory = SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+
+        return SharedStatistics(memory, owner=False)
+
+    def _offset(self, worker: int, slot: int) -> int:
+        return HEADER_SIZE + (worker * self.splits + slot) * self._slot_size
+
+    def _write_slot(self, offset: int, label: bytes, resolution: int, accumulator: RunningStatistics):
+        buffer = self.memory.buf
+        sequence = unpack_from(SEQUENCE, buffer, offset)[0]
+        sequence += sequence % 2  # a previous writer of this row may have died part way through the slot
+
+        pack_into(SEQUENCE, buffer, offset, sequence + 1)  # odd, so readers know the slot is being written
+        pack_into(self._body, buffer, offset + calcsize(SEQUENCE), label, resolution, accumulator.count,
+                  accumulator.mean, accumulator.m2,
+                  accumulator.min if accumulator.min is not None else 0, accumulator.max or 0,
+                  accumulator._sum, accumulator._compensation)
+        pack_into(SEQUENCE, buffer, offset, sequence + 2)
+
+    def _read_slot(self, offset: int) -> tuple:
+        buffer = self.memory.buf
+        deadline = perf_counter() + self.timeout
+        while True:
+            sequence = unpack_from(SEQUENCE, buffer, offset)[0]
+            if not sequence % 2:
+                values = unpack_from(self._body, buffer, offset + calcsize(SEQUENCE))
+                if unpack_from(SEQUENCE, buffer, offset)[0] == sequence:
+                    return values
+
+            if perf_counter() > deadline:
+                worker, slot = divmod((offset - HEADER_SIZE) // self._slot_size, self.splits)
+                raise RuntimeWarning("Slot {} of worker {} has been being written for over {} seconds, its writer may "
+                                     "have died".format(slot, worker, self.timeout))
+
+            sleep(0)  # the writer is in the middle of the slot, let it finish
+
+    def publish(self, worker: int, splits: Union["Timer", List[Split]]):
+        """
+        Write the statistics of every split into this worker's row, replacing what was there. Splits with the same
+        label are merged into one slot. Nothing is pickled and no lock is taken, so this is cheap enough to call often.
+        :param worker: the index of this worker's row. Each worker must use its own.
+        :param splits: a Timer or a list of splits
+        """
+        if not 0 <= worker < self.workers:
+            raise RuntimeWarning("{} is not a valid worker, there are {} rows".format(worker, self.workers))
+
+        merged: Dict[str, RunningStatistics] = {}
+        resolutions: Dict[str, int] = {}
+        for split in getattr(splits, "splits", splits):
+            split.statistics()  # brings the accumulator up to date with the runs
+            merged.setdefault(split.label, RunningStatistics()).merge(split.accumulator)
+            resolutions[split.label] = split.resolution
+
+        if len(merged) > self.splits:
+            raise RuntimeWarning("There are {} split labels, but only {} can be published".format(len(merged),
+                                                                                                  self.splits))
+
+        for slot, label in enumerate(merged):
+            encoded = label.encode("utf-8")
+            if len(encoded) > self.label_size:
+                raise RuntimeWarning("The label {} is longer than {} bytes".format(label, self.label_size))
+
+            self._write_slot(self._offset(worker, slot), encoded, resolutions[label], merged[label])
+
+        for slot in range(len(merged), self.splits):  # clear slots left over from a previous publish
+            offset = self._offset(worker, slot)
+            if self._read_slot(offset)[0].rstrip(b"\0"):
+                self._write_slot(offset, b"", 1, RunningStatistics())
+
+    def worker_statistics(self, worker: int) -> Dict[str, RunningStatistics]:
+        """
+        Read what a single worker has published
+        :param worker: the index of the worker's row
+        :return: a map of split labels to accumulators, with all times in seconds
+        """
+        accumulators = {}
+        for slot in range(self.splits):
+            label, resolution, count, mean, m2, minimum, maximum, total, compensation = self._read_slot(
+                self._offset(worker, slot)
+            )
+            label = label.rstrip(b"\0").decode("utf-8")
+            if not label:
+                continue
+
+            accumulators[label] = RunningStatistics.from_dict({
+                "count": count, "mean": mean / resolution, "m2": m2 / resolution**2,
+                "min": minimum / resolution if count else None, "max": maximum / resolution if count else None,
+                "sum": total / resolution, "compensation": compensation / resolution
+            })
+
+        return accumulators
+
+    def statistics(self) -> Dict[str, Dict[str, Union[float, int]]]:
+        """
+        Merge what every worker has published by split label
+        :return: a map of split labels to statistics, see `Split.statistics()`, with all times in seconds
+        """
+        merged: Dict[str, RunningStatistics] = {}
+        for worker in range(self.workers):
+            for label, accumulator in self.worker_statistics(worker).items():
+                merged.setdefault(label, RunningStatistics()).merge(accumulator)
+
+        return dict((label, accumulator.statistics()) for label, accumulator in merged.items())
+
+    def close(self):
+        """
+        Detach from the segment. Every process should do this once it is done with it.
+        """
+        self.memory.close()
+
+    def unlink(self):
+        """
+        Remove the segment once every process has closed it. Should only be called by the process that created it.
+        """
+        self.memory.unlink()
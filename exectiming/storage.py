@@ -0,0 +1,204 @@
+# ExecTiming - A Python packaged for measuring the execution time of code
+# Copyright (C) <2019>  <Jacob Morris>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Save splits to, and load them from, a compact binary format that can be memory-mapped. The layout is:
+    1. A fixed prefix, `<4sHHQ`: the magic bytes, the format version, padding, and the length of the header
+    2. A JSON header with the timer's resolution, and for each split its label, resolution, run labels, accumulator,
+        quantile sketch, overhead, stop reason, sampling counts, metric accumulators, and the offset, type code, and
+        length of each of its columns
+    3. The data section. Each split has its `times`, `run_counts`, `iterations`, and `label_indices` columns, in native
+        byte order, followed by its pickled argument table and its pickled table of run metrics. Everything starts on
+        an 8-byte boundary.
+
+The argument and metric tables are pickled, so only load files from a trusted source.
+"""
+
+from .data_structures import ColumnarSplit, MappedSplit, QuantileSketch, RunningStatistics, Split
+from array import array
+from json import dumps, loads
+from mmap import mmap, ACCESS_READ
+from os import fdopen, remove, replace
+from os.path import abspath, dirname, exists
+from pickle import dumps as pickle_dumps, HIGHEST_PROTOCOL
+from struct import calcsize, pack, unpack_from
+from sys import byteorder
+from tempfile import mkstemp
+from typing import Dict, List, Tuple, Union
+
+MAGIC = b"EXTM"
+VERSION = 1
+PREFIX = "<4sHHQ"
+COLUMNS = (("times", None), ("run_counts", "I"), ("iterations", "I"), ("label_indices", "I"))
+
+
+def _padding(length: int) -> bytes:
+    """
+    :return: the bytes needed after `length` bytes to get to the next 8-byte boundary
+    """
+    return b"\0" * (-length % 8)
+
+
+def _split_columns(split: Split) -> Tuple[Dict[str, Union[array, memoryview]], List[str],
+                                           Dict[int, Tuple[tuple, dict]], Dict[int, Dict[str, float]]]:
+    """
+    Get the columns, run labels, argument table, and metric table of any kind of split. ColumnarSplits, including
+    MappedSplits, are used as they are, and the columns of any other split are built from its runs.
+    :param split: the split to get the columns of
+    :return: a map of column names to arrays or memoryviews, the labels, the map of run indices to arguments, and the
+                map of run indices to metrics
+    """
+    if isinstance(split, ColumnarSplit):
+        return (dict((name, getattr(split, name)) for name, _ in COLUMNS), split.labels, split.arguments,
+                split.run_metrics)
+
+    columns = dict((name, array(typecode or ("d" if split.resolution == 1 else "q"))) for name, typecode in COLUMNS)
+    labels, lookup, arguments, run_metrics = [], {}, {}, {}
+
+    for i, run in enumerate(split.runs):
+        if run.label not in lookup:
+            lookup[run.label] = len(labels)
+            labels.append(run.label)
+        if run.args or run.kwargs:
+            arguments[i] = (tuple(run.args), dict(run.kwargs))
+        if run.metrics:
+            run_metrics[i] = dict(run.metrics)
+
+        columns["times"].append(run.time)
+        columns["run_counts"].append(run.runs)
+        columns["iterations"].append(run.iterations_per_run)
+        columns["label_indices"].append(lookup[run.label])
+
+    return columns, labels, arguments, run_metrics
+
+
+def save_splits(splits: List[Split], path: str, resolution: int=1):
+    """
+    Write splits to a file in the binary format described above
+    :param splits: the splits to save
+    :param path: the path of the file, which is overwritten if it exists
+    :param resolution: the resolution of the timer the splits came from, see `Timer(nanoseconds=)`
+    """
+    header = {"byteorder": byteorder, "resolution": resolution, "splits": []}
+    blocks = []
+    offset = 0
+
+    for split in splits:
+        split.statistics()  # brings the accumulator up to date with the runs, like runs added to `.runs` directly
+        columns, labels, arguments, run_metrics = _split_columns(split)
+        entry = {
+            "label": split.label,
+            "resolution": split.resolution,
+            "labels": labels,
+            "accumulator": split.accumulator.to_dict(),
+            "sketch": split.sketch.to_dict() if split.sketch is not None else None,
+            "overhead": split.overhead,
+            "stop_reason": split.stop_reason,
+            "calls": split.calls,
+            "sampled_calls": split.sampled_calls,
+            "metrics": dict((key, accumulator.to_dict()) for key, accumulator in split.metrics.items()),
+            "columns": {}
+        }
+
+        for name, _ in COLUMNS:
+            view = memoryview(columns[name])
+            entry["columns"][name] = {"offset": offset, "format": view.format, "count": len(view)}
+            blocks.append(view)
+            blocks.append(_padding(view.nbytes))
+            offset += view.nbytes + len(blocks[-1])
+
+        for name, table in (("arguments", arguments), ("run_metrics", run_metrics)):
+            pickled = pickle_dumps(table, protocol=HIGHEST_PROTOCOL) if table else b""
+            entry[name] = {"offset": offset, "length": len(pickled)}
+            blocks.append(pickled)
+            blocks.append(_padding(len(pickled)))
+            offset += len(pickled) + len(blocks[-1])
+
+        header["splits"].append(entry)
+
+    # the columns of splits loaded from `path` may still be views into its memory map, so the file is written next to
+    # it and then swapped in, rather than truncating it while they are being read
+    encoded = dumps(header).encode("utf-8")
+    descriptor, temporary_path = mkstemp(dir=dirname(abspath(path)), suffix=".tmp")
+    try:
+        with fdopen(descriptor, "wb") as file:
+            file.write(pack(PREFIX, MAGIC, VERSION, 0, len(encoded)))
+            file.write(encoded)
+            file.write(_padding(calcsize(PREFIX) + len(encoded)))
+
+            for block in blocks:
+                file.write(block)
+
+        replace(temporary_path, path)
+    except BaseException:
+        if exists(temporary_path):
+            remove(temporary_path)
+        raise
+
+
+def load_splits(path: str, memory_map: bool=True) -> Tuple[List[MappedSplit], int]:
+    """
+    Read splits that were written by `save_splits()`
+    :param path: the path of the file
+    :param memory_map: map the file into memory instead of reading it, so only the parts that are used are ever read
+                from disk. Otherwise, the whole file is read at once.
+    :return: a MappedSplit for each saved split, and the resolution of the timer they came from
+    """
+    with open(path, "rb") as file:
+        buffer = mmap(file.fileno(), 0, access=ACCESS_READ) if memory_map else file.read()
+
+    magic, version, _, header_length = unpack_from(PREFIX, buffer)
+    if magic != MAGIC:
+        raise RuntimeWarning("{} is not an ExecTiming file".format(path))
+    if version > VERSION:
+        raise RuntimeWarning("{} uses version {} of the format, but only {} is supported".format(path, version,
+                                                                                                 VERSION))
+
+    start = calcsize(PREFIX)
+    header = loads(bytes(buffer[start:start + header_length]).decode("utf-8"))
+    if header["byteorder"] != byteorder:
+        raise RuntimeWarning("{} was saved on a {}-endian machine and can't be loaded on this one".format(
+            path, header["byteorder"]
+        ))
+
+    data = memoryview(buffer)[start + header_length + len(_padding(start + header_length)):]
+    splits = []
+    for entry in header["splits"]:
+        columns = {}
+        for name, column in entry["columns"].items():
+            size = calcsize(column["format"])
+            columns[name] = data[column["offset"]:column["offset"] + column["count"] * size].cast(column["format"])
+
+        arguments = data[entry["arguments"]["offset"]:entry["arguments"]["offset"] + entry["arguments"]["length"]]
+        run_metrics = entry.get("run_metrics", {"offset": 0, "length": 0})
+        split = MappedSplit(
+            label=entry["label"],
+            resolution=entry["resolution"],
+            columns=columns,
+            labels=entry["labels"],
+            pickled_arguments=arguments,
+            accumulator=RunningStatistics.from_dict(entry["accumulator"]),
+            sketch=QuantileSketch.from_dict(entry["sketch"]) if entry["sketch"] is not None else None,
+            pickled_run_metrics=data[run_metrics["offset"]:run_metrics["offset"] + run_metrics["length"]],
+            metrics=dict((key, RunningStatistics.from_dict(accumulator))
+                         for key, accumulator in entry.get("metrics", {}).items())
+        )
+        split.overhead = entry["overhead"]
+        split.stop_reason = entry["stop_reason"]
+        split.calls, split.sampled_calls = entry["calls"], entry["sampled_calls"]
+        splits.append(split)
+
+    return splits, header["resolution"]
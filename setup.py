@@ -36,10 +36,8 @@ setuptools.setup(
         "Topic :: Software Development :: Testing"
     ],
     install_requires=[
-        "scikit-learn",
-        "scipy",
         "numpy",
         "matplotlib"
     ],
-    python_requires=">=3.3"
+    python_requires=">=3.7"
 )
@@ -4,11 +4,27 @@ Central file for running all existing tests
 
 import tests_basic
 import tests_best_fit_curves
+import tests_comparison
+import tests_concurrency
+import tests_data_structures
+import tests_exporters
+import tests_imports
+import tests_probes
+import tests_shared
+import tests_storage
 import unittest
 
 
 if __name__ == "__main__":
     suite = unittest.TestLoader().loadTestsFromModule(tests_basic)
     suite.addTests(unittest.TestLoader().loadTestsFromModule(tests_best_fit_curves))
+    suite.addTests(unittest.TestLoader().loadTestsFromModule(tests_comparison))
+    suite.addTests(unittest.TestLoader().loadTestsFromModule(tests_concurrency))
+    suite.addTests(unittest.TestLoader().loadTestsFromModule(tests_data_structures))
+    suite.addTests(unittest.TestLoader().loadTestsFromModule(tests_exporters))
+    suite.addTests(unittest.TestLoader().loadTestsFromModule(tests_imports))
+    suite.addTests(unittest.TestLoader().loadTestsFromModule(tests_probes))
+    suite.addTests(unittest.TestLoader().loadTestsFromModule(tests_shared))
+    suite.addTests(unittest.TestLoader().loadTestsFromModule(tests_storage))
 
     unittest.TextTestRunner(verbosity=2).run(suite)
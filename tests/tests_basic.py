@@ -1,9 +1,10 @@
 from random import randint
 from exectiming.data_structures import Run
-from exectiming.exectiming import StaticTimer, Timer
+from exectiming.exectiming import StaticTimer, ThreadSafeTimer, Timer
 import unittest
 from io import StringIO
 from time import sleep
+from unittest.mock import patch
 
 
 class TestStaticBasic(unittest.TestCase):
@@ -142,6 +143,25 @@ class TestStaticBasic(unittest.TestCase):
         from math import floor
         self.assertEqual(StaticTimer.time_it("floor(2.5432)", globals={"floor": floor}, display=False)[0], 2)
 
+    def test_time_it_locals_and_setup(self):
+        value, _ = StaticTimer.time_it("total + offset  # comment", setup="total = sum(values)", locals={"offset": 1},
+                                       globals={"values": [1, 2, 3]}, display=False)
+        self.assertEqual(value, 7)
+
+    def test_time_it_statements(self):
+        block = """
+            items = []
+            for i in range(5):
+                items.append(i)
+            assert len(items) == 5
+        """
+        value, times = StaticTimer.time_it(block, runs=3, iterations_per_run=2, display=False, average_runs=False)
+        self.assertIsNone(value)
+        self.assertEqual(len(times), 3)
+
+    def test_time_it_syntax_error(self):
+        self.assertRaises(SyntaxError, StaticTimer.time_it, "1 +", display=False)
+
 
 class TestTimerBasic(unittest.TestCase):
     def test_context(self):
@@ -371,5 +391,322 @@ class TestTimerBasic(unittest.TestCase):
         self.assertRaisesRegex(RuntimeWarning, "No split exists.", timer.time_it, "1+1", split=False)
 
 
+
+class TestCalibration(unittest.TestCase):
+    def test_calibrate(self):
+        overhead = Timer.calibrate(samples=20, iterations=100, recalibrate=True)
+        self.assertGreater(overhead["run"], 0)
+        self.assertGreaterEqual(overhead["iteration"], 0)
+        self.assertEqual(Timer.calibrate(), overhead)  # cached
+
+    def test_no_probes_calibrated(self):
+        def fail(*args):
+            raise AssertionError("probes are used without any being given")
+
+        # the path that is calibrated, and the paths that subtract it, never touch probes unless some are given
+        with patch("exectiming.exectiming.start_probes", fail), patch("exectiming.exectiming.stop_probes", fail):
+            Timer.calibrate(samples=20, iterations=100, recalibrate=True)
+            timer = Timer(split=True)
+            timer.time_it(sum, [1, 2, 3], subtract_overhead=True)
+            timer.decorate(subtract_overhead=True)(sum)([1, 2, 3])
+
+        self.assertEqual(len(timer.splits), 3)
+
+    def test_static_subtract_overhead(self):
+        out = StringIO()
+        StaticTimer.time_it(lambda: None, runs=3, subtract_overhead=True, output_stream=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("Overhead subtracted from each run", lines[1])
+
+        _, times = StaticTimer.time_it(lambda: None, runs=3, display=False, average_runs=False, subtract_overhead=True)
+        self.assertTrue(all(time >= 0 for time in times))
+
+    def test_timer_subtract_overhead(self):
+        timer = Timer()
+        timer.time_it(sum, [1, 2, 3], runs=5, iterations_per_run=10, subtract_overhead=True)
+
+        split = timer.splits[-1]
+        self.assertEqual(split.overhead, Timer.calibrate())
+        self.assertTrue(all(run.time >= 0 for run in split.runs))
+
+        out = StringIO()
+        timer.output_stream = out
+        timer.output()
+        timer.statistics()
+        self.assertIn("Overhead subtracted:", out.getvalue())
+        self.assertIn("Overhead Run | Iter", out.getvalue())
+
+    def test_decorate_subtract_overhead(self):
+        timer = Timer()
+
+        @timer.decorate(runs=2, subtract_overhead=True)
+        def basic(val):
+            return val + 1
+
+        self.assertEqual(basic(5), 6)
+        self.assertIsNotNone(timer.splits[-1].overhead)
+        self.assertIsNone(Timer(split=True).splits[-1].overhead)
+
+
+
+class TestSampling(unittest.TestCase):
+    def test_sample_every(self):
+        timer = Timer()
+
+        @timer.decorate(sample_every=10)
+        def basic(val):
+            return val + 1
+
+        self.assertEqual([basic(i) for i in range(95)], list(range(1, 96)))
+        self.assertEqual(len(timer.splits), 1)
+
+        stats = timer.splits[-1].statistics()
+        self.assertEqual(stats["count"], 9)
+        self.assertEqual(stats["calls"], 90)  # only updated on a sampled call
+        self.assertEqual(stats["sample_rate"], 0.1)
+        self.assertAlmostEqual(stats["estimated_total"], stats["total"] * 10)
+
+        out = StringIO()
+        timer.output_stream = out
+        timer.statistics()
+        self.assertIn("Sampled | Calls = 9 | 90 (10.00%)", out.getvalue())
+        self.assertIn("Estimated Total", out.getvalue())
+
+    def test_samples_per_second(self):
+        timer = Timer()
+
+        @timer.decorate(samples_per_second=100, split=False)
+        def basic(val):
+            return val + 1
+
+        timer.split("existing")
+        for i in range(20000):
+            basic(i)
+
+        split = timer.splits[-1]
+        self.assertEqual(split.label, "existing")
+        self.assertGreaterEqual(split.sampled_calls, 2)
+        self.assertLess(split.sampled_calls, 20000 // 2)
+
+    def test_async_sampling(self):
+        import asyncio
+        timer = Timer()
+
+        @timer.decorate(sample_every=3)
+        async def basic(val):
+            return val + 1
+
+        async def main():
+            return [await basic(i) for i in range(9)]
+
+        self.assertEqual(asyncio.run(main()), list(range(1, 10)))
+        self.assertEqual(timer.splits[-1].sampled_calls, 3)
+
+    def test_invalid(self):
+        self.assertRaises(RuntimeWarning, Timer().decorate, sample_every=0)
+        self.assertRaises(RuntimeWarning, Timer().decorate, samples_per_second=-1)
+
+
+class TestSpans(unittest.TestCase):
+    def test_nested(self):
+        timer = Timer(spans=True)
+
+        @timer.decorate()
+        def child():
+            sleep(0.002)
+
+        for _ in range(3):
+            with timer.span("request"):
+                with timer.context(label="parse"):
+                    sleep(0.001)
+                child()
+                child()
+
+        stats = timer.spans.statistics()
+        self.assertEqual(list(stats), [("request",), ("request", "parse"), ("request", "child")])
+        self.assertEqual(stats[("request",)]["count"], 3)
+        self.assertEqual(stats[("request", "child")]["count"], 6)
+        self.assertEqual(timer.splits, [])
+
+        request = stats[("request",)]
+        children = stats[("request", "parse")]["inclusive"] + stats[("request", "child")]["inclusive"]
+        self.assertAlmostEqual(request["exclusive"], request["inclusive"] - children)
+        self.assertGreaterEqual(children, 0.015)
+
+        out = StringIO()
+        timer.output_stream = out
+        timer.statistics()
+        self.assertIn("Spans[total=", out.getvalue())
+        self.assertIn("    child", out.getvalue())
+
+    def test_async_tasks(self):
+        import asyncio
+        timer = Timer(spans=True)
+
+        @timer.decorate()
+        async def work():
+            await asyncio.sleep(0.001)
+
+        async def handler(name):
+            async with timer.span(name):
+                await work()
+
+        async def main():
+            await asyncio.gather(handler("a"), handler("b"))
+
+        asyncio.run(main())
+        self.assertEqual(set(timer.spans.statistics()), {("a",), ("a", "work"), ("b",), ("b", "work")})
+
+    def test_exception(self):
+        timer = Timer(spans=True)
+        with self.assertRaises(ValueError):
+            with timer.span("outer"):
+                raise ValueError()
+
+        with timer.span("next"):
+            pass
+
+        self.assertEqual(set(timer.spans.statistics()), {("outer",), ("next",)})
+
+    def test_disabled(self):
+        self.assertRaisesRegex(RuntimeWarning, "Spans must be enabled", Timer().span, "label")
+
+
+class TestAutoTimeIt(unittest.TestCase):
+    def test_autorange(self):
+        timer = Timer()
+        self.assertEqual(timer.auto_time_it(sum, [1, 2, 3], min_run_time=0.001, relative_width=1), 6)
+
+        split = timer.splits[-1]
+        self.assertEqual(split.stop_reason, "converged")
+        self.assertGreater(split.runs[0].iterations_per_run, 1)
+        self.assertGreaterEqual(sum(run.time for run in split.runs) / len(split.runs), 0.001 * 0.5)
+
+    def test_max_runs(self):
+        timer = Timer()
+        timer.auto_time_it("sum(range(10))", min_run_time=0, relative_width=-1, min_runs=3, max_runs=7)
+
+        self.assertEqual(timer.splits[-1].stop_reason, "max_runs")
+        self.assertEqual(len(timer.splits[-1].runs), 7)
+
+    def test_setup_once(self):
+        timer = Timer()
+        calls = []
+        value = timer.auto_time_it("total += 1", setup="calls.append(1)\ntotal = 0", locals={"calls": calls},
+                                   min_run_time=0.001, relative_width=-1, max_runs=10)
+
+        self.assertIsNone(value)
+        self.assertEqual(calls, [1])
+        self.assertEqual(len(timer.splits[-1].runs), 10)
+
+    def test_max_time(self):
+        timer = Timer()
+        timer.auto_time_it(sleep, 0.001, min_run_time=0, relative_width=-1, statistic="median", max_time=0.02)
+
+        self.assertEqual(timer.splits[-1].stop_reason, "max_time")
+        self.assertGreaterEqual(len(timer.splits[-1].runs), 5)
+
+        out = StringIO()
+        timer.output_stream = out
+        timer.statistics()
+        self.assertIn("Stop Reason = max_time", out.getvalue())
+
+    def test_invalid_statistic(self):
+        self.assertRaisesRegex(RuntimeWarning, "not a valid statistic", Timer().auto_time_it, sum, [1],
+                               statistic="mode")
+
+    def test_confidence_interval(self):
+        times = [float(i) for i in range(1, 101)]
+        self.assertAlmostEqual(Timer._z_score(0.95), 1.959964, places=5)
+
+        lower, estimate, upper = Timer._confidence_interval(times, "median")
+        self.assertEqual(estimate, 50.5)
+        self.assertTrue(lower < estimate < upper)
+
+        lower, estimate, upper = Timer._confidence_interval(times, "mean")
+        self.assertAlmostEqual(estimate - lower, upper - estimate)
+
+
+def consume(array: list) -> int:
+    return sum(array)
+
+
+class TestSweep(unittest.TestCase):
+    def test_sizes(self):
+        timer = Timer()
+        built = []
+
+        def factory(size: int) -> list:
+            built.append(size)
+            return list(range(size))
+
+        curve = timer.sweep(consume, sizes=(size for size in range(10000, 60000, 10000)), factory=factory, runs=2,
+                            curve_type="Linear")
+
+        self.assertEqual(built, [10000, 20000, 30000, 40000, 50000])
+        self.assertEqual(curve[0], "Linear")
+        self.assertGreater(curve[1]["x_0"], 0)
+
+        split = timer.splits[-1]
+        self.assertEqual(split.label, "consume")
+        self.assertEqual([run.args for run in split.runs], [(size,) for size in built for _ in range(2)])
+
+    def test_factory_not_timed(self):
+        timer = Timer()
+
+        def factory(size: int) -> list:
+            sleep(0.01)
+            return [0] * size
+
+        timer.sweep(consume, sizes=[10, 20, 30], factory=factory)
+        self.assertLess(timer.splits[-1].statistics()["max"], 0.01)
+
+    def test_grid(self):
+        timer = Timer()
+        curve = timer.sweep(pow, grid={"base": [2, 3], "exp": [10, 100, 1000]}, factory=lambda base, exp: (base, exp),
+                            split_label="pow")
+
+        self.assertEqual([run.kwargs for run in timer.splits[-1].runs][:3],
+                         [{"base": 2, "exp": 10}, {"base": 2, "exp": 100}, {"base": 2, "exp": 1000}])
+        self.assertEqual(len(timer.splits), 1)
+        self.assertIsNotNone(curve)
+
+    def test_grid_without_factory(self):
+        timer = Timer()
+        timer.sweep(lambda size, repeat: [0] * size * repeat, grid={"size": [1, 2], "repeat": [1, 2]})
+        self.assertEqual(len(timer.splits[-1].runs), 4)
+
+    def test_workers(self):
+        timer = Timer()
+        timer.sweep(consume, sizes=[10, 20, 30, 40], factory=lambda size: list(range(size)), runs=3, workers=2)
+
+        self.assertEqual([run.args for run in timer.splits[-1].runs], [(size,) for size in (10, 20, 30, 40)
+                                                                        for _ in range(3)])
+
+    def test_array_sizes(self):
+        from numpy import arange
+
+        timer = Timer()
+        curve = timer.sweep(consume, sizes=arange(1000, 6000, 1000), factory=lambda size: list(range(size)),
+                            curve_type="Linear")
+
+        self.assertEqual(curve[0], "Linear")
+        self.assertEqual([run.args for run in timer.splits[-1].runs], [(size,) for size in range(1000, 6000, 1000)])
+
+    def test_thread_safe(self):
+        timer = ThreadSafeTimer()
+        curve = timer.sweep(consume, sizes=[10, 20, 30], factory=lambda size: list(range(size)), runs=2)
+
+        self.assertIsNotNone(curve)
+        self.assertEqual(len(timer.splits[-1].runs), 6)
+
+    def test_sizes_or_grid(self):
+        timer = Timer()
+        self.assertRaises(RuntimeWarning, timer.sweep, consume)
+        self.assertRaises(RuntimeWarning, timer.sweep, consume, sizes=[1], grid={"a": [1]})
+
+
 if __name__ == "__main__":
     unittest.main()
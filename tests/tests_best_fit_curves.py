@@ -1,5 +1,5 @@
 from exectiming.exectiming import Timer
-from exectiming.data_structures import Run
+from exectiming.data_structures import ColumnarSplit, Run, Split
 import unittest
 from math import e, log
 
@@ -45,6 +45,55 @@ class TestConsistentFeatures(unittest.TestCase):
 
         self.assertNotEqual(timer.best_fit_curve(transformers=len), None)  # this should work without issue
 
+    def test_mismatched_args(self):
+        timer = Timer(split=True, start=True)
+        timer.log(5)
+        timer.log(5, 6)
+
+        self.assertRaisesRegex(RuntimeWarning, "same arguments logged", timer.best_fit_curve)
+
+    def test_columnar(self):
+        split, columnar = Split(), ColumnarSplit()
+        for x in range(1, 50):
+            for target in (split, columnar):
+                target.add_run(Run(time=3 + 2*x, runs=1, iterations_per_run=1, label=str(x), args=(x,),
+                                   kwargs={"y": [0] * x}))
+
+        result = columnar.determine_best_fit(exclude={"y"})
+        self.assertEqual(result[0], "Linear")
+        self.assertEqual(round(result[1]["x_0"], 4), 2)
+        self.assertEqual(split.determine_best_fit(transformers=len, exclude={0})[0],
+                         columnar.determine_best_fit(transformers=len, exclude={0})[0])
+
+    def test_calculate_points(self):
+        from numpy import array
+        keys, x = [0], array([[1.0], [2.0], [3.0]])
+        curves = (("Exponential", {"a": 1, "b": 2}), ("Linear", {"b": 1, "x_0": 2}), ("Logarithmic", {"a": 1, "b": 2}),
+                  ("Polynomial", {"a": 1, "b": 2, "c": 3}))
+
+        for name, params in curves:
+            curve = Split.best_fit_curves[name]
+            points = curve.calculate_points(keys, x, params)
+            for i in range(3):
+                self.assertAlmostEqual(points[i], curve.calculate_point({0: x[i][0]}, params))
+
+    def test_unfittable_curve_skipped(self):
+        timer = Timer(split=True)
+        for x in range(0, 5):  # log(0) can't be fit
+            timer.splits[-1].add_run(Run(time=2 + x**2, runs=1, iterations_per_run=1, label=str(x), args=(x,)))
+
+        self.assertEqual(timer.best_fit_curve()[0], "Polynomial")
+
+    def test_no_scipy_or_sklearn(self):
+        import sys
+        self.assertNotIn("scipy", sys.modules)
+        self.assertNotIn("sklearn", sys.modules)
+
+    def test_points_api(self):
+        points = [({0: x}, 1 + 2*x) for x in range(1, 5)]
+        self.assertTrue(Split.best_fit_curves["Linear"].poll(points))
+        self.assertEqual(round(Split.best_fit_curves["Linear"].calculate_curve(points)["x_0"], 4), 2)
+
 
 class TestExponential(unittest.TestCase):
     def test_basic(self):
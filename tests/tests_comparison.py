@@ -0,0 +1,116 @@
+from exectiming.comparison import bootstrap_speedup, compare_splits, mann_whitney_u, split_times
+from exectiming.data_structures import Run, Split
+from exectiming.exectiming import Timer
+from io import StringIO
+from os import path, remove
+from random import Random
+from tempfile import mkdtemp
+import unittest
+
+
+def build_timer(label: str, scale: float, count: int=40, seed: int=0, **kwargs) -> Timer:
+    generator = Random(seed)
+    timer = Timer(split=True, label=label, output_stream=StringIO(), **kwargs)
+    for _ in range(count):
+        timer.splits[-1].add_run(Run(label="run", time=scale * (1 + generator.random() / 10), runs=1,
+                                     iterations_per_run=1))
+
+    return timer
+
+
+class TestMannWhitneyU(unittest.TestCase):
+    def test_separated(self):
+        u, p_value = mann_whitney_u([1, 2, 3, 4, 5, 6, 7, 8], [9, 10, 11, 12, 13, 14, 15, 16])
+        self.assertEqual(u, 0)
+        self.assertLess(p_value, 0.001)
+
+    def test_identical(self):
+        u, p_value = mann_whitney_u([1, 2, 3, 4], [1, 2, 3, 4])
+        self.assertEqual(u, 8)
+        self.assertAlmostEqual(p_value, 1)
+
+    def test_all_tied(self):
+        self.assertEqual(mann_whitney_u([5, 5, 5], [5, 5]), (3, 1.0))
+
+    def test_known_value(self):
+        # checked against scipy.stats.mannwhitneyu(method="asymptotic")
+        u, p_value = mann_whitney_u([1.1, 2.3, 2.3, 4.0, 5.2], [2.3, 3.1, 6.0, 7.5, 8.1, 9.0])
+        self.assertEqual(u, 5)
+        self.assertAlmostEqual(p_value, 0.0800423, places=6)
+
+
+class TestBootstrap(unittest.TestCase):
+    def test_speedup(self):
+        baseline = [2 + x / 100 for x in range(50)]
+        candidate = [1 + x / 200 for x in range(50)]
+
+        lower, speedup, upper = bootstrap_speedup(baseline, candidate, statistic="mean", seed=1)
+        self.assertAlmostEqual(speedup, 2)
+        self.assertLess(lower, speedup)
+        self.assertGreater(upper, speedup)
+        self.assertGreater(lower, 1.9)
+
+    def test_reproducible(self):
+        baseline, candidate = [1, 2, 3, 4, 5], [2, 3, 4, 5, 6]
+        self.assertEqual(bootstrap_speedup(baseline, candidate, seed=3), bootstrap_speedup(baseline, candidate, seed=3))
+
+    def test_invalid_statistic(self):
+        self.assertRaises(RuntimeWarning, bootstrap_speedup, [1, 2], [1, 2], statistic="mode")
+
+
+class TestCompare(unittest.TestCase):
+    def test_split_times(self):
+        first, second = Split(label="a"), Split(label="a", resolution=10**9)
+        first.add_run(Run(label="run", time=1, runs=1, iterations_per_run=1))
+        second.add_run(Run(label="run", time=2 * 10**9, runs=1, iterations_per_run=1))
+
+        self.assertEqual(split_times([first, second]), {"a": [1, 2]})
+
+    def test_regression(self):
+        comparison = compare_splits(build_timer("a", 1).splits, build_timer("a", 1.5, seed=1).splits, seed=0)["a"]
+
+        self.assertTrue(comparison["significant"])
+        self.assertTrue(comparison["regression"])
+        self.assertFalse(comparison["improvement"])
+        self.assertLess(comparison["upper"], 1)
+
+    def test_improvement(self):
+        comparison = compare_splits(build_timer("a", 2).splits, build_timer("a", 1, seed=1).splits, seed=0)["a"]
+
+        self.assertTrue(comparison["improvement"])
+        self.assertFalse(comparison["regression"])
+        self.assertGreater(comparison["lower"], 1)
+
+    def test_no_change(self):
+        comparison = compare_splits(build_timer("a", 1).splits, build_timer("a", 1, seed=1).splits, seed=0)["a"]
+        self.assertFalse(comparison["regression"] or comparison["improvement"])
+
+    def test_unmatched(self):
+        comparisons = compare_splits(build_timer("a", 1).splits, build_timer("b", 1).splits)
+        self.assertEqual(comparisons, {})
+
+    def test_timer(self):
+        baseline = build_timer("a", 1)
+        candidate = build_timer("a", 0.001, seed=1, nanoseconds=True)
+        candidate.splits[-1].runs = [Run(label="run", time=int(run.time * 10**9), runs=1, iterations_per_run=1)
+                                     for run in candidate.splits[-1].runs]
+
+        comparisons = baseline.compare(candidate, seed=0)
+        self.assertGreater(comparisons["a"]["speedup"], 500)
+        self.assertIn("Speedup (95% CI)", baseline.output_stream.getvalue())
+        self.assertIn("improvement", baseline.output_stream.getvalue())
+
+    def test_saved(self):
+        file_path = path.join(mkdtemp(), "candidate.ext")
+        build_timer("a", 3, seed=1).save(file_path)
+
+        try:
+            baseline = build_timer("a", 1)
+            self.assertTrue(baseline.compare(file_path, display=False)["a"]["regression"])
+            self.assertEqual(baseline.output_stream.getvalue(), "")
+        finally:
+            remove(file_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
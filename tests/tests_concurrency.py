@@ -0,0 +1,172 @@
+from concurrent.futures import ThreadPoolExecutor
+from exectiming.exectiming import StaticTimer, ThreadSafeTimer, Timer
+from io import StringIO
+import asyncio
+from threading import Barrier, Thread
+import unittest
+
+
+def sum_squares(n):
+    return sum(i * i for i in range(n))
+
+
+class TestParallel(unittest.TestCase):
+    def test_static_time_it(self):
+        value, times = StaticTimer.time_it(sum_squares, 1000, runs=7, workers=3, display=False, average_runs=False)
+        self.assertEqual(value, sum_squares(1000))
+        self.assertEqual(len(times), 7)
+
+    def test_timer_time_it(self):
+        timer = Timer()
+        counter = iter(range(10))
+
+        value = timer.time_it(sum_squares, lambda: next(counter), runs=10, workers=4, call_callable_args=True,
+                              log_arguments=True)
+        self.assertEqual(value, sum_squares(9))
+        self.assertEqual([run.args[0] for run in timer.splits[0].runs], list(range(10)))  # deterministic order
+
+    def test_string(self):
+        timer = Timer()
+        self.assertEqual(timer.time_it("sum(range(n))", setup="n = 100", runs=4, workers=2), 4950)
+        self.assertEqual(len(timer.splits[0].runs), 4)
+
+    def test_time_it_map(self):
+        timer = Timer()
+        argument_sets = [((n,), {}) for n in (10, 100, 1000)]
+
+        for workers in (None, 2):
+            self.assertEqual(timer.time_it_map(sum_squares, argument_sets, runs=2, workers=workers), sum_squares(1000))
+            self.assertEqual([run.args for run in timer.splits[-1].runs],
+                             [(10,), (10,), (100,), (100,), (1000,), (1000,)])
+
+    def test_empty(self):
+        timer = Timer()
+        self.assertIsNone(timer.time_it(sum_squares, 10, runs=0, workers=2))
+        self.assertIsNone(timer.time_it_map(sum_squares, [], workers=3))
+        self.assertEqual(len(timer.splits[-1].runs), 0)
+
+    def test_more_workers_than_runs(self):
+        value, times = StaticTimer.time_it(sum_squares, 10, runs=2, workers=8, display=False, average_runs=False)
+        self.assertEqual((value, len(times)), (sum_squares(10), 2))
+
+
+class TestThreadSafeTimer(unittest.TestCase):
+    def test_decorate_thread_pool(self):
+        timer = ThreadSafeTimer()
+
+        @timer.decorate(runs=3, log_arguments=True)
+        def basic(val):
+            return val + 1
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            self.assertEqual(list(pool.map(basic, range(200))), list(range(1, 201)))
+
+        self.assertEqual(len(timer.splits), 200)
+        for split in timer.splits:
+            self.assertEqual(len(split.runs), 3)
+            self.assertEqual(len(set(run.args for run in split.runs)), 1)  # no runs from other calls
+
+    def test_shared_split(self):
+        timer = ThreadSafeTimer(split=True)
+
+        def work():
+            for i in range(1000):
+                with timer.context(i):
+                    pass
+
+        threads = [Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(timer.splits), 1)
+        self.assertEqual(timer.splits[0].statistics()["count"], 4000)
+        self.assertEqual(timer._buffers, [])  # buffers of finished threads are dropped
+
+    def test_per_thread_log(self):
+        timer = ThreadSafeTimer()
+        barrier = Barrier(2)
+
+        def work(label):
+            timer.split(label=label)
+            timer.start()
+            barrier.wait()
+            for _ in range(10):
+                timer.log(label=label)
+
+        threads = [Thread(target=work, args=(label,)) for label in ("a", "b")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for split in timer.splits:
+            self.assertEqual(len(split.runs), 10)
+            self.assertTrue(all(run.label == split.label for run in split.runs))
+
+        self.assertRaisesRegex(RuntimeWarning, r"start\(\) must be called before log\(\)", timer.log)
+
+
+class TestAsync(unittest.TestCase):
+    def test_static_decorate(self):
+        @StaticTimer.decorate(display=False, runs=2)
+        async def basic(val):
+            await asyncio.sleep(0.01)
+            return val + 1
+
+        value, time = asyncio.run(basic(5))
+        self.assertEqual(value, 6)
+        self.assertGreaterEqual(time, 10)
+
+    def test_static_context_and_time_it(self):
+        out = StringIO()
+
+        async def basic(val):
+            async with StaticTimer.async_context(label="Sleep", output_stream=out):
+                await asyncio.sleep(0.01)
+            return val + 1
+
+        self.assertEqual(asyncio.run(StaticTimer.async_time_it(basic, 5, output_stream=out, log_arguments=True)), 6)
+        lines = out.getvalue().split("\n")
+        self.assertIn("Sleep", lines[0])
+        self.assertEqual(lines[1][13:], " - {:42} [runs=  1, iterations=  1] {:<20}".format("basic(5)", ""))
+
+    def test_timer_concurrent_tasks(self):
+        timer = Timer()
+
+        @timer.decorate(runs=2, log_arguments=True)
+        async def basic(delay):
+            await asyncio.sleep(delay)
+            return delay
+
+        async def main():
+            return await asyncio.gather(basic(0.05), basic(0.01))
+
+        self.assertEqual(asyncio.run(main()), [0.05, 0.01])
+        self.assertEqual(len(timer.splits), 2)
+        for split in timer.splits:
+            delay = split.runs[0].args[0]
+            self.assertEqual(len(split.runs), 2)
+            self.assertTrue(all(delay <= run.time < delay + 0.04 for run in split.runs))
+
+    def test_timer_context_and_time_it(self):
+        timer = Timer(split=True)
+
+        async def basic(val):
+            async with timer.async_context(val, label="Inner"):
+                await asyncio.sleep(0.01)
+            return val
+
+        async def main():
+            return await timer.async_time_it(basic, 3, runs=3, split=False)
+
+        self.assertEqual(asyncio.run(main()), 3)
+        labels = [run.label for run in timer.splits[0].runs]
+        self.assertEqual(labels.count("Inner"), 3)
+        self.assertEqual(labels.count("basic"), 3)
+        self.assertTrue(all(run.time >= 0.01 for run in timer.splits[0].runs))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,273 @@
+from exectiming.data_structures import BoundedSplit, ColumnarSplit, QuantileSketch, Run, RunningStatistics, Split
+from exectiming.exectiming import Timer
+from io import StringIO
+from random import random, shuffle
+from statistics import pstdev
+from time import sleep
+import unittest
+
+
+class TestRunningStatistics(unittest.TestCase):
+    def test_matches_two_pass(self):
+        values = [random() for _ in range(1000)]
+        accumulator = RunningStatistics()
+        for value in values:
+            accumulator.add(value)
+
+        stats = accumulator.statistics()
+        self.assertEqual(stats["count"], 1000)
+        self.assertEqual(stats["min"], min(values))
+        self.assertEqual(stats["max"], max(values))
+        self.assertAlmostEqual(stats["total"], sum(values), places=10)
+        self.assertAlmostEqual(stats["standard_deviation"], pstdev(values), places=10)
+
+    def test_merge(self):
+        values = [random() for _ in range(500)]
+        first, second, combined = RunningStatistics(), RunningStatistics(), RunningStatistics()
+        for i, value in enumerate(values):
+            (first if i < 123 else second).add(value)
+            combined.add(value)
+
+        merged = first.merge(second).statistics()
+        for key, value in combined.statistics().items():
+            self.assertAlmostEqual(merged[key], value, places=10)
+
+    def test_exact_integer_total(self):
+        first, second = RunningStatistics(), RunningStatistics()
+        for value in range(10**15, 10**15 + 1000):
+            first.add(value)
+            second.add(value + 1)
+
+        total = first.merge(second).total
+        self.assertIsInstance(total, int)
+        self.assertEqual(total, sum(range(10**15, 10**15 + 1000)) * 2 + 1000)
+
+    def test_empty(self):
+        self.assertEqual(Split().statistics()["count"], 0)
+        self.assertEqual(RunningStatistics().merge(RunningStatistics()).count, 0)
+
+    def test_direct_append(self):
+        split = Split()
+        split.add_run(Run(label="a", time=1, runs=1, iterations_per_run=1))
+        split.runs.append(Run(label="b", time=3, runs=1, iterations_per_run=1))
+
+        self.assertEqual(split.statistics()["total"], 4)
+
+
+class TestQuantileSketch(unittest.TestCase):
+    def test_accuracy(self):
+        values = list(range(1, 10001))
+        shuffle(values)
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+
+        for q, expected in ((0.5, 5000), (0.9, 9000), (0.99, 9900), (0.999, 9990)):
+            self.assertLessEqual(abs(sketch.quantile(q) - expected) / expected, 0.011)
+
+    def test_merge_and_serialize(self):
+        first, second, combined = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for value in range(1, 2001):
+            (first if value % 3 else second).add(value / 1000)
+            combined.add(value / 1000)
+
+        merged = QuantileSketch.from_dict(first.to_dict()).merge(second)
+        self.assertEqual(merged.count, combined.count)
+        self.assertEqual(merged.quantile(0.99), combined.quantile(0.99))
+
+    def test_bounded_buckets(self):
+        sketch = QuantileSketch(max_buckets=10)
+        for exponent in range(-9, 4):
+            sketch.add(10 ** exponent)
+
+        self.assertEqual(len(sketch.buckets), 10)
+        self.assertEqual(sketch.count, 13)
+        self.assertAlmostEqual(sketch.quantile(1), 1000, delta=1000 * 0.01)
+
+    def test_merge_collapses_to_max_buckets(self):
+        first, second = QuantileSketch(max_buckets=8), QuantileSketch(max_buckets=8)
+        for exponent in range(-6, 0):
+            first.add(10 ** exponent)
+            second.add(10 ** -exponent)
+
+        first.merge(second)
+        self.assertEqual(len(first.buckets), 8)
+        self.assertEqual(first.count, 12)
+
+    def test_split_statistics(self):
+        out = StringIO()
+        timer = Timer(split=True, output_stream=out, split_options={"quantiles": True})
+        for time in range(1, 101):
+            timer.splits[-1].add_run(Run(label="x", time=time / 1000, runs=1, iterations_per_run=1))
+
+        stats = timer.splits[-1].statistics()
+        self.assertAlmostEqual(stats["p50"], 0.05, delta=0.05 * 0.02)
+        self.assertAlmostEqual(stats["p99.9"], 0.1, delta=0.1 * 0.02)
+        self.assertNotIn("p50", Split().statistics())
+
+        timer.statistics()
+        self.assertIn("p50 | p90 | p99 | p99.9", out.getvalue())
+
+
+class TestColumnarSplit(unittest.TestCase):
+    def test_run_view(self):
+        split = ColumnarSplit(label="Test")
+        split.add_run(Run(label="a", time=3, runs=1, iterations_per_run=2, args=(5,), kwargs={"test": 1}))
+        split.add_run(Run(label="b", time=1, runs=1, iterations_per_run=2))
+
+        self.assertEqual(len(split.runs), 2)
+        self.assertEqual(split.runs[0].label, "a")
+        self.assertEqual(split.runs[0].args, (5,))
+        self.assertEqual(split.runs[0].kwargs, {"test": 1})
+        self.assertEqual(split.runs[-1].label, "b")
+        self.assertEqual(split.runs[-1].args, ())
+        self.assertEqual([run.time for run in split.runs], [3, 1])
+        self.assertEqual(len(split.labels), 2)
+
+    def test_statistics_match_split(self):
+        split, columnar = Split(), ColumnarSplit()
+        for time in (4, 1, 7, 2):
+            split.add_run(Run(label="x", time=time, runs=1, iterations_per_run=1))
+            columnar.add_run(Run(label="x", time=time, runs=1, iterations_per_run=1))
+
+        self.assertEqual(split.statistics(), columnar.statistics())
+
+    def test_sort(self):
+        timer = Timer(split=True, split_type=ColumnarSplit)
+
+        for time, arg in ((4, 7), (3, 9), (5, 1)):
+            timer.splits[-1].add_run(Run(time=time, runs=1, iterations_per_run=1, label=str(time), args=(arg,),
+                                         kwargs={"test": [0] * arg}))
+
+        timer.sort_runs()
+        self.assertEqual([run.label for run in timer.splits[-1].runs], ["3", "4", "5"])
+
+        timer.sort_runs(keys=0)
+        self.assertEqual([run.args[0] for run in timer.splits[-1].runs], [1, 7, 9])
+
+        timer.sort_runs(keys="test", transformers=len, reverse=True)
+        self.assertEqual([run.label for run in timer.splits[-1].runs], ["3", "4", "5"])
+
+    def test_timer(self):
+        timer = Timer(split_type=ColumnarSplit)
+
+        @timer.decorate(runs=5, log_arguments=True)
+        def basic(val):
+            return val + 1
+
+        self.assertEqual(basic(5), 6)
+        self.assertIsInstance(timer.splits[0], ColumnarSplit)
+        self.assertEqual(len(timer.splits[0].runs), 5)
+        self.assertEqual(timer.splits[0].runs[0].args, (5,))
+
+
+class TestNanoseconds(unittest.TestCase):
+    def test_integer_times(self):
+        for split_type in (Split, ColumnarSplit):
+            timer = Timer(nanoseconds=True, split_type=split_type)
+            timer.time_it(sum, [1, 2, 3], runs=5)
+
+            split = timer.splits[-1]
+            self.assertEqual(split.resolution, 10**9)
+            self.assertTrue(all(isinstance(run.time, int) for run in split.runs))
+            self.assertEqual(split.statistics()["total"], sum(run.time for run in split.runs))
+
+        self.assertEqual(timer.splits[-1].times.typecode, "q")
+
+    def test_presentation(self):
+        timer = Timer(split=True, nanoseconds=True)
+        timer.splits[-1].add_run(Run(label="Run", time=1234567, runs=1, iterations_per_run=1))
+
+        out = StringIO()
+        timer.output_stream = out
+        timer.output(time_unit=Timer.MS)
+        timer.statistics(time_unit=Timer.NS)
+        self.assertIn("1.23457 ms - Run", out.getvalue())
+        self.assertIn("total=1234567.0 ns", out.getvalue())
+
+    def test_log_and_predict(self):
+        timer = Timer(split=True, start=True, nanoseconds=True)
+        self.assertLess(timer.log(time_unit=Timer.S), 1)
+        self.assertEqual(timer.predict(("Linear", {"b": 10**9, "x_0": 0}), 5, time_unit=Timer.S), 1)
+
+    def test_statistics_output(self):
+        outputs = []
+        for nanoseconds, scale in ((False, 1e-3), (True, 10**6)):
+            out = StringIO()
+            timer = Timer(split=True, nanoseconds=nanoseconds, output_stream=out)
+            for milliseconds in (1, 2, 3):
+                timer.splits[-1].add_run(Run(label="run", time=milliseconds * scale, runs=1, iterations_per_run=1))
+
+            timer.statistics()
+            outputs.append([line for line in out.getvalue().splitlines() if "Variance" in line or "Deviation" in line])
+
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn("Variance = 0.00067 ms", outputs[1][1])
+
+    def test_decorate(self):
+        timer = Timer(nanoseconds=True)
+        timer.decorate(runs=3)(sum)([1, 2, 3])
+
+        for run in timer.splits[-1].runs:
+            self.assertIsInstance(run.time, int)
+            self.assertLess(run.time, 10**9)
+
+
+class TestBoundedSplit(unittest.TestCase):
+    @staticmethod
+    def fill(split: BoundedSplit, times):
+        for time in times:
+            split.add_run(Run(label=str(time), time=time, runs=1, iterations_per_run=1))
+
+    def test_fifo(self):
+        split = BoundedSplit(max_runs=3)
+        self.fill(split, range(10))
+
+        self.assertEqual([run.time for run in split.runs], [7, 8, 9])
+        stats = split.statistics()
+        self.assertEqual(stats["count"], 10)
+        self.assertEqual(stats["total"], 45)
+        self.assertEqual(stats["retained"], 3)
+
+    def test_slowest(self):
+        split = BoundedSplit(max_runs=3, policy=BoundedSplit.SLOWEST)
+        self.fill(split, (5, 1, 9, 3, 7, 2, 8))
+
+        self.assertEqual([run.time for run in split.runs], [9, 7, 8])
+        self.assertEqual(split.statistics()["min"], 1)
+
+    def test_reservoir(self):
+        split = BoundedSplit(max_runs=50, policy=BoundedSplit.RESERVOIR)
+        self.fill(split, range(1000))
+
+        self.assertEqual(len(split.runs), 50)
+        self.assertEqual(len(set(run.time for run in split.runs)), 50)
+        self.assertEqual([run.time for run in split.runs], sorted(run.time for run in split.runs))  # order added
+        self.assertEqual(split.statistics()["count"], 1000)
+
+    def test_max_age(self):
+        split = BoundedSplit(max_age=0.05)
+        self.fill(split, (1, 2))
+        sleep(0.06)
+        self.fill(split, (3,))
+
+        self.assertEqual([run.time for run in split.runs], [3])
+        self.assertEqual(split.statistics()["count"], 3)
+
+    def test_sort(self):
+        timer = Timer(split=True, split_type=BoundedSplit, split_options={"max_runs": 4})
+        self.fill(timer.splits[-1], (4, 2, 6, 5, 3))
+
+        timer.sort_runs()
+        self.assertEqual([run.time for run in timer.splits[-1].runs], [2, 3, 5, 6])
+
+        self.fill(timer.splits[-1], (1,))
+        self.assertEqual([run.time for run in timer.splits[-1].runs], [1, 3, 5, 6])
+
+    def test_invalid(self):
+        self.assertRaisesRegex(RuntimeWarning, "needs max_runs and/or max_age", BoundedSplit)
+        self.assertRaisesRegex(RuntimeWarning, "test is an invalid policy", BoundedSplit, max_runs=2, policy="test")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+from exectiming.data_structures import ColumnarSplit, Run
+from exectiming.exectiming import Timer
+from csv import reader
+from io import StringIO
+from json import loads
+from os import path, remove
+from tempfile import mkdtemp
+import unittest
+
+
+def build_timer() -> Timer:
+    timer = Timer(split=True, label="first", split_type=ColumnarSplit)
+    for x in range(5):
+        timer.splits[-1].add_run(Run(label="run", time=x, runs=1, iterations_per_run=2, args=([0] * x,),
+                                     kwargs={"name": str(x)}))
+
+    timer.split(label="second")
+    timer.splits[-1].add_run(Run(label="other", time=0.5, runs=3, iterations_per_run=1))
+    return timer
+
+
+class TestExporters(unittest.TestCase):
+    def test_jsonl(self):
+        out = StringIO()
+        build_timer().export(out, time_unit=Timer.MS, transformers={"first": {0: len}})
+
+        rows = [loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[3], {"split": "first", "label": "run", "time": 3000, "time_unit": "ms", "runs": 1,
+                                   "iterations_per_run": 2, "args": [3], "kwargs": {"name": "3"}})
+        self.assertEqual(rows[5]["split"], "second")
+
+    def test_csv_path(self):
+        file_path = path.join(mkdtemp(), "runs.csv")
+        build_timer().export(file_path, format="csv", split_index="second")
+
+        with open(file_path, newline="") as file:
+            rows = list(reader(file))
+        remove(file_path)
+
+        self.assertEqual(rows[0], ["split", "label", "time", "time_unit", "runs", "iterations_per_run", "args",
+                                   "kwargs"])
+        self.assertEqual(rows[1], ["second", "other", "0.5", "s", "3", "1", "[]", "{}"])
+
+    def test_lazy_transformers(self):
+        calls = []
+
+        class Stream:
+            def __init__(self):
+                self.calls_at_write = []
+
+            def write(self, _):
+                self.calls_at_write.append(len(calls))
+
+        stream = Stream()
+        build_timer().export(stream, split_index="first", transformers=lambda value: calls.append(value) or value)
+
+        # each run is transformed right before it is written, not all of them up front
+        self.assertEqual(stream.calls_at_write[0], 2)
+        self.assertEqual(stream.calls_at_write[-1], 10)
+
+    def test_invalid(self):
+        self.assertRaisesRegex(RuntimeWarning, "not a valid format", build_timer().export, format="xml")
+        self.assertRaisesRegex(RuntimeWarning, "not a valid index", build_timer().export, split_index="missing")
+
+    def test_output_streams_lines(self):
+        out = StringIO()
+        timer = build_timer()
+        timer.output_stream = out
+        timer.output()
+
+        self.assertEqual(out.getvalue(), str(timer))
+
+
+if __name__ == "__main__":
+    unittest.main()
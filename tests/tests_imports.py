@@ -0,0 +1,55 @@
+from os.path import dirname, abspath
+import subprocess
+import sys
+import unittest
+
+ROOT = dirname(dirname(abspath(__file__)))
+
+# generous enough for a slow machine, but well under what importing matplotlib.pyplot and numpy adds
+MAX_IMPORT_SECONDS = 0.5
+
+
+def run_python(code: str) -> str:
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, stdout=subprocess.PIPE,
+                          universal_newlines=True).stdout.strip()
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_heavy_modules_not_imported(self):
+        loaded = run_python(
+            "import sys\n"
+            "import exectiming.exectiming\n"
+            "print(','.join(name for name in ('numpy', 'matplotlib', 'scipy', 'sklearn') if name in sys.modules))"
+        )
+        self.assertEqual(loaded, "")
+
+    def test_import_time(self):
+        seconds = float(run_python(
+            "from time import perf_counter\n"
+            "start = perf_counter()\n"
+            "import exectiming.exectiming\n"
+            "print(perf_counter() - start)"
+        ))
+        self.assertLess(seconds, MAX_IMPORT_SECONDS)
+
+    def test_imported_on_first_fit(self):
+        loaded = run_python(
+            "import sys\n"
+            "from exectiming.exectiming import Timer\n"
+            "timer = Timer(split=True, start=True)\n"
+            "for x in range(1, 5): timer.log(x)\n"
+            "timer.best_fit_curve()\n"
+            "print('numpy' in sys.modules)"
+        )
+        self.assertEqual(loaded, "True")
+
+    def test_missing_flags(self):
+        from exectiming.best_fit_curves import MISSING_CURVE_FITTING
+        from exectiming.exectiming import MISSING_MAT_PLOT
+
+        self.assertIsInstance(MISSING_CURVE_FITTING, bool)
+        self.assertIsInstance(MISSING_MAT_PLOT, bool)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,287 @@
+from exectiming.data_structures import ColumnarSplit, Run, Split
+from exectiming.exectiming import Timer
+from exectiming.probes import CPUProbe, GCProbe, MemoryProbe, Probe
+from io import StringIO
+from os import path, remove
+from tempfile import mkdtemp
+from time import perf_counter, sleep
+import asyncio
+import gc
+import tracemalloc
+import unittest
+
+
+class CountingProbe(Probe):
+    def __init__(self):
+        self.count = 0
+
+    def start(self) -> int:
+        self.count += 1
+        return self.count
+
+    def stop(self, token: int) -> dict:
+        return {"count": token}
+
+
+def allocate(size: int) -> list:
+    return [i for i in range(size)]
+
+
+def make_garbage():
+    for _ in range(5000):
+        cycle = []
+        cycle.append(cycle)
+
+
+async def async_fail():
+    raise ValueError()
+
+
+def spin(seconds: float):
+    end = perf_counter() + seconds
+    while perf_counter() < end:
+        pass
+
+
+class TestMemoryProbe(unittest.TestCase):
+    def test_allocations(self):
+        timer = Timer()
+        keep = []
+        timer.time_it(lambda: keep.append(allocate(10000)), runs=3, probes=[MemoryProbe()])
+
+        for run in timer.splits[-1].runs:
+            self.assertGreater(run.metrics["peak_bytes"], 80000)
+            self.assertGreater(run.metrics["net_bytes"], 80000)
+            self.assertGreater(run.metrics["net_blocks"], 5000)
+
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_freed(self):
+        timer = Timer()
+        timer.time_it(lambda: len(allocate(10000)), probes=[MemoryProbe()])
+
+        metrics = timer.splits[-1].runs[0].metrics
+        self.assertGreater(metrics["peak_bytes"], 80000)
+        self.assertLess(metrics["net_bytes"], 10000)
+
+    def test_already_tracing(self):
+        tracemalloc.start()
+        try:
+            timer = Timer(split=True)
+            with timer.context(probes=[MemoryProbe()]):
+                allocate(10000)
+
+            self.assertTrue(tracemalloc.is_tracing())
+            self.assertGreater(timer.splits[-1].runs[0].metrics["peak_bytes"], 80000)
+        finally:
+            tracemalloc.stop()
+
+
+    def test_raises(self):
+        def fail():
+            raise ValueError()
+
+        timer = Timer(split=True)
+        for measure in (lambda: timer.time_it(fail, probes=[MemoryProbe()]),
+                        lambda: timer.time_it("raise ValueError()", probes=[MemoryProbe()]),
+                        lambda: timer.decorate(probes=[MemoryProbe()])(fail)(),
+                        lambda: asyncio.run(timer.async_time_it(async_fail, probes=[MemoryProbe()]))):
+            self.assertRaises(ValueError, measure)
+            self.assertFalse(tracemalloc.is_tracing())
+
+        with self.assertRaises(ValueError):
+            with timer.context(probes=[MemoryProbe()]):
+                fail()
+
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(len(timer.splits[-1].runs), 0)
+
+
+class TestCPUProbe(unittest.TestCase):
+    def test_waiting(self):
+        timer = Timer()
+        timer.time_it(sleep, 0.02, runs=2, probes=[CPUProbe()])
+
+        stats = timer.splits[-1].statistics()
+        self.assertLess(stats["cpu_utilization"], 0.5)
+        self.assertGreater(stats["off_cpu_time"], 0.03)
+        self.assertLess(stats["metrics"]["thread_time"]["max"], 0.01)
+
+    def test_computing(self):
+        timer = Timer(nanoseconds=True)
+        timer.time_it(spin, 0.02, runs=2, probes=[CPUProbe()])
+
+        stats = timer.splits[-1].statistics()
+        self.assertGreater(stats["cpu_utilization"], 0.5)
+        self.assertLess(stats["off_cpu_time"], stats["total"] / 2)
+        self.assertGreater(stats["metrics"]["process_time"]["total"], 0.02)
+
+    def test_partial(self):
+        timer = Timer()
+        timer.time_it(spin, 0.001, probes=[CPUProbe()])
+        timer.time_it(spin, 0.001, split=False)
+
+        self.assertIn("metrics", timer.splits[-1].statistics())
+        self.assertNotIn("cpu_utilization", timer.splits[-1].statistics())
+
+    def test_statistics(self):
+        out = StringIO()
+        timer = Timer(output_stream=out)
+        timer.time_it(sleep, 0.001, probes=[CPUProbe()])
+        timer.statistics()
+
+        self.assertIn("CPU Use | Off-CPU = ", out.getvalue())
+        self.assertIn("thread_time = ", out.getvalue())
+
+
+class TestGCProbe(unittest.TestCase):
+    def test_collections(self):
+        timer = Timer()
+        timer.time_it(make_garbage, runs=3, probes=[GCProbe()])
+
+        stats = timer.splits[-1].statistics()
+        self.assertGreater(stats["metrics"]["gc_collections_0"]["total"], 0)
+        self.assertGreater(stats["gc_time"], 0)
+        self.assertAlmostEqual(stats["total_excluding_gc"], stats["total"] - stats["gc_time"])
+        self.assertAlmostEqual(stats["average_excluding_gc"], stats["total_excluding_gc"] / 3)
+        self.assertEqual(gc.callbacks, [])
+
+    def test_disable(self):
+        timer = Timer()
+        timer.time_it(make_garbage, runs=3, probes=[GCProbe(GCProbe.DISABLE)])
+
+        for run in timer.splits[-1].runs:
+            self.assertEqual(run.metrics["gc_collections_0"], 0)
+            self.assertEqual(run.metrics["gc_time"], 0)
+        self.assertTrue(gc.isenabled())
+
+    def test_collect_and_freeze(self):
+        timer = Timer(split=True)
+        with timer.context(probes=[GCProbe(GCProbe.COLLECT)]):
+            gc.collect()
+        with timer.context(probes=[GCProbe(GCProbe.FREEZE)]):
+            self.assertGreater(gc.get_freeze_count(), 0)
+
+        self.assertEqual(gc.get_freeze_count(), 0)
+        self.assertEqual(timer.splits[-1].runs[0].metrics["gc_collections_2"], 1)
+
+    def test_already_frozen(self):
+        gc.freeze()
+        try:
+            timer = Timer(split=True)
+            count = gc.get_freeze_count()
+            self.assertRaises(RuntimeWarning, timer.time_it, make_garbage, probes=[GCProbe(GCProbe.FREEZE)])
+            self.assertEqual(gc.get_freeze_count(), count)
+        finally:
+            gc.unfreeze()
+
+    def test_raises(self):
+        timer = Timer(split=True)
+        self.assertRaises(ValueError, timer.time_it, int, "x", probes=[GCProbe(GCProbe.DISABLE)])
+
+        with self.assertRaises(ValueError):
+            with timer.context(probes=[GCProbe(GCProbe.DISABLE)]):
+                int("x")
+
+        self.assertTrue(gc.isenabled())
+        self.assertEqual(gc.callbacks, [])
+
+    def test_invalid_mode(self):
+        self.assertRaises(RuntimeWarning, GCProbe, "sometimes")
+
+    def test_statistics(self):
+        out = StringIO()
+        timer = Timer(output_stream=out)
+        timer.time_it(make_garbage, probes=[GCProbe()])
+        timer.statistics()
+
+        self.assertIn("GC | Average w/o GC = ", out.getvalue())
+
+
+class TestProbes(unittest.TestCase):
+    def test_time_it(self):
+        timer = Timer()
+        timer.time_it(allocate, 10, runs=4, probes=[CountingProbe()])
+        timer.time_it("sum(range(10))", runs=2, probes=[CountingProbe()])
+
+        self.assertEqual([run.metrics for run in timer.splits[0].runs], [{"count": i} for i in range(1, 5)])
+        self.assertEqual([run.metrics for run in timer.splits[1].runs], [{"count": 1}, {"count": 2}])
+
+    def test_time_it_map(self):
+        timer = Timer()
+        timer.time_it_map(allocate, [((1,), {}), ((2,), {})], runs=2, probes=[CountingProbe()])
+        self.assertEqual(timer.splits[-1].statistics()["metrics"]["count"]["max"], 4)
+
+    def test_decorate(self):
+        timer = Timer()
+        probe = CountingProbe()
+
+        @timer.decorate(runs=3, probes=[probe])
+        def wrapped():
+            pass
+
+        wrapped()
+        self.assertEqual(probe.count, 3)
+        self.assertEqual(timer.splits[-1].runs[-1].metrics, {"count": 3})
+
+    def test_context(self):
+        timer = Timer(split=True)
+        with timer.context(probes=[CountingProbe(), MemoryProbe()]):
+            pass
+
+        self.assertEqual(set(timer.splits[-1].runs[0].metrics), {"count", "peak_bytes", "net_bytes", "net_blocks"})
+
+    def test_no_probes(self):
+        timer = Timer()
+        timer.time_it(allocate, 10)
+
+        self.assertEqual(timer.splits[-1].runs[0].metrics, {})
+        self.assertNotIn("metrics", timer.splits[-1].statistics())
+
+    def test_statistics(self):
+        split = Split()
+        for count in (1, 2, 6):
+            split.add_run(Run(label="run", time=1, runs=1, iterations_per_run=1, metrics={"count": count}))
+
+        metrics = split.statistics()["metrics"]["count"]
+        self.assertEqual((metrics["min"], metrics["max"], metrics["average"], metrics["total"]), (1, 6, 3, 9))
+
+        split.runs = split.runs[:2]
+        self.assertEqual(split.statistics()["metrics"]["count"]["total"], 3)
+
+    def test_columnar(self):
+        split = ColumnarSplit()
+        split.add_run(Run(label="run", time=2, runs=1, iterations_per_run=1, metrics={"count": 2}))
+        split.add_run(Run(label="run", time=1, runs=1, iterations_per_run=1))
+        split.sort_runs()
+
+        self.assertEqual([run.metrics for run in split.runs], [{}, {"count": 2}])
+        self.assertEqual(split.statistics()["metrics"]["count"]["count"], 1)
+
+    def test_output(self):
+        out = StringIO()
+        timer = Timer(output_stream=out)
+        timer.time_it(allocate, 10, runs=2, probes=[CountingProbe()])
+
+        timer.output()
+        self.assertTrue(out.getvalue().splitlines()[1].endswith("| count=1"))
+
+        timer.statistics()
+        self.assertIn("               count = 1 | 2 | 1.5", out.getvalue())
+
+    def test_storage(self):
+        file_path = path.join(mkdtemp(), "timer.ext")
+        timer = Timer()
+        timer.time_it(allocate, 10, runs=3, probes=[CountingProbe()])
+        timer.save(file_path)
+
+        try:
+            loaded = Timer.load(file_path)
+            self.assertEqual([run.metrics for run in loaded.splits[-1].runs], [{"count": i} for i in range(1, 4)])
+            self.assertEqual(loaded.splits[-1].statistics()["metrics"], timer.splits[-1].statistics()["metrics"])
+        finally:
+            remove(file_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
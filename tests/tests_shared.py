@@ -0,0 +1,120 @@
+from exectiming.data_structures import RunningStatistics, Run
+from exectiming.exectiming import Timer
+from exectiming.shared import SharedStatistics, MISSING_SHARED_MEMORY, SEQUENCE
+from multiprocessing import get_context
+from struct import pack_into
+import unittest
+
+
+def worker(name: str, index: int):
+    shared = SharedStatistics.attach(name)
+
+    timer = Timer(split=True, label="requests")
+    for x in range(1, 11):
+        timer.splits[-1].add_run(Run(label="request", time=index * 10 + x, runs=1, iterations_per_run=1))
+
+    shared.publish(index, timer)
+    shared.close()
+
+
+@unittest.skipIf(MISSING_SHARED_MEMORY, "multiprocessing.shared_memory is not available")
+class TestSharedStatistics(unittest.TestCase):
+    def setUp(self):
+        self.shared = SharedStatistics.create(workers=4, splits=3, label_size=16)
+
+    def tearDown(self):
+        self.shared.close()
+        self.shared.unlink()
+
+    def test_attach(self):
+        attached = SharedStatistics.attach(self.shared.name)
+        self.assertEqual((attached.workers, attached.splits, attached.label_size), (4, 3, 16))
+        attached.close()
+
+    def test_empty(self):
+        self.assertEqual(self.shared.statistics(), {})
+        self.assertEqual(self.shared.worker_statistics(0), {})
+
+    def test_publish(self):
+        timer = Timer(split=True, label="a")
+        for x in (1, 2, 3):
+            timer.splits[-1].add_run(Run(label="run", time=x, runs=1, iterations_per_run=1))
+        timer.split("b")
+        timer.splits[-1].add_run(Run(label="run", time=5, runs=1, iterations_per_run=1))
+        timer.split("a")
+        timer.splits[-1].add_run(Run(label="run", time=4, runs=1, iterations_per_run=1))
+
+        self.shared.publish(1, timer)
+        published = self.shared.worker_statistics(1)
+
+        self.assertEqual(set(published), {"a", "b"})
+        self.assertIsInstance(published["a"].count, int)
+        self.assertEqual(published["a"].statistics()["count"], 4)
+        self.assertAlmostEqual(published["a"].statistics()["average"], 2.5)
+        self.assertAlmostEqual(published["a"].statistics()["standard_deviation"], 1.1180340, places=5)
+        self.assertEqual((published["b"].min, published["b"].max), (5, 5))
+
+    def test_republish_clears(self):
+        timer = Timer(split=True, label="a")
+        timer.splits[-1].add_run(Run(label="run", time=1, runs=1, iterations_per_run=1))
+        timer.split("b")
+        timer.splits[-1].add_run(Run(label="run", time=2, runs=1, iterations_per_run=1))
+        self.shared.publish(0, timer)
+
+        self.shared.publish(0, timer.splits[1:])
+        self.assertEqual(set(self.shared.worker_statistics(0)), {"b"})
+
+    def test_nanoseconds(self):
+        timer = Timer(split=True, label="a", nanoseconds=True)
+        timer.splits[-1].add_run(Run(label="run", time=2_000_000_000, runs=1, iterations_per_run=1))
+        timer.splits[-1].add_run(Run(label="run", time=4_000_000_000, runs=1, iterations_per_run=1))
+        self.shared.publish(0, timer)
+
+        stats = self.shared.statistics()["a"]
+        self.assertAlmostEqual(stats["average"], 3)
+        self.assertAlmostEqual(stats["standard_deviation"], 1)
+
+    def test_processes(self):
+        context = get_context()
+        processes = [context.Process(target=worker, args=(self.shared.name, i)) for i in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        expected = RunningStatistics()
+        for index in range(4):
+            for x in range(1, 11):
+                expected.add(index * 10 + x)
+
+        merged = self.shared.statistics()["requests"]
+        for key, value in expected.statistics().items():
+            self.assertAlmostEqual(merged[key], value)
+
+    def test_dead_writer(self):
+        pack_into(SEQUENCE, self.shared.memory.buf, self.shared._offset(2, 1), 1)  # stopped part way through a write
+        self.shared.timeout = 0.01
+
+        self.assertRaisesRegex(RuntimeWarning, "Slot 1 of worker 2", self.shared.statistics)
+
+        timer = Timer(split=True, label="a")
+        timer.splits[-1].add_run(Run(label="run", time=1, runs=1, iterations_per_run=1))
+        self.shared._write_slot(self.shared._offset(2, 1), b"a", 1, timer.splits[-1].accumulator)  # a restarted writer
+        self.assertEqual(self.shared.statistics()["a"]["count"], 1)
+
+    def test_errors(self):
+        timer = Timer(split=True, label="this label is too long")
+        timer.splits[-1].add_run(Run(label="run", time=1, runs=1, iterations_per_run=1))
+
+        self.assertRaises(RuntimeWarning, self.shared.publish, 0, timer)
+        self.assertRaises(RuntimeWarning, self.shared.publish, 4, [])
+
+        timer = Timer()
+        for label in "abcd":
+            timer.split(label)
+        self.assertRaises(RuntimeWarning, self.shared.publish, 0, timer)
+
+
+if __name__ == "__main__":
+    unittest.main()
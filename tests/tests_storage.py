@@ -0,0 +1,115 @@
+from exectiming.data_structures import BoundedSplit, ColumnarSplit, MappedSplit, Run, Split
+from exectiming.exectiming import Timer
+from io import StringIO
+from os import listdir, path, remove
+from tempfile import mkdtemp
+import unittest
+
+
+def build_timer(**kwargs) -> Timer:
+    timer = Timer(**kwargs)
+    timer.split("squares")
+    for x in range(1, 20):
+        timer.splits[-1].add_run(Run(label="square", time=3 + 2*x, runs=1, iterations_per_run=2, args=(x,),
+                                     kwargs={"name": str(x)}))
+
+    timer.split("unlabeled")
+    timer.splits[-1].add_run(Run(label="a", time=5, runs=2, iterations_per_run=1))
+    timer.splits[-1].add_run(Run(label="b", time=1, runs=1, iterations_per_run=3))
+    timer.splits[-1].stop_reason = "converged"
+    timer.splits[-1].overhead = {"run": 1, "iteration": 0.5}
+    return timer
+
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        self.path = path.join(mkdtemp(), "timer.ext")
+
+    def tearDown(self):
+        if path.exists(self.path):
+            remove(self.path)
+
+    def assertSameOutput(self, first: Timer, second: Timer):
+        first_out, second_out = StringIO(), StringIO()
+        first.output_stream, second.output_stream = first_out, second_out
+
+        for timer in (first, second):
+            timer.output()
+            timer.statistics()
+
+        self.assertEqual(first_out.getvalue(), second_out.getvalue())
+
+    def test_round_trip(self):
+        for split_type, options in ((ColumnarSplit, {}), (ColumnarSplit, {"quantiles": True}),
+                                    (BoundedSplit, {"max_runs": 100})):
+            timer = build_timer(split_type=split_type, split_options=options)
+            timer.save(self.path)
+
+            for memory_map in (True, False):
+                loaded = Timer.load(self.path, memory_map=memory_map)
+                self.assertIsInstance(loaded.splits[0], MappedSplit)
+                self.assertEqual([split.label for split in loaded.splits], ["squares", "unlabeled"])
+                self.assertEqual(loaded.splits[1].stop_reason, "converged")
+                stats = timer.splits[0].statistics()
+                stats.pop("retained", None)  # only a BoundedSplit knows how many runs it has evicted
+                self.assertEqual(loaded.splits[0].statistics(), stats)
+                self.assertSameOutput(timer, loaded)
+
+    def test_best_fit_curve(self):
+        build_timer().save(self.path)
+        result = Timer.load(self.path).best_fit_curve(split_index="squares", exclude={"name"})
+
+        self.assertEqual(result[0], "Linear")
+        self.assertAlmostEqual(result[1]["x_0"], 2)
+
+    def test_nanoseconds(self):
+        timer = Timer(split=True, nanoseconds=True)
+        timer.time_it(sum, [1, 2, 3], runs=10)
+        timer.save(self.path)
+
+        loaded = Timer.load(self.path)
+        self.assertEqual(loaded.resolution, 10**9)
+        self.assertEqual(loaded.splits[-1].times.format, "q")
+        self.assertEqual(loaded.splits[-1].statistics()["total"], timer.splits[-1].statistics()["total"])
+
+    def test_changes_are_copied(self):
+        build_timer().save(self.path)
+        loaded = Timer.load(self.path)
+
+        loaded.sort_runs(reverse=True)
+        loaded.splits[0].add_run(Run(label="new", time=1, runs=1, iterations_per_run=1, args=(100,)))
+        self.assertEqual(len(loaded.splits[0].runs), 20)
+        self.assertEqual(loaded.splits[0].runs[0].args, (19,))
+        self.assertEqual(loaded.splits[0].statistics()["count"], 20)
+
+        self.assertEqual(len(Timer.load(self.path).splits[0].runs), 19)
+
+    def test_save_over_loaded(self):
+        build_timer().save(self.path)
+        loaded = Timer.load(self.path)
+        loaded.time_it(sum, [1, 2, 3], runs=3)
+        loaded.save(self.path)
+
+        reloaded = Timer.load(self.path)
+        self.assertEqual([len(split.runs) for split in reloaded.splits], [19, 2, 3])
+        self.assertEqual(reloaded.splits[0].runs[0].args, (1,))
+        self.assertEqual(reloaded.splits[0].statistics(), build_timer().splits[0].statistics())
+        self.assertEqual(listdir(path.dirname(self.path)), ["timer.ext"])
+
+    def test_runs_added_directly(self):
+        timer = Timer(split=True, split_type=Split)
+        timer.splits[-1].runs.extend(Run(label="run", time=time, runs=1, iterations_per_run=1) for time in (1, 2, 6))
+        timer.save(self.path)
+
+        stats = Timer.load(self.path).splits[0].statistics()
+        self.assertEqual((stats["count"], stats["total"], stats["max"]), (3, 9, 6))
+
+    def test_not_a_timer_file(self):
+        with open(self.path, "wb") as file:
+            file.write(b"\0" * 32)
+
+        self.assertRaisesRegex(RuntimeWarning, "not an ExecTiming file", Timer.load, self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()